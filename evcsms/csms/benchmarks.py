@@ -0,0 +1,671 @@
+# csms/benchmarks.py
+"""
+Micro-benchmarks for the OCPP hot paths.
+
+    python manage.py bench_ocpp                 # every case
+    python manage.py bench_ocpp sanitizer       # just one
+    python manage.py bench_ocpp -o before.json  # keep the numbers …
+    python manage.py bench_ocpp --compare before.json   # … and diff later
+
+Each case returns a list of result dicts
+{"name", "us_per_op", "ops_per_s", …extra}.  Cases registered with
+db=True run against a throw-away test database (in-memory for SQLite)
+that bench_ocpp creates for them.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import time
+from typing import Callable
+
+CASES: dict[str, Callable[[int], list[dict]]] = {}
+NEEDS_DB: set[str] = set()
+
+
+def case(name: str, db: bool = False):
+    def deco(fn):
+        CASES[name] = fn
+        if db:
+            NEEDS_DB.add(name)
+        return fn
+    return deco
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time of one fn() call, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+async def ameasure(fn: Callable[[], object], number: int, repeat: int = 3) -> float:
+    """measure() for coroutine functions."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+@contextlib.contextmanager
+def quiet():
+    """Keep anything printed by the code under test off the terminal."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def result(name: str, seconds: float, **extra) -> dict:
+    return {
+        "name":      name,
+        "us_per_op": round(seconds * 1e6, 3),
+        "ops_per_s": int(1 / seconds) if seconds else 0,
+        **extra,
+    }
+
+
+# ───────────────────────────── sample frames ─────────────────────────────
+def _call(action: str, payload: dict) -> str:
+    return json.dumps([2, "19223201", action, payload])
+
+
+FRAMES: dict[str, str] = {
+    "Heartbeat": _call("Heartbeat", {}),
+    "StatusNotification": _call("StatusNotification", {
+        "connectorId": 1, "errorCode": "NoError", "status": "Charging",
+        "timestamp": "2026-01-01T10:00:00Z",
+    }),
+    "MeterValues": _call("MeterValues", {
+        "connectorId": 1, "transactionId": 42,
+        "meterValue": [{
+            "timestamp": "2026-01-01T10:00:00Z",
+            "sampledValue": [
+                {"value": "12345.6", "context": "Sample.Periodic",
+                 "measurand": "Energy.Active.Import.Register", "unit": "Wh"},
+                {"value": "7200", "context": "Sample.Periodic",
+                 "measurand": "Power.Active.Import", "unit": "W"},
+                {"value": "31.8", "context": "Sample.Periodic",
+                 "measurand": "Current.Import", "phase": "L1", "unit": "A"},
+                {"value": "230.1", "context": "Sample.Periodic",
+                 "measurand": "Voltage", "phase": "L1-N", "unit": "V"},
+                {"value": "57", "context": "Sample.Periodic",
+                 "measurand": "SoC", "unit": "Percent"},
+            ],
+        }],
+    }),
+    "MeterValues(TransactionBegin)": _call("MeterValues", {
+        "connectorId": 1, "transactionId": 42,
+        "meterValue": [{
+            "timestamp": "2026-01-01T10:00:00Z",
+            "sampledValue": [{"value": "12000", "context": "TransactionBegin",
+                              "measurand": "Energy.Active.Import.Register"}],
+        }],
+    }),
+    "StopTransaction": _call("StopTransaction", {
+        "transactionId": 42, "meterStop": 15000, "idTag": "ABC123",
+        "timestamp": "2026-01-01T11:00:00Z", "reason": "Local",
+        "transactionData": [
+            {"sampledValue": [{"value": "15000", "context": "TransactionEnd"}]},
+        ],
+    }),
+}
+
+
+# ─────────────────────────────── sanitizer ───────────────────────────────
+def _legacy_sanitize(raw):
+    """Body of the SanitizingWS.recv() this repo shipped before ocpp_sanitize."""
+    if isinstance(raw, str):
+        raw = raw.replace("TransactionBegin", "Transaction.Begin") \
+                 .replace("TransactionEnd",   "Transaction.End")
+    try:
+        msg = json.loads(raw)
+        if (
+            isinstance(msg, list) and
+            len(msg) == 4 and
+            msg[0] == 2 and
+            msg[2] == "StopTransaction"
+        ):
+            payload = msg[3]
+            outer_ts = payload.get("timestamp")
+            for entry in payload.get("transactionData", []):
+                if "timestamp" not in entry and outer_ts is not None:
+                    entry["timestamp"] = outer_ts
+            raw = json.dumps(msg)
+    except Exception:
+        pass
+    return raw
+
+
+@case("sanitizer")
+def bench_sanitizer(number: int) -> list[dict]:
+    """
+    Per-frame cost of sanitizing *plus* the dispatcher's decode, i.e. what
+    the server pays before a handler runs: old wrapper + python-ocpp's
+    json.loads vs. ocpp_sanitize (decode only when not already decoded).
+    Both sides use the stdlib codec so only the pipeline is compared.
+    """
+    from csms import ocpp_codec
+    from csms.ocpp_sanitize import sanitize
+
+    previous = ocpp_codec.backend
+    ocpp_codec.select("stdlib")
+    out = []
+    for action, raw in FRAMES.items():
+        def legacy(raw=raw):
+            return json.loads(_legacy_sanitize(raw))
+
+        def current(raw=raw):
+            msg = sanitize(raw)
+            return json.loads(msg) if isinstance(msg, str) else msg
+
+        old = measure(legacy, number)
+        new = measure(current, number)
+        out.append(result(f"sanitizer.legacy[{action}]", old))
+        out.append(result(f"sanitizer.current[{action}]", new,
+                          speedup=round(old / new, 2)))
+    ocpp_codec.select(previous)
+    return out
+
+
+# ───────────────────────────────── codec ─────────────────────────────────
+@case("codec")
+def bench_codec(number: int) -> list[dict]:
+    """
+    Framing cost per message and core: decode the inbound Call, encode the
+    CallResult we answer with – for every installed backend.
+    """
+    from csms import ocpp_codec
+
+    replies = {
+        "Heartbeat":          [3, "19223201", {"currentTime": "2026-01-01T10:00:00.123456+00:00"}],
+        "StatusNotification": [3, "19223201", {}],
+        "MeterValues":        [3, "19223201", {}],
+    }
+    out = []
+    for backend, (loads, dumps) in ocpp_codec.BACKENDS.items():
+        for action, reply in replies.items():
+            raw = FRAMES[action]
+
+            def roundtrip(raw=raw, reply=reply, loads=loads, dumps=dumps):
+                loads(raw)
+                return dumps(reply)
+
+            out.append(result(f"codec.{backend}[{action}]", measure(roundtrip, number)))
+    return out
+
+
+# ───────────────────────────── SanitizingWS ──────────────────────────────
+class _ReplayWS:
+    """Stands in for the websocket: recv() returns the same frame forever."""
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    async def recv(self):
+        return self.raw
+
+
+@case("recv")
+def bench_recv(number: int) -> list[dict]:
+    """SanitizingWS.recv() per frame – sanitizer plus wrapper overhead."""
+    from csms.ocpp_sanitize import SanitizingWS
+
+    async def run():
+        out = []
+        for action, raw in FRAMES.items():
+            ws = SanitizingWS(_ReplayWS(raw))
+            out.append(result(f"recv[{action}]", await ameasure(ws.recv, number)))
+        return out
+    return asyncio.run(run())
+
+
+@case("camel_to_snake")
+def bench_camel_to_snake(number: int) -> list[dict]:
+    """Command payload key translation in MyChargePoint._run_command."""
+    from csms.management.commands.runocpp import camel_to_snake
+
+    out = []
+    for key in ("type", "connectorId", "chargingProfilePurpose"):
+        out.append(result(f"camel_to_snake[{key}]",
+                          measure(lambda key=key: camel_to_snake(key), number)))
+    return out
+
+
+# ──────────────────────────── models / API ───────────────────────────────
+def _transactions(n: int, running: bool = False) -> list:
+    """Unsaved Transaction rows shaped like real sessions (no DB needed)."""
+    from datetime import datetime, timedelta, timezone
+    from decimal import Decimal
+    from csms.models import Transaction
+
+    t0 = datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+    return [
+        Transaction(
+            tx_id=i, cp_id=f"CP-{i % 50}", user_tag=f"TAG{i}",
+            start_wh=1000.0 * i, latest_wh=1000.0 * i + 12345.6,
+            start_time=t0, stop_time=None if running else t0 + timedelta(minutes=95),
+            price_kwh_at_start=Decimal("0.350"), price_hour_at_start=Decimal("1.200"),
+        )
+        for i in range(n)
+    ]
+
+
+@case("models")
+def bench_models(number: int) -> list[dict]:
+    """Transaction.kwh / total_price – all Decimal construction, no DB."""
+    done, running = _transactions(1)[0], _transactions(1, running=True)[0]
+    return [
+        result("Transaction.kwh", measure(lambda: done.kwh, number)),
+        result("Transaction.total_price[stopped]", measure(done.total_price, number)),
+        result("Transaction.total_price[running]", measure(running.total_price, number)),
+    ]
+
+
+@case("serializer")
+def bench_serializer(number: int) -> list[dict]:
+    """TransactionSerializer(many=True).data, per row, for a 100-row page."""
+    from csms.serializers import TransactionSerializer
+
+    rows = _transactions(100)
+    loops = max(1, number // 100)
+    page = measure(lambda: TransactionSerializer(rows, many=True).data, loops, repeat=3)
+    return [result("TransactionSerializer[per row]", page / len(rows), page_ms=round(page * 1e3, 3))]
+
+
+# ──────────────────────────── OCPP handlers ──────────────────────────────
+class _NullWS:
+    async def recv(self):
+        await asyncio.Future()
+
+    async def send(self, msg):
+        pass
+
+
+def _fixtures():
+    from csms.models import ChargePoint, Tenant, User
+
+    owner = User.objects.create(username="bench-root", role="root")
+    tenant = Tenant.objects.create(owner=owner, ws_key="bench")
+    cp = ChargePoint.objects.create(id="BENCH-1", name="BENCH-1", tenant=tenant,
+                                    price_per_kwh="0.300", price_per_hour="1.000")
+    return tenant, cp
+
+
+# The handler bodies as they were before the write-behind buffers, the
+# id allocator and the snapshot cache – one thread hop per ORM call.
+def _legacy_handlers():
+    from asgiref.sync import sync_to_async
+    from decimal import Decimal
+    from datetime import datetime, timezone
+    from csms.models import ChargePoint, Transaction
+
+    async def status(cp_id, connector_id, status):
+        await sync_to_async(ChargePoint.objects.filter(id=cp_id).update)(
+            connector_id=connector_id, status=status,
+            updated=datetime.now(timezone.utc),
+        )
+
+    async def meter(transaction_id, meter_value):
+        tx = await sync_to_async(Transaction.objects.filter(pk=transaction_id).first)()
+        if not tx:
+            return
+        energy_wh = None
+        for sample in meter_value:
+            for sv in sample.get("sampledValue", []):
+                if sv.get("measurand") == "Energy.Active.Import.Register":
+                    energy_wh = Decimal(sv["value"])
+                    break
+        if energy_wh is not None:
+            tx.latest_wh = energy_wh
+            await sync_to_async(tx.save)(update_fields=["start_wh", "latest_wh"])
+
+    async def start(cp_id, id_tag, meter_start, timestamp):
+        @sync_to_async
+        def _next_tx_id():
+            last = Transaction.objects.order_by("-tx_id").first()
+            return (last.tx_id if last else 0) + 1
+
+        tx_id = await _next_tx_id()
+        cp_obj = await sync_to_async(ChargePoint.objects.get)(pk=cp_id)
+        await sync_to_async(Transaction.objects.create)(
+            tx_id=tx_id, cp_id=cp_id, user_tag=id_tag,
+            start_wh=meter_start, latest_wh=meter_start, start_time=timestamp,
+            price_kwh_at_start=cp_obj.price_per_kwh,
+            price_hour_at_start=cp_obj.price_per_hour,
+        )
+        return tx_id
+
+    async def stop(transaction_id, meter_stop, timestamp):
+        tx = await sync_to_async(Transaction.objects.filter(pk=transaction_id).first)()
+        if tx:
+            tx.stop_time = timestamp
+            tx.latest_wh = meter_stop
+            await sync_to_async(tx.save)(update_fields=["stop_time", "latest_wh"])
+
+    return status, meter, start, stop
+
+
+async def _bench_handlers(number: int) -> list[dict]:
+    from csms.management.commands.runocpp import MyChargePoint
+    from csms.ocpp_buffers import meter_buffer, sample_buffer, status_buffer, tx_buffer
+    from csms.ocpp_cache import CPSnapshot
+    from csms.ocpp_ids import tx_ids
+
+    tenant, cp_row = await asyncio.to_thread(_fixtures)
+    ts = "2026-01-01T10:00:00+00:00"
+    meter_value = json.loads(FRAMES["MeterValues"])[3]["meterValue"]
+    l_status, l_meter, l_start, l_stop = _legacy_handlers()
+
+    cp = MyChargePoint(cp_row.id, _NullWS())
+    cp.tenant, cp.tenant_key = tenant, tenant.ws_key
+    cp.snapshot = CPSnapshot.from_model(cp_row)
+    statuses = iter(["Available", "Preparing", "Charging"] * (number * 10))
+    await tx_ids.warm()
+
+    async def flushed(t):
+        """Amortised cost of the batched writes the handler deferred."""
+        t0 = time.perf_counter()
+        for buf in (tx_buffer, meter_buffer, sample_buffer, status_buffer):
+            await buf.flush()
+        return (time.perf_counter() - t0) / t
+
+    out = []
+    with quiet():
+        # -- Heartbeat: never touched the DB ------------------------------
+        new = await ameasure(cp.on_heartbeat, number)
+        out.append(result("handlers.current[Heartbeat]", new))
+        out.append(result("handlers.current[Authorize]",
+                          await ameasure(lambda: cp.on_authorize(id_tag="TAG"), number)))
+        out.append(result("handlers.current[DataTransfer]", await ameasure(
+            lambda: cp.on_data_transfer(vendor_id="generalConfiguration"), number)))
+        # first Boot writes the row, repeats are served from the snapshot cache
+        out.append(result("handlers.current[BootNotification]", await ameasure(
+            lambda: cp.on_boot_notification(charge_point_vendor=cp_row.vendor or "V",
+                                            charge_point_model=cp_row.model or "M",
+                                            firmware_version=cp_row.fw_version),
+            number)))
+
+        # -- StatusNotification -------------------------------------------
+        old = await ameasure(lambda: l_status(cp.id, 1, next(statuses)), number)
+        new = await ameasure(lambda: cp.on_status_notification(1, next(statuses)), number)
+        out.append(result("handlers.legacy[StatusNotification]", old))
+        out.append(result("handlers.current[StatusNotification]", new,
+                          speedup=round(old / new, 1),
+                          flush_us_per_op=round(await flushed(number * 3) * 1e6, 3)))
+
+        # -- StartTransaction (also creates the rows the others use) -----
+        legacy_ids, current_ids = [], []
+
+        async def legacy_start():
+            legacy_ids.append(await l_start(cp.id, "TAG", 1000, ts))
+
+        async def current_start():
+            res = await cp.on_start_transaction(connector_id=1, id_tag="TAG", meter_start=1000,
+                                               timestamp=ts)
+            current_ids.append(res.transaction_id)
+
+        old = await ameasure(legacy_start, number, repeat=1)
+        new = await ameasure(current_start, number, repeat=1)
+        out.append(result("handlers.legacy[StartTransaction]", old))
+        out.append(result("handlers.current[StartTransaction]", new,
+                          speedup=round(old / new, 1),
+                          flush_us_per_op=round(await flushed(number) * 1e6, 3)))
+
+        # -- MeterValues --------------------------------------------------
+        it_l, it_c = iter(legacy_ids * 3), iter(current_ids * 3)
+        old = await ameasure(lambda: l_meter(next(it_l), meter_value), number)
+        new = await ameasure(
+            lambda: cp.on_meter_values(connector_id=1, meter_value=meter_value,
+                                       transaction_id=next(it_c)),
+            number,
+        )
+        out.append(result("handlers.legacy[MeterValues]", old))
+        out.append(result("handlers.current[MeterValues]", new,
+                          speedup=round(old / new, 1),
+                          flush_us_per_op=round(await flushed(number * 3) * 1e6, 3)))
+
+        # -- StopTransaction ----------------------------------------------
+        it_l, it_c = iter(legacy_ids), iter(current_ids)
+        old = await ameasure(lambda: l_stop(next(it_l), 2000, ts), number, repeat=1)
+        new = await ameasure(
+            lambda: cp.on_stop_transaction(meter_stop=2000, transaction_id=next(it_c),
+                                           timestamp=ts),
+            number, repeat=1,
+        )
+        out.append(result("handlers.legacy[StopTransaction]", old))
+        out.append(result("handlers.current[StopTransaction]", new,
+                          speedup=round(old / new, 1),
+                          flush_us_per_op=round(await flushed(number) * 1e6, 3)))
+
+        # -- offline backlog: 60 queued MeterValues + Stop with data -------
+        frames = 60
+        sessions = max(1, number // frames)
+        backlog_ids = []
+        for _ in range(sessions):
+            res = await cp.on_start_transaction(connector_id=1, id_tag="TAG", meter_start=1000,
+                                               timestamp=ts)
+            backlog_ids.append(res.transaction_id)
+        await flushed(1)
+        history = [
+            [{"timestamp": f"2026-01-01T10:{m:02d}:00+00:00", "sampledValue": [
+                {"value": str(1000 + 50 * m), "measurand": "Energy.Active.Import.Register"},
+                {"value": "16.0", "measurand": "Current.Import", "unit": "A"}]}]
+            for m in range(frames)
+        ]
+        it_b = iter(backlog_ids)
+
+        async def replay():
+            tx_id = next(it_b)
+            for mv in history:
+                await cp.on_meter_values(connector_id=1, meter_value=mv,
+                                         transaction_id=tx_id)
+            await cp.on_stop_transaction(meter_stop=1000 + 50 * frames, transaction_id=tx_id,
+                                         timestamp=ts,
+                                         transaction_data=[mv[0] for mv in history[-5:]])
+
+        new = await ameasure(replay, sessions, repeat=1)
+        out.append(result(f"handlers.current[backlog replay, {frames} frames]", new,
+                          flush_us_per_op=round(await flushed(sessions) * 1e6, 3)))
+    return out
+
+
+@case("handlers", db=True)
+def bench_handlers(number: int) -> list[dict]:
+    """
+    Per-handler latency as the charger sees it (call → CallResult), legacy
+    thread-hop-per-query bodies vs. the current in-memory handlers.  The
+    deferred batch writes are reported separately as flush_us_per_op.
+    """
+    return asyncio.run(_bench_handlers(min(number, 2000)))
+
+
+# ──────────────────────────── logging ────────────────────────────────────
+@case("logging")
+def bench_logging(number: int) -> list[dict]:
+    """
+    Cost on the event-loop thread of one per-message log line: the old
+    print() vs. ocpp_log.event() through the queue, sampled and forced.
+    """
+    import logging
+    from csms import ocpp_log
+
+    out = []
+    with quiet():
+        out.append(result("logging.print", measure(
+            lambda: print("[Meter] tx=17 energy=12345.0 Wh"), number)))
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    ocpp_log_logger = logging.getLogger("ocpp")
+    saved_ocpp_level = ocpp_log_logger.level
+    with open(os.devnull, "w") as devnull:
+        root.handlers = [logging.StreamHandler(devnull)]
+        ocpp_log_logger.setLevel(logging.INFO)
+        ocpp_log.setup(maxsize=0)             # unbounded: measure, don't drop
+        try:
+            out.append(result("logging.event[forced]", measure(
+                lambda: ocpp_log.event("StartTransaction", cp_id="CP1", tenant=1,
+                                       latency_ms=0.1, force=True, tx_id=17),
+                number)))
+            out.append(result("logging.event[MeterValues sampled]", measure(
+                lambda: ocpp_log.event("MeterValues", cp_id="CP1", tenant=1,
+                                       latency_ms=0.1, tx_id=17, energy_wh=12345.0),
+                number), rate=ocpp_log.SAMPLING.get("MeterValues", 1.0)))
+        finally:
+            ocpp_log.shutdown()
+            root.handlers, root.level = saved_handlers, saved_level
+            ocpp_log_logger.setLevel(saved_ocpp_level)
+    return out
+
+
+# ──────────────────────────── composite schedules ────────────────────────
+def _profiles(n: int, seed: int = 7) -> list[dict]:
+    """n random stored profiles (all purposes / kinds) on connectors 0–2."""
+    import random
+    from datetime import datetime, timedelta, timezone
+
+    rnd = random.Random(seed)
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    purposes = ["ChargePointMaxProfile", "TxDefaultProfile", "TxDefaultProfile", "TxProfile"]
+    out = []
+    for i in range(n):
+        purpose = rnd.choice(purposes)
+        kind = rnd.choice(["Absolute", "Absolute", "Recurring", "Relative"])
+        steps = sorted(rnd.sample(range(0, 86400, 900), rnd.randint(1, 12)))
+        steps[0] = 0
+        p = {
+            "connector_id": 0 if purpose == "ChargePointMaxProfile" else rnd.randint(0, 2),
+            "charging_profile_id": i + 1,
+            "stack_level": rnd.randint(0, 20),
+            "charging_profile_purpose": purpose,
+            "charging_profile_kind": kind,
+            "charging_schedule": {
+                "charging_rate_unit": rnd.choice(["A", "A", "W"]),
+                "start_schedule": (t0 + timedelta(hours=rnd.randint(0, 24 * 7))).isoformat(),
+                "duration": rnd.choice([None, 3600, 4 * 3600, 86400]),
+                "charging_schedule_period": [
+                    {"start_period": s, "limit": rnd.randint(6, 63)} for s in steps
+                ],
+            },
+        }
+        if kind == "Recurring":
+            p["recurrency_kind"] = rnd.choice(["Daily", "Weekly"])
+        out.append(p)
+    return out
+
+
+@case("schedule")
+def bench_schedule(number: int) -> list[dict]:
+    """ocpp_schedule.composite_schedule over a 7-day window, growing profile sets."""
+    from datetime import datetime, timezone
+    from csms import ocpp_schedule
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for n in (10, 100, 500):
+        profiles = _profiles(n)
+        run = lambda profiles=profiles: ocpp_schedule.composite_schedule(
+            profiles, 1, 7 * 86400, start=start, tx_start=start)
+        periods = len(run()["charging_schedule_period"])
+        out.append(result(f"schedule[{n} profiles, 7 d]",
+                          measure(run, max(1, number // (n * 10)), repeat=3),
+                          periods=periods))
+    return out
+
+
+# ──────────────────────────── site balancer ──────────────────────────────
+def _balanced_fleet(sites: int, per_site: int):
+    """A Balancer with sites × per_site active chargers, no DB / sockets."""
+    from csms.ocpp_balancer import Balancer, Charger, SiteState
+
+    class _Accepting(Balancer):             # every charger takes its limit
+        async def _push(self, ch, limit_a):
+            ch.sent_a = limit_a
+            self.pushes += 1
+            self._pushing.discard(ch.cp_id)
+
+    b = _Accepting()
+    for s in range(sites):
+        site = b.sites[s] = SiteState(s, capacity_a=per_site * 12.0, min_a=6,
+                                      max_a=32, phases=3)
+        for i in range(per_site):
+            cp_id = f"S{s}-{i}"
+            ch = b.chargers[cp_id] = site.chargers[cp_id] = Charger(cp_id, site)
+            ch.connectors.add(1)
+    return b
+
+
+@case("balancer")
+def bench_balancer(number: int) -> list[dict]:
+    """ocpp_balancer: per-event cost, one site re-allocation, a pass over dirty sites."""
+    import itertools
+    import random
+
+    rnd = random.Random(3)
+    b = _balanced_fleet(200, 40)
+    ids = list(b.chargers)
+    site = b.sites[0]
+    site.allocate()
+
+    meters = itertools.cycle([(rnd.choice(ids), rnd.uniform(0, 32)) for _ in range(4096)])
+    flips = itertools.cycle([(rnd.choice(ids), rnd.choice(["Charging", "Finishing"]))
+                             for _ in range(4096)])
+
+    async def pass_after(events: int):
+        for _ in range(events):
+            cp_id, amps = next(meters)
+            b.meter(cp_id, amps)
+        b.rebalance()
+        await asyncio.sleep(0)              # let the pushes run
+
+    def run_pass():
+        asyncio.run(pass_after(1000))
+
+    asyncio.run(pass_after(0))              # settle: every charger has its limit
+    b.rebalance()
+    pushes = b.pushes
+    run_pass()
+    pushes = b.pushes - pushes
+    out = [
+        result("balancer.meter", measure(lambda: b.meter(*next(meters)), number)),
+        result("balancer.status", measure(lambda: b.status(next(flips)[0], 1, next(flips)[1]),
+                                          number)),
+        result("SiteState.allocate[40 chargers]", measure(site.allocate, max(1, number // 10))),
+        result("balancer.pass[1000 events, 8000 chargers]",
+               measure(run_pass, max(1, number // 10000), repeat=3),
+               pushes_per_pass=pushes),
+    ]
+    b._dirty.clear()
+    return out
+
+
+# ──────────────────────────── authorization ──────────────────────────────
+@case("auth")
+def bench_auth(number: int) -> list[dict]:
+    """ocpp_auth.TagCache.authorize on a warm 50 000-tag tenant (no DB)."""
+    from datetime import datetime, timedelta, timezone
+    from csms.ocpp_auth import TagCache, _TenantTags
+
+    cache = TagCache(refresh_s=1e9)
+    entry = cache._tenants[1] = _TenantTags()
+    later = datetime.now(timezone.utc) + timedelta(days=365)
+    for i in range(50_000):
+        entry.tags[f"TAG{i:06d}"] = ("Accepted", later if i % 2 else None, "")
+
+    async def run():
+        return [
+            result("auth.authorize[known]", await ameasure(
+                lambda: cache.authorize(1, "TAG012346"), number)),
+            result("auth.authorize[known, expiry]", await ameasure(
+                lambda: cache.authorize(1, "TAG012345"), number)),
+            result("auth.authorize[unknown]", await ameasure(
+                lambda: cache.authorize(1, "NOPE"), number)),
+        ]
+    return asyncio.run(run())
@@ -1,102 +1,112 @@
-import json
-from datetime import datetime, timezone
-from channels.generic.websocket import AsyncWebsocketConsumer
-from ocpp.v16 import ChargePoint as CP
-from ocpp.v16.enums import (
-    Action, RegistrationStatus, AuthorizationStatus, DataTransferStatus
-)
-from ocpp.v16 import call_result
-from .models import ChargePoint, Transaction
-
-class OCPPConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.cp_id = self.scope["url_route"]["kwargs"]["cp_id"]
-        await self.accept(subprotocol="ocpp1.6")
-        print(f"→ CP connected: {self.cp_id}")
-
-        # Wrap self as a python-ocpp CP
-        self.cp = CP(self.cp_id, self)
-
-        # Dispatch python-ocpp handlers
-        await self.cp.start()
-
-    async def receive(self, text_data):
-        await self.cp._message_handler(text_data)
-
-    async def send(self, text_data=None, bytes_data=None):
-        # channels expects exactly this signature
-        await super().send(text_data=text_data, bytes_data=bytes_data)
-
-    # ---- now register your handlers on self.cp ----
-    @CP.on(Action.boot_notification)
-    async def on_boot_notification(self, charge_point_vendor, charge_point_model, **_):
-        ChargePoint.objects.update_or_create(
-            cp_id=self.cp_id,
-            defaults={"status": "Accepted"})
-        now = datetime.now(tz=timezone.utc).isoformat()
-        return call_result.BootNotification(current_time=now, interval=30,
-                                            status=RegistrationStatus.accepted)
-
-    @CP.on(Action.status_notification)
-    async def on_status_notification(self, connector_id, status, **_):
-        ChargePoint.objects.update_or_create(
-            cp_id=self.cp_id,
-            defaults={"connector": connector_id, "status": status})
-        return call_result.StatusNotification()
-
-    @CP.on(Action.heartbeat)
-    async def on_heartbeat(self):
-        now = datetime.now(tz=timezone.utc).isoformat()
-        return call_result.Heartbeat(current_time=now)
-
-    @CP.on(Action.data_transfer)
-    async def on_data_transfer(self, vendor_id, **_):
-        ok = vendor_id == "generalConfiguration"
-        status = DataTransferStatus.accepted if ok else DataTransferStatus.rejected
-        return call_result.DataTransfer(status=status, data="")
-
-    @CP.on(Action.authorize)
-    async def on_authorize(self, id_tag, **_):
-        return call_result.Authorize(id_tag_info={"status": AuthorizationStatus.accepted})
-
-    @CP.on(Action.start_transaction)
-    async def on_start_transaction(self, connector_id, id_tag, meter_start, timestamp, **_):
-        tx, _ = Transaction.objects.get_or_create(
-            tx_id=int(timestamp.timestamp()),  # or your own ID logic
-            defaults={
-                "cp": ChargePoint.objects.get(cp_id=self.cp_id),
-                "user_tag": id_tag,
-                "start_wh": meter_start,
-                "latest_wh": meter_start,
-                "start_time": timestamp,
-            })
-        return call_result.StartTransaction(
-            transaction_id=tx.tx_id,
-            id_tag_info={"status": AuthorizationStatus.accepted})
-
-    @CP.on(Action.meter_values)
-    async def on_meter_values(self, transaction_id, meter_value, **_):
-        try:
-            tx = Transaction.objects.get(tx_id=transaction_id)
-        except Transaction.DoesNotExist:
-            return call_result.MeterValues()
-
-        for sample in meter_value:
-            for sv in sample.get("sampled_value", []) + sample.get("sampledValue", []):
-                if sv.get("measurand") == "Energy.Active.Import.Register":
-                    val = float(sv.get("value", 0))
-                    if not tx.start_wh and val > 0:
-                        tx.start_wh = val
-                    tx.latest_wh = val
-        tx.save()
-        return call_result.MeterValues()
-
-    @CP.on(Action.stop_transaction)
-    async def on_stop_transaction(self, meter_stop, transaction_id, timestamp, **_):
-        try:
-            tx = Transaction.objects.get(tx_id=transaction_id)
-            tx.stop_time = timestamp
-            tx.save()
-        except Transaction.DoesNotExist:
-            pass
-        return call_result.StopTransaction(id_tag_info={"status": AuthorizationStatus.accepted})
+# csms/consumers.py
+"""
+OCPP 1.6 over Django Channels – the same endpoint as runocpp
+(/api/v16/<ws_key>/<cp_id>), served by any ASGI server.
+
+Nothing OCPP-specific lives here: the consumer only turns Channels'
+push-style receive() into the recv()/send() socket python-ocpp expects
+(_ChannelsSocket) and hands it to runocpp's _on_connect, so both entry
+points run the very same MyChargePoint handlers, buffers and caches, and
+every DB access goes through the ocpp_db executor – never the ORM on the
+event loop.
+
+The process-wide services (notify listener, write-behind buffers,
+liveness, balancer, …) start with the first charger that connects and are
+flushed on ASGI lifespan shutdown (see evcsms.asgi).  Under several ASGI
+worker processes set WEB_CONCURRENCY (gunicorn/uvicorn do) or
+OCPP_ASGI_WORKERS so the balancer hands each process its share of a site;
+the /metrics server is only started with a single worker, as there is no
+worker index to offset its port by.  Only the "ocpp" logger goes through
+ocpp_log's queue here – the server's and Django's logging stay untouched.
+"""
+import asyncio
+import logging
+import os
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from websockets.exceptions import ConnectionClosedOK
+from websockets.frames import Close
+
+from csms.management.commands.runocpp import _on_connect, start_services, stop_services
+
+log = logging.getLogger("ocpp")
+
+SUBPROTOCOL = "ocpp1.6"
+# how long disconnect() waits for the handler to unregister and flush
+DISCONNECT_TIMEOUT_S = 10
+
+
+def asgi_workers() -> int:
+    workers = getattr(settings, "OCPP_ASGI_WORKERS", None)
+    return max(1, int(workers or os.environ.get("WEB_CONCURRENCY") or 1))
+
+
+async def shutdown():
+    """ASGI lifespan shutdown: write out everything buffered."""
+    await stop_services()
+
+
+class _ChannelsSocket:
+    """The slice of a websockets connection python-ocpp and runocpp use."""
+    def __init__(self, consumer: "OCPPConsumer"):
+        self._consumer = consumer
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._closed: Close | None = None
+
+    def feed(self, text: str):
+        self._inbox.put_nowait(text)
+
+    def closed(self, code: int):
+        if self._closed is None:
+            self._closed = Close(code, "")
+            self._inbox.put_nowait(None)
+
+    async def recv(self) -> str:
+        if self._closed is not None and self._inbox.empty():
+            raise ConnectionClosedOK(self._closed, None)
+        text = await self._inbox.get()
+        if text is None:
+            raise ConnectionClosedOK(self._closed, None)
+        return text
+
+    async def send(self, text: str):
+        if self._closed is not None:
+            raise ConnectionClosedOK(self._closed, None)
+        await self._consumer.send(text_data=text)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self._closed is None:
+            await self._consumer.close(code=code)
+            self.closed(code)
+
+
+class OCPPConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        offered = self.scope.get("subprotocols") or []
+        await self.accept(subprotocol=SUBPROTOCOL if SUBPROTOCOL in offered else None)
+
+        workers = asgi_workers()
+        await start_services(workers=workers, metrics=workers == 1, logger="ocpp")
+
+        self.socket = _ChannelsSocket(self)
+        self.handler = asyncio.create_task(_on_connect(self.socket, self.scope["path"]))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None and bytes_data is not None:
+            text_data = bytes_data.decode("utf-8", "replace")
+        if text_data is not None:
+            self.socket.feed(text_data)
+
+    async def disconnect(self, code):
+        socket = getattr(self, "socket", None)
+        if socket is None:
+            return                              # never got as far as connect()
+        socket.closed(code)
+        try:
+            await asyncio.wait_for(self.handler, DISCONNECT_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            log.warning("[%s] handler did not finish after disconnect",
+                        self.scope["path"])
+        except Exception:
+            pass                                # _on_connect logged it
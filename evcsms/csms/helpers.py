@@ -3,6 +3,16 @@
 Tiny utilities that are reused by several views / serializers.
 """
 
+def _user_tenant(user):
+    """The user's Tenant, or None (admins without one, anonymous users)."""
+    from .models import Tenant
+
+    try:
+        return user.tenant                         # reverse OneToOne from User
+    except (Tenant.DoesNotExist, AttributeError):
+        return None
+
+
 def _tenant_qs(model, user, *, with_owner_split=False):
     """
     Return a queryset limited to the user’s tenant.
@@ -11,11 +21,10 @@ def _tenant_qs(model, user, *, with_owner_split=False):
     *   For every other model that has a direct tenant FK -> tenant.
     """
     # avoid circular import
-    from .models import Tenant, Transaction
+    from .models import Transaction
 
-    try:
-        tenant = user.tenant                       # reverse OneToOne from User
-    except Tenant.DoesNotExist:
+    tenant = _user_tenant(user)
+    if tenant is None:
         return model.objects.none()
 
     if model is Transaction:
@@ -0,0 +1,98 @@
+# csms/management/commands/bench_ocpp.py
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from csms.benchmarks import CASES, NEEDS_DB
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Run the OCPP hot-path micro-benchmarks (csms/benchmarks.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("cases", nargs="*",
+                            help="subset to run (default: all)")
+        parser.add_argument("--number", type=int, default=20000,
+                            help="calls per timing loop")
+        parser.add_argument("-o", "--output",
+                            help="write the results as JSON to this file")
+        parser.add_argument("--compare",
+                            help="JSON file of an earlier run – show the change per row")
+
+    def handle(self, *args, **options):
+        names = options["cases"] or list(CASES)
+        unknown = [n for n in names if n not in CASES]
+        if unknown:
+            raise CommandError(f"unknown case(s) {unknown}; have {sorted(CASES)}")
+
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+        if NEEDS_DB.intersection(names):
+            # throw-away DB (in-memory for SQLite) – never the real one
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                rows = self._run(names, options["number"], baseline)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+        else:
+            rows = self._run(names, options["number"], baseline)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({
+                "meta": {
+                    "when":    datetime.now(timezone.utc).isoformat(),
+                    "git":     _git_rev(),
+                    "python":  platform.python_version(),
+                    "django":  django.get_version(),
+                    "machine": platform.machine(),
+                    "db":      settings.DATABASES["default"]["ENGINE"],
+                    "number":  options["number"],
+                    "cases":   names,
+                },
+                "results": rows,
+            }, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"results → {options['output']}"))
+
+    def _run(self, names, number, baseline) -> list[dict]:
+        rows = []
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"── {name}"))
+            for row in CASES[name](number):
+                rows.append({"case": name, **row})
+                extra = "  ".join(
+                    f"{k}={v}" for k, v in row.items()
+                    if k not in ("name", "us_per_op", "ops_per_s")
+                )
+                before = baseline.get(row["name"])
+                if before and before["us_per_op"]:
+                    delta = (row["us_per_op"] / before["us_per_op"] - 1) * 100
+                    extra = f"({delta:+.1f}% vs {before['us_per_op']:.3f})  " + extra
+                self.stdout.write(
+                    f"{row['name']:<48} {row['us_per_op']:>10.3f} µs"
+                    f" {row['ops_per_s']:>12,}/s  {extra}"
+                )
+        return rows
@@ -0,0 +1,41 @@
+# csms/management/commands/ocpp_profile.py
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from csms.ocpp_bridge import notify, notify_dir
+from csms.ocpp_profile import format_table
+
+
+class Command(BaseCommand):
+    help = "Control the per-handler profiler of running runocpp processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("verb", choices=["on", "off", "reset", "dump"])
+        parser.add_argument("--wait", type=float, default=2.0,
+                            help="seconds to wait for the dumps (dump only)")
+
+    def handle(self, *args, verb, wait, **options):
+        asked = time.time()
+        notify("profile", verb)                  # every runocpp process
+        if verb != "dump":
+            self.stdout.write(f"sent '{verb}' to the OCPP processes")
+            return
+
+        # each process answers with <pid>.profile.json next to its socket
+        time.sleep(wait)
+        reports = []
+        for path in sorted(notify_dir().glob("*.profile.json")):
+            if path.stat().st_mtime >= asked:
+                reports.append(json.loads(path.read_text()))
+
+        if not reports:
+            self.stderr.write("no dumps received – is runocpp running?")
+            return
+        for report in reports:
+            state = "on" if report["enabled"] else "off"
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"── pid {report['pid']}  ({report['seconds']} s, profiler {state})"
+            ))
+            self.stdout.write(format_table(report))
@@ -1,28 +1,47 @@
 # csms/management/commands/runocpp.py
 # --------------------------------------------------------------------------
 import asyncio
+import math
+import os
+import random
+import signal
+import socket
+import time
 from datetime import datetime, timezone
-from decimal import Decimal
 import logging
-import json
-from csms.ocpp_bridge import next_for
+from csms.ocpp_bridge import next_for, pending_for, pending_count, notify_dir, NotifyListener
 import websockets
-from asgiref.sync import sync_to_async
-from django.core.management.base import BaseCommand
-from ocpp.routing import on
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connections
+from ocpp.routing import on, after
 from ocpp.v16 import ChargePoint as CP, call_result
 from ocpp.v16 import call_result as cr
 from ocpp.v16 import call as c
 from websockets.exceptions import ConnectionClosed
-from csms.models import ChargePoint, Transaction, Tenant     # your own models
+from csms.models import ChargePoint, Tenant     # your own models
 import re
 from csms.ocpp_hub import hub
+from csms.ocpp_buffers import meter_buffer, sample_buffer, status_buffer, tx_buffer
+from csms import ocpp_cache
+from csms.ocpp_cache import CPSnapshot, MISSING
+from csms.ocpp_sanitize import SanitizingWS, unpack_decoded
+from csms import ocpp_codec
+from csms.ocpp_ids import tx_ids
+from csms.ocpp_liveness import liveness
+from csms.ocpp_db import db
+from csms.ocpp_config import fetcher as config_fetcher
+from csms import ocpp_schedule
+from csms.ocpp_balancer import balancer
+from csms.ocpp_auth import tags as auth_tags, local_lists
+from csms import ocpp_log, ocpp_metrics, ocpp_profile
+from csms.ocpp_profile import profiler
+from ocpp.exceptions import OCPPError
+from ocpp.messages import MessageType
 import django.utils.timezone as dj_timezone
 
 # --------------------------------------------------------------------------
 
-logging.basicConfig(level=logging.INFO)
-logging.getLogger("websockets.server").setLevel(logging.WARNING)
 log = logging.getLogger("ocpp")
 
 
@@ -33,19 +52,90 @@ def camel_to_snake(s: str) -> str:
     return _camel.sub(r"_\1", s).lower()
 
 
-# ------------------------------------------------------------------------
-@sync_to_async
-def _get_tenant(ws_key: str) -> Tenant | None:
+ENERGY_REGISTER = "Energy.Active.Import.Register"     # OCPP default measurand
+
+
+def _sampled_values(sample: dict) -> list:
+    """python-ocpp may or may not snake_case nested keys – accept both."""
+    return sample.get("sampled_value") or sample.get("sampledValue") or []
+
+
+# frames stamped further back than this are an offline backlog being replayed
+BACKLOG_AFTER = getattr(settings, "OCPP_BACKLOG_AFTER_S", 120)
+
+
+def _parse_ts(ts) -> datetime | None:
+    """Charger timestamp (ISO 8601) → aware datetime; None if missing or unparseable."""
+    if not ts:
+        return None
     try:
-        return Tenant.objects.get(ws_key=ws_key.lower())
-    except Tenant.DoesNotExist:
+        dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except ValueError:
         return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _epoch(ts) -> float | None:
+    """Charger timestamp (ISO 8601) → epoch seconds; None if unparseable."""
+    dt = _parse_ts(ts)
+    return dt.timestamp() if dt is not None else None
+
 
+def _is_backlog(epoch: float | None) -> bool:
+    return epoch is not None and epoch < time.time() - BACKLOG_AFTER
 
-@sync_to_async
-def _upsert_cp(tenant: Tenant, cp_id: str,
-               vendor: str, model: str, fw: str):
-    ChargePoint.objects.update_or_create(
+
+# ------------------------------------------------------------------------
+#  tenant / charge-point resolution – served from ocpp_cache when possible
+# ------------------------------------------------------------------------
+async def _get_tenant(ws_key: str) -> Tenant | None:
+    ws_key = ws_key.lower()
+    tenant = ocpp_cache.tenants.get(ws_key, MISSING)
+    if tenant is MISSING:
+        tenant = await db.run(Tenant.objects.filter(ws_key=ws_key).first)
+        # unknown keys are remembered briefly so a bad charger can't hammer us
+        ocpp_cache.tenants.set(
+            ws_key, tenant, None if tenant else ocpp_cache.NEGATIVE_TTL
+        )
+    return tenant
+
+
+async def _ensure_cp(cp_id: str, tenant: Tenant) -> CPSnapshot:
+    """Make sure the CP row exists & is linked to a tenant."""
+    snap = ocpp_cache.charge_points.get(cp_id)
+    if snap is not None and snap.tenant_id is not None:
+        return snap
+
+    def _load():
+        cp, created = ChargePoint.objects.get_or_create(
+            id=cp_id,
+            defaults={"name": cp_id, "tenant": tenant},
+        )
+        # if the row pre-exists but has no tenant yet → attach it now
+        if cp.tenant_id is None:
+            cp.tenant = tenant
+            cp.save(update_fields=["tenant"])
+        return CPSnapshot.from_model(cp)
+
+    snap = await db.run(_load)
+    ocpp_cache.charge_points.set(cp_id, snap)
+    return snap
+
+
+async def _upsert_cp(tenant: Tenant, cp_id: str,
+                     vendor: str, model: str, fw: str) -> CPSnapshot:
+    """
+    Boot-time upsert.  Writes nothing when the charger reports exactly
+    what we already have – the common reconnect case.
+    """
+    cached = ocpp_cache.charge_points.get(cp_id)
+    if cached is not None and cached.same_boot(tenant.pk, vendor, model, fw):
+        return cached
+
+    cp, _ = await db.run(
+        ChargePoint.objects.update_or_create,
         id=cp_id,
         defaults=dict(
             tenant      = tenant,
@@ -57,51 +147,21 @@ def _upsert_cp(tenant: Tenant, cp_id: str,
             connector_id=0,
         ),
     )
-# ------------------------------------------------------------------------
-
-
-
-class SanitizingWS:
-    def __init__(self, ws):
-        self._ws = ws
-
-    async def recv(self):
-        raw = await self._ws.recv()
-
-        # first do your context fixes
-        if isinstance(raw, str):
-            raw = raw.replace("TransactionBegin", "Transaction.Begin") \
-                     .replace("TransactionEnd",   "Transaction.End")
-
-        # now try to JSON-parse & inject missing timestamps
-        try:
-            msg = json.loads(raw)
-            # OCPP call messages are arrays: [ messageTypeId, uniqueId, action, payload ]
-            if (
-                isinstance(msg, list) and
-                len(msg) == 4 and
-                msg[0] == 2 and  # Call message
-                msg[2] == "StopTransaction"
-            ):
-                payload = msg[3]
-                outer_ts = payload.get("timestamp")
-                td = payload.get("transactionData", [])
-                # for each entry, if no timestamp, inject the outer one
-                for entry in td:
-                    if "timestamp" not in entry and outer_ts is not None:
-                        entry["timestamp"] = outer_ts
-                raw = json.dumps(msg)
-        except Exception:
-            # if parsing/patching fails, just fall back to the original string
-            pass
-
-        return raw
+    snap = CPSnapshot.from_model(cp)
+    ocpp_cache.charge_points.set(cp_id, snap)
+    status_buffer.forget(cp_id)       # we just reset status to "Available"
+    return snap
 
-    async def send(self, msg):
-        return await self._ws.send(msg)
 
-    def __getattr__(self, name):
-        return getattr(self._ws, name)
+async def _load_cp(cp_id: str) -> CPSnapshot | None:
+    cp = await db.run(ChargePoint.objects.filter(pk=cp_id).first)
+    if cp is None:
+        ocpp_cache.charge_points.pop(cp_id)
+        return None
+    snap = CPSnapshot.from_model(cp)
+    ocpp_cache.charge_points.set(cp_id, snap)
+    return snap
+# ------------------------------------------------------------------------
 
 
 
@@ -145,16 +205,17 @@ class MyChargePoint(CP):
     @on("BootNotification")
     async def on_boot_notification(
         self, charge_point_vendor, charge_point_model,
-        chargePointSerialNumber=None, firmwareVersion=None, **_
+        chargePointSerialNumber=None, firmwareVersion=None,
+        firmware_version=None, **_
     ):
-        print(f"[Boot] {self.id}: {charge_point_vendor}/{charge_point_model}")
+        self.note(always=True, vendor=charge_point_vendor, model=charge_point_model)
 
         tenant = await _get_tenant(self.tenant_key)
         if tenant:          # guards against bogus ws_key
-            await _upsert_cp(tenant, self.id,
-                             charge_point_vendor,
-                             charge_point_model,
-                             firmwareVersion or "")
+            self.snapshot = await _upsert_cp(tenant, self.id,
+                                             charge_point_vendor,
+                                             charge_point_model,
+                                             firmware_version or firmwareVersion or "")
 
         return cr.BootNotification(
             current_time=datetime.now(timezone.utc).isoformat(),
@@ -165,6 +226,14 @@ class MyChargePoint(CP):
 
 
 
+    @after("BootNotification")
+    async def after_boot_notification(self, **_):
+        # runs once the Accepted answer is on the wire – only then may we
+        # send GetConfiguration; skipped when the stored snapshot is recent
+        if self.snapshot is not None:
+            config_fetcher.request(self.id)
+            local_lists.request(self.id)        # SendLocalList delta if behind
+
     # ----------------------------- Heartbeat -------------------------------
     @on("Heartbeat")
     async def on_heartbeat(self):
@@ -180,14 +249,12 @@ class MyChargePoint(CP):
     # ------------------------------------------------------------------------
     @on("StatusNotification")
     async def on_status_notification(self, connector_id: int, status: str, **_):
+        balancer.status(self.id, connector_id, status)
         # update only the live fields – don't touch tenant, name, etc.
-        await sync_to_async(ChargePoint.objects.filter(id=self.id).update)(
-            connector_id=connector_id,
-            status=status,
-            updated=datetime.now(timezone.utc),
-        )
-
-        print(f"[Status] {self.id} c{connector_id} → {status}")
+        # Unchanged statuses are dropped, bursts are debounced into one write.
+        if status_buffer.put(self.id, connector_id, status,
+                             datetime.now(timezone.utc)):
+            self.note(always=True, connector_id=connector_id, status=status)
         return _cr("StatusNotification")
 
 
@@ -200,43 +267,52 @@ class MyChargePoint(CP):
     # ------------------------------- Authorize -----------------------------
     @on("Authorize")
     async def on_authorize(self, id_tag, **_):
-        return _cr("Authorize", id_tag_info={"status": "Accepted"})
+        # served from ocpp_auth's in-memory copy of the tenant's tags
+        info = await auth_tags.authorize(self._tenant_id(), id_tag)
+        if info["status"] != "Accepted":
+            self.note(always=True, id_tag=id_tag, status=info["status"])
+        return _cr("Authorize", id_tag_info=info)
 
 
 
     @on("StartTransaction")
     async def on_start_transaction(
         self,
+        connector_id: int,
         id_tag: str,
         meter_start: int,
         timestamp: str,
         **_
     ):
-        # pick your own transaction id logic; here's a simple auto-increment:
-        @sync_to_async
-        def _next_tx_id():
-            last = Transaction.objects.order_by("-tx_id").first()
-            return (last.tx_id if last else 0) + 1
+        # the charger may have started already (offline / local list) – the
+        # transaction is recorded either way, a non-Accepted status stops it
+        info = await auth_tags.authorize(self._tenant_id(), id_tag)
 
-        tx_id = await _next_tx_id()
-        cp_obj = await sync_to_async(ChargePoint.objects.get)(pk=self.id)
+        # unique across workers & restarts, normally served from memory
+        tx_id = await tx_ids.next()
+        snap = self.snapshot              # prices as of connect / last PATCH
 
-        await sync_to_async(Transaction.objects.create)(
-            tx_id=tx_id,
+        # acknowledged from memory, inserted by tx_buffer right after
+        tx_buffer.begin(
+            tx_id,
             cp_id=self.id,
+            connector_id=connector_id,
             user_tag=id_tag,
             start_wh=meter_start,
             latest_wh=meter_start,
-            start_time=timestamp,
-            price_kwh_at_start = cp_obj.price_per_kwh,
-            price_hour_at_start   = cp_obj.price_per_hour,
+            start_time=_parse_ts(timestamp) or datetime.now(timezone.utc),
+            price_kwh_at_start = snap.price_per_kwh,
+            price_hour_at_start   = snap.price_per_hour,
         )
-        print(f"[StartTx] #{tx_id} on {self.id} meterStart={meter_start}Wh")
+        self.open_tx[tx_id] = meter_start
+        self.note(always=True, tx_id=tx_id, meter_start=meter_start, auth=info["status"])
+        if _is_backlog(_epoch(timestamp)):
+            ocpp_metrics.backlog_frames.inc("StartTransaction")
 
         return _cr(
             "StartTransaction",
             transaction_id=tx_id,
-            id_tag_info={"status": "Accepted"},
+            id_tag_info=info,
         )
 
 
@@ -251,22 +327,74 @@ class MyChargePoint(CP):
         transaction_data: list | None = None,
         **_
     ):
-        tx = await sync_to_async(
-            Transaction.objects.filter(pk=transaction_id).first
-        )()
-        if tx:
-            tx.stop_time = timestamp
-            tx.latest_wh = meter_stop
-            await sync_to_async(tx.save)(
-                update_fields=["stop_time", "latest_wh"]
-            )
-            print(f"[StopTx] #{transaction_id} → {tx.kwh:.3f} kWh")
+        # offline stops often carry the session's readings – keep them
+        if transaction_data:
+            self._ingest(0, transaction_id, transaction_data)
+
+        # meter_stop is final – neither a still-buffered nor a late older
+        # reading may overwrite it; the stop itself is written by
+        # tx_buffer right after
+        meter_buffer.close(transaction_id)
+        tx_buffer.end(transaction_id, _parse_ts(timestamp) or datetime.now(timezone.utc),
+                      meter_stop)
+        if _is_backlog(_epoch(timestamp)):
+            ocpp_metrics.backlog_frames.inc("StopTransaction")
+
+        start_wh = self.open_tx.pop(transaction_id, None)
+        self.note(
+            always=True, tx_id=transaction_id, meter_stop=meter_stop, reason=reason,
+            kwh=None if start_wh is None else round((meter_stop - start_wh) / 1000, 3),
+        )
 
-        return _cr("StopTransaction", id_tag_info={"status": "Accepted"})
+        info = (await auth_tags.authorize(self._tenant_id(), id_tag)
+                if id_tag else {"status": "Accepted"})
+        return _cr("StopTransaction", id_tag_info=info)
 
 
 
     # ----------------------------- MeterValues -----------------------------
+    def _ingest(self, connector_id: int, transaction_id: int | None, meter_value: list):
+        """
+        Queue every sampled value for sample_buffer.  Returns the newest
+        register reading (energy_wh, its timestamp), the busiest-phase
+        current (for the balancer, only if we're in a site) and the newest
+        sample timestamp of the frame (epoch s).
+        """
+        energy_wh = energy_ts = current_a = None
+        newest = None
+        balanced = self.id in balancer.chargers
+        received = datetime.now(timezone.utc)
+        for sample in meter_value:
+            # parsed here: one garbage timestamp must not fail a whole
+            # bulk_create in sample_buffer – it gets the receive time
+            ts = _parse_ts(sample.get("timestamp"))
+            if ts is None:
+                ts = received
+            epoch = ts.timestamp()
+            if newest is None or epoch > newest:
+                newest = epoch
+            for sv in _sampled_values(sample):
+                measurand = sv.get("measurand") or ENERGY_REGISTER
+                try:
+                    value = float(sv["value"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if not math.isfinite(value):               # "NaN", "inf"
+                    continue
+                sample_buffer.add(
+                    self.id, transaction_id, connector_id, measurand,
+                    sv.get("phase", ""), sv.get("unit", ""), ts, value,
+                )
+                if measurand == ENERGY_REGISTER and not sv.get("phase"):
+                    if energy_ts is None or epoch >= energy_ts:
+                        energy_wh, energy_ts = value, epoch
+                elif balanced:
+                    amps = balancer.current_from(self.id, measurand, sv.get("phase", ""),
+                                                 sv.get("unit", ""), value)
+                    if amps is not None:                 # busiest phase counts
+                        current_a = amps if current_a is None else max(current_a, amps)
+        return energy_wh, energy_ts, current_a, newest
+
     @on("MeterValues")
     async def on_meter_values(
         self,
@@ -275,25 +403,25 @@ class MyChargePoint(CP):
         transaction_id: int | None = None,
         **_,
     ):
-        tx = await sync_to_async(
-            Transaction.objects.filter(pk=transaction_id).first
-        )()
-        if not tx:
-            return _cr("MeterValues")
-
-        energy_wh = None
-        for sample in meter_value:
-            for sv in sample.get("sampledValue", []):
-                if sv.get("measurand") == "Energy.Active.Import.Register":
-                    energy_wh = Decimal(sv["value"])
-                    break
-
-        if energy_wh is not None:
-            if tx.start_wh is None:
-                tx.start_wh = energy_wh
-            tx.latest_wh = energy_wh
-            await sync_to_async(tx.save)(update_fields=["start_wh", "latest_wh"])
-            print(f"[Meter] tx={transaction_id} energy={energy_wh} Wh")
+        # no DB round-trip here: every sampled value goes to sample_buffer
+        # (bulk_create), the newest register reading per transaction is
+        # coalesced in meter_buffer (one UPDATE per batch)
+        energy_wh, energy_ts, current_a, newest = self._ingest(
+            connector_id, transaction_id, meter_value)
+
+        # a reconnecting charger replays what it queued while offline:
+        # store it, but it says nothing about what the car draws now
+        if _is_backlog(newest):
+            ocpp_metrics.backlog_frames.inc("MeterValues")
+            self.note(backlog=True)
+        elif current_a is not None:
+            balancer.meter(self.id, current_a)
+
+        if energy_wh is not None and transaction_id is not None:
+            if meter_buffer.put(transaction_id, energy_wh, energy_ts):
+                self.note(tx_id=transaction_id, energy_wh=energy_wh)
+            else:                                   # older than what we have / stopped
+                self.note(tx_id=transaction_id, energy_wh=energy_wh, stale=True)
 
         return _cr("MeterValues")
 
@@ -303,7 +431,8 @@ class MyChargePoint(CP):
     #  constructor – keep super() but initialise small in-memory stores   #
     # ------------------------------------------------------------------ #
     def __init__(self, charge_point_id, websocket):
-        super().__init__(charge_point_id, websocket)
+        # python-ocpp's per-frame INFO lines go to "ocpp.frames" (see ocpp_log)
+        super().__init__(charge_point_id, websocket, logger=ocpp_log.frames)
 
         # simple, mutable stores for demo purposes
         self.config: dict[str, str] = {        # “key” → “value”
@@ -311,7 +440,13 @@ class MyChargePoint(CP):
             "ConnectionTimeOut": "180",
         }
         self.local_list_version: int = 1
-        self.charging_profiles: dict[int, dict] = {}   # profileId → blob
+        self.charging_profiles: dict[int, dict] = {}   # profileId → blob (snake_case)
+        self._profiles_loaded = False                  # see _load_profiles()
+
+        self._cmd_wakeup = asyncio.Event()             # set → drain CPCommands
+        self.snapshot: CPSnapshot | None = None        # set by _on_connect
+        self.open_tx: dict[int, float] = {}            # tx_id → meter_start
+        self._log_fields: dict = {}                    # see note()
     # ------------------------------------------------------------------ #
 
     # ─────────────────────────── GET-/CHANGE CONFIG ─────────────────── #
@@ -361,6 +496,29 @@ class MyChargePoint(CP):
     # ─────────────────────────────────────────────────────────────────── #
 
     # ─────────────────────── CHARGING-PROFILE CRUD  ─────────────────── #
+    async def _load_profiles(self) -> dict[int, dict]:
+        """Stored profiles, read once per connection (ocpp_schedule storage)."""
+        if not self._profiles_loaded:
+            stored = await db.run(ocpp_schedule.load_profiles, self.id)
+            self.charging_profiles = {**stored, **self.charging_profiles}
+            self._profiles_loaded = True
+        return self.charging_profiles
+
+    async def _store_profile(self, connector_id: int, profile: dict):
+        """install() in memory, mirror to the table (also used by _run_command)."""
+        profiles = await self._load_profiles()
+        dropped = ocpp_schedule.install(profiles, connector_id, profile)
+        pid = ocpp_schedule.normalize(profile)["charging_profile_id"]
+        await db.run(ocpp_schedule.save_profiles, self.id, profiles, [pid], dropped)
+        return pid
+
+    async def _clear_profiles(self, **filters) -> list[int]:
+        profiles = await self._load_profiles()
+        dropped = ocpp_schedule.clear(profiles, **filters)
+        if dropped:
+            await db.run(ocpp_schedule.save_profiles, self.id, profiles, [], dropped)
+        return dropped
+
     @on("SetChargingProfile")
     async def on_set_charging_profile(
         self,
@@ -368,19 +526,12 @@ class MyChargePoint(CP):
         cs_charging_profiles: dict,
         **_
     ):
-        pid = cs_charging_profiles.get("chargingProfileId")
-        if pid is None:
+        # python-ocpp hands nested keys over in snake_case
+        if cs_charging_profiles.get("charging_profile_id") is None:
             return _cr("SetChargingProfile", status="Rejected")
 
-        if not hasattr(self, "charging_profiles"):
-            self.charging_profiles = {}
-
-        self.charging_profiles[pid] = {
-            "connectorId": connector_id,
-            **cs_charging_profiles,
-        }
-
-        print(f"[Profile] saved profile #{pid} on {self.id}")
+        pid = await self._store_profile(connector_id, cs_charging_profiles)
+        self.note(profile_id=pid)
         return _cr("SetChargingProfile", status="Accepted")
 
     @on("ClearChargingProfile")
@@ -393,14 +544,15 @@ class MyChargePoint(CP):
         **_
     ):
         """
-        Super simple: if id is given remove that one, otherwise wipe all.
+        By id, otherwise every profile matching all the given filters
+        (no filters at all → everything).  Unknown if nothing matched.
         """
-        if id is not None:
-            self.charging_profiles.pop(id, None)
-        else:
-            self.charging_profiles.clear()
-
-        return _cr("ClearChargingProfile", status="Accepted")
+        dropped = await self._clear_profiles(
+            id=id, connector_id=connector_id,
+            purpose=charging_profile_purpose, stack_level=stack_level,
+        )
+        self.note(cleared=dropped)
+        return _cr("ClearChargingProfile", status="Accepted" if dropped else "Unknown")
 
     @on("FirmwareStatusNotification")
     async def on_firmware_status_notification(self, status: str, **kwargs):
@@ -408,11 +560,12 @@ class MyChargePoint(CP):
         CP -> CSMS. Status is one of:
           Idle, Downloading, Downloaded, Installing, Installed, DownloadFailed, InstallationFailed
         """
-        print(f"[FW]  {self.id} → {status}")
+        self.note(always=True, status=status)
         # Optional: persist last known firmware status
-        await sync_to_async(
-            ChargePoint.objects.filter(id=self.id).update
-        )(fw_status=status, updated=dj_timezone.now())  # remove/update fields if your model differs
+        await db.run(
+            ChargePoint.objects.filter(id=self.id).update,
+            fw_status=status, updated=dj_timezone.now(),
+        )  # remove/update fields if your model differs
         return _cr("FirmwareStatusNotification")
 
 
@@ -421,11 +574,12 @@ class MyChargePoint(CP):
         """
         CP -> CSMS. Status is usually Uploading / Uploaded / UploadFailed / Idle.
         """
-        print(f"[DIAG] {self.id} → {status}")
+        self.note(always=True, status=status)
         # Optional: persist last diagnostics status
-        await sync_to_async(
-            ChargePoint.objects.filter(id=self.id).update
-        )(diag_status=status, updated=dj_timezone.now())  # remove/update fields if your model differs
+        await db.run(
+            ChargePoint.objects.filter(id=self.id).update,
+            diag_status=status, updated=dj_timezone.now(),
+        )  # remove/update fields if your model differs
         return _cr("DiagnosticsStatusNotification")
 
     @on("GetCompositeSchedule")
@@ -437,29 +591,28 @@ class MyChargePoint(CP):
         **_
     ):
         """
-        Demo implementation:
-        • If **any** profiles exist we’ll make up a 1-entry schedule.
-        • Otherwise we report “Rejected”.
+        Stack the stored profiles (ocpp_schedule).  Rejected when no
+        profile exists at all – there is nothing to compose then.
         """
-        if not self.charging_profiles:
+        profiles = await self._load_profiles()
+        if not profiles:
             return _cr("GetCompositeSchedule", status="Rejected")
 
-        now_iso = datetime.now(timezone.utc).isoformat()
-
-        schedule = {
-            "duration": duration,
-            "startSchedule": now_iso,
-            "chargingRateUnit": charging_rate_unit or "A",
-            "chargingSchedulePeriod": [
-                {"startPeriod": 0, "limit": 16}
-            ],
-        }
-
+        # Relative profiles count from the session on that connector – the
+        # same lookup the composite-schedule API does
+        await tx_buffer.flush()               # a just-started session is in the DB
+        running = await db.run(ocpp_schedule.running_tx_start, self.id, connector_id)
+        start = datetime.now(timezone.utc)
+        schedule = ocpp_schedule.composite_schedule(
+            list(profiles.values()), connector_id, duration,
+            unit=charging_rate_unit or "A", start=start, tx_start=running,
+        )
+        self.note(periods=len(schedule["charging_schedule_period"]))
         return _cr(
             "GetCompositeSchedule",
             status="Accepted",
             connector_id=connector_id,
-            schedule_start=now_iso,
+            schedule_start=start.isoformat(),
             charging_schedule=schedule,
         )
     # ─────────────────────────────────────────────────────────────────── #
@@ -468,42 +621,189 @@ class MyChargePoint(CP):
 
 
 
-    async def _command_poller(self):
+    async def reload_snapshot(self):
+        """The row was edited through the API (notify "cp") – re-read it once."""
+        snap = await _load_cp(self.id)
+        if snap is not None:
+            self.snapshot = snap
+            await balancer.attach(self.id, snap.site_id)
+
+    async def apply_limit(self, limit_a: float, profile_id: int, stack_level: int) -> bool:
+        """
+        Site balancer: one-period TxDefaultProfile on connector 0.  Not
+        mirrored into ChargingProfile – it changes every few seconds and
+        the balancer re-sends it on every reconnect anyway.
+        """
+        resp = await self._run_command("SetChargingProfile", {
+            "connector_id": 0,
+            "cs_charging_profiles": {
+                "charging_profile_id": profile_id,
+                "stack_level": stack_level,
+                "charging_profile_purpose": "TxDefaultProfile",
+                "charging_profile_kind": "Absolute",
+                "charging_schedule": {
+                    "start_schedule": datetime.now(timezone.utc).isoformat(),
+                    "charging_rate_unit": "A",
+                    "charging_schedule_period": [{"start_period": 0, "limit": limit_a}],
+                },
+            },
+        }, track_profiles=False)
+        return getattr(resp, "status", None) == "Accepted"
+
+    async def clear_limit(self, profile_id: int) -> bool:
+        """Site balancer: the charger left its site – drop our profile."""
+        resp = await self._run_command("ClearChargingProfile", {"id": profile_id},
+                                       track_profiles=False)
+        return getattr(resp, "status", None) == "Accepted"
+
+    def wake_commands(self):
+        """Called by the hub when ocpp_bridge.notify() says a command is queued."""
+        self._cmd_wakeup.set()
+
+    async def _command_pump(self):
+        """
+        Sleep until woken, then drain this CP's CPCommand backlog.
+        An idle connection never touches the DB.
+        """
+        self._cmd_wakeup.set()          # deliver whatever queued while offline
         while True:
-            cmd = await next_for(self.id)
-            if cmd:
-                action, params = cmd
-                # --- NEW: translate payload keys ---------------------------
-                snake_params = {camel_to_snake(k): v for k, v in params.items()}
-                # -----------------------------------------------------------
-                print(f"[CMD] {self.id} → {action} {snake_params}")
-                if action == "FirmwareStatusNotification":
-                    action = "TriggerMessage"
-                    # Make sure we send the correct requested message
-                    # connector_id is optional; set 0 by default.
-                    snake_params = {"requested_message": "FirmwareStatusNotification",
-                                    "connector_id": snake_params.get("connector_id", 0)}
-                call_cls = getattr(c, action)          # e.g. c.RemoteStopTransaction
-                try:
-                    resp = await self.call(call_cls(**snake_params))
-                    print(f"[CMD]  ↳  {resp}")
-                except Exception as exc:
-                    print(f"[CMD]  ↳  ERROR {exc}")
-            await asyncio.sleep(1)
+            await self._cmd_wakeup.wait()
+            self._cmd_wakeup.clear()
+            while (cmd := await next_for(self.id)):
+                await self._run_command(*cmd)
+
+    async def _run_command(self, action: str, params: dict, track_profiles: bool = True):
+        # --- NEW: translate payload keys ---------------------------
+        snake_params = {camel_to_snake(k): v for k, v in params.items()}
+        # -----------------------------------------------------------
+        if action == "FirmwareStatusNotification":
+            action = "TriggerMessage"
+            # Make sure we send the correct requested message
+            # connector_id is optional; set 0 by default.
+            snake_params = {"requested_message": "FirmwareStatusNotification",
+                            "connector_id": snake_params.get("connector_id", 0)}
+        call_cls = getattr(c, action)          # e.g. c.RemoteStopTransaction
+        t0 = time.perf_counter()
+        try:
+            resp = await self.call(call_cls(**snake_params))
+            ocpp_metrics.commands.inc(action, "ok")
+            ocpp_log.event(action, cp_id=self.id, tenant=self._tenant_id(),
+                           latency_ms=(time.perf_counter() - t0) * 1000,
+                           force=True, direction="out", params=snake_params,
+                           response=resp)
+            if track_profiles and getattr(resp, "status", None) == "Accepted":
+                await self._track_profiles(action, snake_params)
+            return resp
+        except Exception as exc:
+            ocpp_metrics.commands.inc(action, "error")
+            ocpp_log.event(action, cp_id=self.id, tenant=self._tenant_id(),
+                           latency_ms=(time.perf_counter() - t0) * 1000,
+                           force=True, level=logging.WARNING, direction="out",
+                           params=snake_params, error=repr(exc))
+
+
+
+    async def _track_profiles(self, action: str, params: dict):
+        """Profiles the charger accepted from us feed composite schedules too."""
+        if action == "SetChargingProfile":
+            await self._store_profile(params.get("connector_id", 0),
+                                      params["cs_charging_profiles"])
+        elif action == "ClearChargingProfile":
+            await self._clear_profiles(
+                id=params.get("id"), connector_id=params.get("connector_id"),
+                purpose=params.get("charging_profile_purpose"),
+                stack_level=params.get("stack_level"),
+            )
 
+    # ───────────── one structured log record per call (ocpp_log) ──────
+    def note(self, always: bool = False, **fields):
+        """
+        Attach fields to the log record of the call being handled.
+        always=True bypasses the per-action sampling (state changes).
+        """
+        if always:
+            self._log_fields["force"] = True
+        self._log_fields.update(fields)
 
+    def _tenant_id(self):
+        tenant = getattr(self, "tenant", None)
+        return tenant.pk if tenant is not None else None
 
-    # ───────────── override CP.start() to launch the poller ────────
+    async def _handle_call(self, msg):
+        self._log_fields = {}
+        t0 = time.perf_counter()
+        try:
+            return await super()._handle_call(msg)
+        except Exception as exc:
+            ocpp_metrics.handler_errors.inc(msg.action)
+            self._log_fields.update(force=True, level=logging.WARNING, error=repr(exc))
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            profiler.call(msg.action, elapsed)
+            ocpp_metrics.messages.inc(msg.action)
+            ocpp_metrics.handler_latency.observe(elapsed, msg.action)
+            ocpp_log.event(
+                msg.action, cp_id=self.id, tenant=self._tenant_id(),
+                latency_ms=elapsed * 1000, **self._log_fields,
+            )
+
+
+
+    # ───────────── single-parse routing (see ocpp_sanitize) ─────────
+    async def route_message(self, raw_msg):
+        """
+        SanitizingWS hands over either the raw text or, for frames it had
+        to patch, the already-decoded list – never parse those twice.
+        """
+        liveness.touch(self.id)           # every inbound frame counts
+        token = profiler.begin(getattr(self._connection, "sanitize_s", 0.0))
+        try:
+            await self._route(raw_msg)
+        finally:
+            profiler.finish(token)
+
+    async def _route(self, raw_msg):
+        if isinstance(raw_msg, str):
+            return await super().route_message(raw_msg)
+
+        try:
+            msg = unpack_decoded(raw_msg)
+        except OCPPError as e:
+            log.warning("[%s] unable to parse message %r: %s", self.id, raw_msg, e)
+            return
+
+        if msg.message_type_id == MessageType.Call:
+            try:
+                await self._handle_call(msg)
+            except OCPPError as error:
+                log.exception("Error while handling request '%s'", msg)
+                await self._send(msg.create_call_error(error).to_json())
+        elif msg.message_type_id in (MessageType.CallResult, MessageType.CallError):
+            self._response_queue.put_nowait(msg)
+
+
+
+    # ───────────── override CP.start() to launch the pump ──────────
     async def start(self):
         """
         Run the normal python-ocpp loop *and* a side-task that feeds
         commands coming from the REST API.
         """
-        poller = asyncio.create_task(self._command_poller())
+        await hub.register(self.id, self)
+        pump = asyncio.create_task(self._command_pump())
         try:
             await super().start()             # ← blocks until WS closes
         finally:
-            poller.cancel()                   # tidy up when CP disconnects
+            pump.cancel()                     # tidy up when CP disconnects
+            status_buffer.forget(self.id)
+            if hub.local(self.id) is self:    # not replaced by a reconnect
+                balancer.detach(self.id)
+                if _draining:
+                    liveness.handover(self.id)  # the new process takes over
+                else:
+                    liveness.disconnect(self.id)
+            await hub.unregister(self.id, self)
 
 
 
@@ -522,32 +822,21 @@ async def _on_connect(websocket, path):
     ws_key = ws_key.lower()
 
     # ── ❶ who owns this key? ────────────────────────────────────────────
-    tenant = await sync_to_async(
-        lambda k: Tenant.objects.filter(ws_key=k).first()
-    )(ws_key)
+    tenant = await _get_tenant(ws_key)
     if tenant is None:
         await websocket.close(code=1008, reason="Unknown tenant key")
         return
 
     # ── ❷ make sure the CP row exists & is linked to that tenant ───────
-    def _ensure_cp():
-        cp, created = ChargePoint.objects.get_or_create(
-            id=cp_id,
-            defaults={"name": cp_id, "tenant": tenant},
-        )
-        # if the row pre-exists but has no tenant yet → attach it now
-        if cp.tenant_id is None:
-            cp.tenant = tenant
-            cp.save(update_fields=["tenant"])
-        return cp
-
-    await sync_to_async(_ensure_cp)()
+    snapshot = await _ensure_cp(cp_id, tenant)
 
     # ── ❸ start the OCPP handler ────────────────────────────────────────
     sanitized = SanitizingWS(websocket)
     cp = MyChargePoint(cp_id, sanitized)
     cp.tenant = tenant                # keep reference in the handler
+    cp.snapshot = snapshot            # cached ChargePoint row, see reload_snapshot()
     cp.tenant_key = ws_key
+    await balancer.attach(cp_id, snapshot.site_id)
 
     try:
         await cp.start()              # returns only when the socket closes
@@ -558,19 +847,370 @@ async def _on_connect(websocket, path):
 
 
 
+# ------------------------------------------------------------------------
+# 2. cross-process wake-ups  (see ocpp_bridge.notify)
+# ------------------------------------------------------------------------
+COMMAND_SWEEP_SECONDS = 60
+
+
+def _on_notify(kind: str, key: str):
+    if kind == "cmd":
+        hub.wake(key)
+        return
+
+    if kind == "profile":
+        _profile_control(key)
+        return
+    if kind == "config":                       # API asked for a fresh snapshot
+        if hub.local(key) is not None:
+            config_fetcher.request(key, force=True)
+        return
+    if kind == "site":                         # site limits edited
+        asyncio.create_task(balancer.reload_site(int(key)))
+        return
+    if kind == "idtag":                        # a tenant's tags changed
+        auth_tags.changed(int(key))
+        local_lists.tenant_changed(int(key))
+        return
+
+    ocpp_cache.invalidate(kind, key)
+    if kind == "cp":
+        cp = hub.local(key)
+        if cp is not None:
+            asyncio.create_task(cp.reload_snapshot())
+
+
+def _profile_control(verb: str):
+    """manage.py ocpp_profile on|off|reset|dump – see ocpp_profile."""
+    if verb == "on":
+        profiler.enable()
+    elif verb == "off":
+        profiler.disable()
+    elif verb == "reset":
+        profiler.reset()
+    elif verb == "dump":
+        profiler.dump(notify_dir())
+    log.info("handler profiler: %s (enabled=%s)", verb, profiler.enabled)
+
+
+# ------------------------------------------------------------------------
+# 4. graceful restart  (SIGTERM → drain, see Command._serve)
+# ------------------------------------------------------------------------
+_draining = False
+
+# 1012 = Service Restart, 1001 = Going Away – both mean "come back soon"
+DRAIN_CLOSE_CODES = (1012, 1001)
+
+
+async def _drain(ws_server, seconds: float):
+    """
+    Hand this process's chargers over to a new one listening on the same
+    port (SO_REUSEPORT): stop accepting, persist everything buffered, then
+    close the open websockets spread over `seconds` so the reconnects
+    trickle in instead of arriving as one boot storm.
+    """
+    global _draining
+    _draining = True
+    ws_server.server.close()          # listening socket only – sessions stay
+    log.info("draining: stopped accepting, %d chargers to hand over", len(hub.ids()))
+
+    await meter_buffer.flush(force=True)    # flushes tx_buffer first
+    await sample_buffer.flush(force=True)
+    await status_buffer.flush(force=True)
+    await liveness.flush()
+
+    async def close_later(cp):
+        await asyncio.sleep(random.uniform(0, seconds))
+        try:
+            await cp._connection.close(code=random.choice(DRAIN_CLOSE_CODES),
+                                       reason="server restart")
+        except Exception:
+            pass                      # already gone
+
+    chargers = [cp for cp in map(hub.local, hub.ids()) if cp is not None]
+    await asyncio.gather(*(close_later(cp) for cp in chargers))
+    log.info("draining: done")
+
+
+async def _command_sweeper():
+    """
+    Safety net for lost datagrams: one query per minute for the whole
+    process, not one per connection.
+    """
+    while True:
+        await asyncio.sleep(COMMAND_SWEEP_SECONDS)
+        try:
+            for cp_id in await pending_for(hub.ids()):
+                hub.wake(cp_id)
+        except Exception:
+            log.exception("command sweep failed")
+
+
+
+# ------------------------------------------------------------------------
+# 5. per-process services – shared by runocpp and the ASGI consumer
+# ------------------------------------------------------------------------
+_services: dict | None = None
+_services_lock = asyncio.Lock()
+
+
+async def start_services(worker: int = 0, workers: int = 1, metrics: bool = True,
+                         logger: str = ""):
+    """
+    Everything an OCPP-serving process runs besides its sockets: log queue,
+    notify listener, write-behind buffers, liveness, fetchers, balancer,
+    metrics.  Idempotent – the ASGI consumer calls it on every connect,
+    with logger="ocpp" so only our own records go through the log queue.
+    """
+    global _services
+    async with _services_lock:
+        if _services is not None:
+            return
+        ocpp_log.setup(logger=logger)        # log I/O off the event loop
+        codec = ocpp_codec.install(getattr(settings, "OCPP_JSON_BACKEND", "auto"))
+        log.info("OCPP JSON backend: %s", codec)
+        ocpp_profile.install()
+
+        listener = NotifyListener(_on_notify)
+        await listener.start()
+        sweeper = asyncio.create_task(_command_sweeper())
+        tx_buffer.start()
+        meter_buffer.start()
+        sample_buffer.start()
+        status_buffer.start()
+        liveness.start()
+        config_fetcher.start()
+        balancer.share = 1 / workers         # sites may span processes, see ocpp_balancer
+        balancer.start()
+        local_lists.start()
+        await tx_ids.warm()
+
+        metrics_server = None
+        metrics_port = getattr(settings, "OCPP_METRICS_PORT", None)
+        if metrics_port and metrics:
+            metrics_host = getattr(settings, "OCPP_METRICS_HOST", "127.0.0.1")
+            try:
+                metrics_server = await ocpp_metrics.serve(metrics_host, metrics_port + worker)
+                log.info("metrics on http://%s:%s/metrics", metrics_host, metrics_port + worker)
+            except OSError as exc:            # port taken – serve OCPP anyway
+                log.error("metrics endpoint not started on %s:%s: %s",
+                          metrics_host, metrics_port + worker, exc)
+
+        _services = {"listener": listener, "sweeper": sweeper, "metrics": metrics_server}
+
+
+async def stop_services():
+    """Stop the background tasks and write out every buffer."""
+    global _services
+    async with _services_lock:
+        if _services is None:
+            return
+        services, _services = _services, None
+        services["sweeper"].cancel()
+        services["listener"].close()
+        await config_fetcher.stop()
+        await balancer.stop()
+        await local_lists.stop()
+        if services["metrics"] is not None:
+            services["metrics"].close()
+        await meter_buffer.stop()          # flushes tx_buffer first
+        await tx_buffer.stop()
+        await sample_buffer.stop()
+        await status_buffer.stop()
+        await liveness.stop()
+        log.info("meter buffer on shutdown: %s", meter_buffer.stats())
+        log.info("status buffer on shutdown: %s", status_buffer.stats())
+        log.info("db executor on shutdown: %s", db.stats())
+        log.info("balancer on shutdown: %s", balancer.stats())
+        log.info("auth on shutdown: %s, local lists: %s",
+                 auth_tags.stats(), local_lists.stats())
+        log.info("log queue on shutdown: %s", ocpp_log.stats())
+        db.shutdown()
+        ocpp_log.shutdown()
+
+
+# ------------------------------------------------------------------------
+# 3. scrape-time gauges for /metrics  (see ocpp_metrics)
+# ------------------------------------------------------------------------
+@ocpp_metrics.collector
+async def _process_gauges():
+    per_tenant: dict = {}
+    for cp_id in hub.ids():
+        cp = hub.local(cp_id)
+        if cp is not None:
+            key = (str(cp._tenant_id()),)
+            per_tenant[key] = per_tenant.get(key, 0) + 1
+
+    buffers = (tx_buffer, meter_buffer, sample_buffer, status_buffer)
+    dbs, logs = db.stats(), ocpp_log.stats()
+    return [
+        ("ocpp_connected_chargers", "Websockets open in this process.",
+         ("tenant",), sorted(per_tenant.items())),
+        ("ocpp_online_chargers", "Chargers heard from within OCPP_OFFLINE_AFTER.",
+         (), [((), liveness.stats()["online"])]),
+        ("ocpp_buffer_pending_rows", "Rows waiting in the write-behind buffers.",
+         ("buffer",), [((b.name,), b.stats()["pending"]) for b in buffers]),
+        ("ocpp_db_in_flight", "ORM calls submitted and not finished.",
+         (), [((), dbs["in_flight"])]),
+        ("ocpp_db_queued", "ORM calls waiting for a DB thread.",
+         (), [((), dbs["queued"])]),
+        ("ocpp_log_dropped", "Log records dropped because the queue was full.",
+         (), [((), logs["dropped"])]),
+    ]
+
+
+@ocpp_metrics.collector
+async def _balancer_gauges():
+    s = balancer.stats()
+    per_site = [((str(site.id),), sum(c.alloc_a for c in site.chargers.values()))
+                for site in balancer.sites.values()]
+    return [
+        ("ocpp_balancer_allocated_amps", "Current handed out per site (this process).",
+         ("site",), per_site),
+        ("ocpp_balancer_events", "Status/meter events seen by the balancer.",
+         (), [((), s["events"])]),
+        ("ocpp_balancer_pushes", "SetChargingProfile limits accepted / failed.",
+         ("result",), [(("ok",), s["pushes"]), (("error",), s["push_failures"])]),
+    ]
+
+
+@ocpp_metrics.collector
+async def _command_backlog():
+    return [
+        ("ocpp_command_queue_depth", "Undelivered CPCommands (fleet-wide).",
+         (), [((), await pending_count())]),
+    ]
+
+
+
 # ───────────────────── Django management-command shell ────────────────────
 class Command(BaseCommand):
     help = "Run an OCPP-1.6 CSMS on ws://0.0.0.0:9000"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=9000)
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Fork N worker processes sharing the port via SO_REUSEPORT.",
+        )
+        parser.add_argument(
+            "--reuse-port", action="store_true",
+            help="Bind with SO_REUSEPORT so a new runocpp can start next to "
+                 "this one for a rolling restart (implied by --workers).",
+        )
+        parser.add_argument(
+            "--drain-seconds", type=float,
+            default=getattr(settings, "OCPP_DRAIN_SECONDS", 30),
+            help="On SIGTERM close connections spread over this many seconds "
+                 "(0 = close at once). A second SIGTERM or SIGINT stops now.",
+        )
+
     def handle(self, *args, **options):
-        asyncio.run(self._serve())
+        # our own process: configure logging here, not on import – the ASGI
+        # consumer imports this module into a server that has its own
+        logging.basicConfig(level=logging.INFO)
+        logging.getLogger("websockets.server").setLevel(logging.WARNING)
+
+        host, port = options["host"], options["port"]
+        workers = max(1, options["workers"])
+        self.drain_seconds = options["drain_seconds"]
+        if workers == 1:
+            if options["reuse_port"] and not hasattr(socket, "SO_REUSEPORT"):
+                raise CommandError("--reuse-port needs SO_REUSEPORT (Linux / BSD).")
+            asyncio.run(self._serve(host, port, reuse_port=options["reuse_port"]))
+        else:
+            self._supervise(host, port, workers)
+
+    # ---------------------------------------------------------------- #
+    #  --workers N : pre-fork, the kernel spreads accepts over workers  #
+    # ---------------------------------------------------------------- #
+    def _supervise(self, host: str, port: int, workers: int):
+        """
+        Fork N children that each run their own event loop on the same
+        port.  Commands need no extra routing: every worker binds its own
+        notify socket, enqueue() pokes all of them and only the worker
+        holding that charger's websocket has it in its hub.
+        """
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise CommandError("--workers needs SO_REUSEPORT (Linux / BSD).")
+
+        connections.close_all()          # never share DB sockets across fork
 
-    async def _serve(self):
-        await websockets.serve(
-            _on_connect, host="0.0.0.0", port=9000, subprotocols=["ocpp1.6"]
+        children: set[int] = set()
+        for index in range(workers):
+            pid = os.fork()
+            if pid == 0:                 # ── child ──
+                code = 0
+                try:
+                    asyncio.run(self._serve(host, port, reuse_port=True,
+                                            worker=index, workers=workers))
+                except Exception:
+                    log.exception("worker %s crashed", os.getpid())
+                    code = 1
+                finally:
+                    os._exit(code)
+            children.add(pid)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🟢  {workers} OCPP workers on ws://{host}:{port} ({sorted(children)})"
+        ))
+
+        def _forward(signum, _frame):
+            for pid in children:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGINT, _forward)
+        signal.signal(signal.SIGTERM, _forward)
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            log.info("worker %s exited (%s)", pid, os.waitstatus_to_exitcode(status))
+
+    # ---------------------------------------------------------------- #
+    async def _serve(self, host: str = "0.0.0.0", port: int = 9000,
+                     reuse_port: bool = False, worker: int = 0, workers: int = 1):
+        await start_services(worker=worker, workers=workers)
+
+        # SIGTERM = graceful (drain), SIGINT or a second SIGTERM = now
+        stop, hard_stop = asyncio.Event(), asyncio.Event()
+
+        def _on_sigterm():
+            if stop.is_set():
+                hard_stop.set()
+            stop.set()
+
+        def _on_sigint():
+            hard_stop.set()
+            stop.set()
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, _on_sigterm)
+        loop.add_signal_handler(signal.SIGINT, _on_sigint)
+        loop.add_signal_handler(signal.SIGUSR1, profiler.dump)
+
+        ws_server = await websockets.serve(
+            _on_connect, host=host, port=port, subprotocols=["ocpp1.6"],
+            reuse_port=reuse_port,
         )
         self.stdout.write(
-            self.style.SUCCESS("🟢  OCPP 1.6 listening on ws://0.0.0.0:9000")
+            self.style.SUCCESS(f"🟢  OCPP 1.6 listening on ws://{host}:{port} (pid {os.getpid()})")
         )
-        await asyncio.Future()  # keep the loop alive
-
+        try:
+            await stop.wait()       # keep the loop alive until SIGINT/SIGTERM
+            drain_seconds = getattr(self, "drain_seconds", 0)
+            if not hard_stop.is_set() and drain_seconds > 0:
+                drain = asyncio.create_task(_drain(ws_server, drain_seconds))
+                hard = asyncio.create_task(hard_stop.wait())
+                await asyncio.wait({drain, hard}, return_when=asyncio.FIRST_COMPLETED)
+                drain.cancel()
+                hard.cancel()
+        finally:
+            await stop_services()
@@ -0,0 +1,104 @@
+# csms/management/commands/simulate_fleet.py
+import asyncio
+import json
+import resource
+
+from django.core.management.base import BaseCommand, CommandError
+
+from csms.models import Tenant
+from csms.ocpp_bridge import notify_dir
+from csms.ocpp_simulator import Fleet, Scenario, rss_kb
+
+
+class Command(BaseCommand):
+    help = "Load-test a running runocpp with N simulated OCPP 1.6 chargers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="ws://127.0.0.1:9000")
+        parser.add_argument("--ws-key", help="tenant key (default: first tenant in the DB)")
+        parser.add_argument("--count", type=int, default=1000, help="chargers")
+        parser.add_argument("--prefix", default="SIM", help="charger id prefix")
+        parser.add_argument("--ramp", type=float, default=200,
+                            help="new connections per second (0 = all at once)")
+        parser.add_argument("--duration", type=float, default=60,
+                            help="seconds to run after the ramp")
+        parser.add_argument("--heartbeat", type=float, default=30, help="seconds")
+        parser.add_argument("--status-interval", type=float, default=0,
+                            help="mean seconds between extra status flips (0 = off)")
+        parser.add_argument("--session-every", type=float, default=120,
+                            help="mean seconds between sessions per charger (0 = none)")
+        parser.add_argument("--session-length", type=float, default=60, help="seconds")
+        parser.add_argument("--meter-interval", type=float, default=10, help="seconds")
+        parser.add_argument("--storm-every", type=float, default=0,
+                            help="reconnect storm period in seconds (0 = off)")
+        parser.add_argument("--server-pid", type=int, action="append",
+                            help="runocpp pid(s) for RSS (default: from OCPP_NOTIFY_DIR)")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def handle(self, *args, **o):
+        ws_key = o["ws_key"]
+        if not ws_key:
+            tenant = Tenant.objects.order_by("pk").first()
+            if tenant is None:
+                raise CommandError("no tenant in the DB – pass --ws-key")
+            ws_key = tenant.ws_key
+
+        scenario = Scenario(
+            url=o["url"], ws_key=ws_key, count=o["count"], prefix=o["prefix"],
+            ramp=o["ramp"], duration=o["duration"], heartbeat=o["heartbeat"],
+            status_interval=o["status_interval"], session_every=o["session_every"],
+            session_length=o["session_length"], meter_interval=o["meter_interval"],
+            storm_every=o["storm_every"],
+        )
+
+        # one fd per charger – lift the soft limit as far as we may
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < scenario.count + 100 and soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        pids = o["server_pid"] or [
+            int(p.stem) for p in notify_dir().glob("*.sock") if p.stem.isdigit()
+        ]
+        peak_rss: dict[int, int] = {}
+
+        def tick(fleet, elapsed):
+            s = fleet.stats
+            for pid in pids:
+                kb = rss_kb(pid)
+                if kb is not None:
+                    peak_rss[pid] = max(peak_rss.get(pid, 0), kb)
+            calls = sum(len(v) for v in s.rtt.values())
+            self.stdout.write(
+                f"{elapsed:7.1f}s  connected={s.connect_ok} failed={s.connect_failed} "
+                f"calls={calls} errors={sum(s.errors.values())} "
+                f"rss={sum(peak_rss.values()) // 1024} MB"
+            )
+
+        fleet = Fleet(scenario)
+        asyncio.run(fleet.run(on_tick=tick))
+
+        report = fleet.report()
+        report["server_rss_mb"] = {
+            pid: round(kb / 1024, 1) for pid, kb in sorted(peak_rss.items())
+        }
+        if o["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("── connections"))
+        for k in ("chargers", "connect_ok", "connect_failed", "connect_rate",
+                  "connect_p50_ms", "connect_p99_ms", "disconnects", "storms",
+                  "server_calls"):
+            self.stdout.write(f"{k:<18} {report[k]}")
+        self.stdout.write(self.style.MIGRATE_HEADING("── round-trip per action"))
+        for action, r in report["rtt"].items():
+            self.stdout.write(
+                f"{action:<22} n={r['n']:<8} p50={r['p50_ms']:>8} ms"
+                f"  p99={r['p99_ms']:>8} ms  max={r['max_ms']:>8} ms"
+            )
+        self.stdout.write(self.style.MIGRATE_HEADING("── errors"))
+        for k, v in sorted(report["errors"].items()) or [("none", 0)]:
+            self.stdout.write(f"{k:<30} {v}")
+        self.stdout.write(self.style.MIGRATE_HEADING("── server peak RSS"))
+        for pid, mb in report["server_rss_mb"].items() or [("?", "n/a")]:
+            self.stdout.write(f"pid {pid:<10} {mb} MB")
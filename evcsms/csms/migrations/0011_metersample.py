@@ -0,0 +1,31 @@
+# Generated by Django 4.2.14 on 2026-10-16 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0010_chargepoint_lat_chargepoint_lng_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeterSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connector_id', models.PositiveSmallIntegerField(default=0)),
+                ('measurand', models.CharField(max_length=50)),
+                ('phase', models.CharField(blank=True, max_length=10)),
+                ('unit', models.CharField(blank=True, max_length=16)),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('cp', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='samples', to='csms.chargepoint')),
+                ('tx', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='samples', to='csms.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tx', 'measurand', 'timestamp'], name='csms_meters_tx_id_2625dc_idx'), models.Index(fields=['cp', 'timestamp'], name='csms_meters_cp_id_4c5239_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0012_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chargepoint',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chargepoint',
+            name='online',
+            field=models.BooleanField(default=False),
+        ),
+    ]
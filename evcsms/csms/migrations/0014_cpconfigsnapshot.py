@@ -0,0 +1,31 @@
+# Generated by Django 4.2.14 on 2026-10-17 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0013_chargepoint_last_seen_chargepoint_online'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CPConfigSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('checked_at', models.DateTimeField()),
+                ('keys', models.JSONField(default=list)),
+                ('unknown', models.JSONField(default=list)),
+                ('local_list_version', models.IntegerField(blank=True, null=True)),
+                ('digest', models.CharField(max_length=40)),
+                ('cp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='config_snapshots', to='csms.chargepoint')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cp', 'version'), name='uniq_cp_config_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.14 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0014_cpconfigsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargingProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connector_id', models.PositiveIntegerField(default=0)),
+                ('profile_id', models.IntegerField()),
+                ('stack_level', models.PositiveIntegerField(default=0)),
+                ('purpose', models.CharField(max_length=32)),
+                ('payload', models.JSONField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('cp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charging_profiles', to='csms.chargepoint')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cp', 'profile_id'), name='uniq_cp_profile_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.14 on 2026-10-17 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0015_chargingprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('max_current_a', models.DecimalField(decimal_places=1, max_digits=7)),
+                ('min_current_a', models.DecimalField(decimal_places=1, default=6, max_digits=5)),
+                ('charger_max_a', models.DecimalField(decimal_places=1, default=32, max_digits=5)),
+                ('phases', models.PositiveSmallIntegerField(default=3)),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sites', to='csms.tenant')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chargepoint',
+            name='site',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chargers', to='csms.site'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.14 on 2026-10-17 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0016_site_chargepoint_site'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_tag', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('Accepted', 'Accepted'), ('Blocked', 'Blocked'), ('Expired', 'Expired'), ('Invalid', 'Invalid')], default='Accepted', max_length=10)),
+                ('expiry_date', models.DateTimeField(blank=True, null=True)),
+                ('parent_id_tag', models.CharField(blank=True, max_length=20)),
+                ('local', models.BooleanField(default=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('deleted', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='id_tags', to='csms.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tenant', 'version'], name='csms_idtag_tenant__42a58c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'id_tag'), name='uniq_tenant_id_tag')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csms', '0017_idtag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='connector_id',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
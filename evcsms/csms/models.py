@@ -61,6 +61,26 @@ class Tenant(models.Model):
         return self.name or f"tenant-{self.pk}"
 
 
+# ──────────────────────────────────────────
+#  SITE  (chargers behind one grid connection)
+# ──────────────────────────────────────────
+class Site(models.Model):
+    """
+    Chargers sharing one grid connection.  runocpp's load balancer
+    (csms.ocpp_balancer) keeps their sum below max_current_a per phase.
+    """
+    tenant        = models.ForeignKey(Tenant, on_delete=models.CASCADE,
+                                      related_name="sites", null=True, blank=True)
+    name          = models.CharField(max_length=100)
+    max_current_a = models.DecimalField(max_digits=7, decimal_places=1)
+    min_current_a = models.DecimalField(max_digits=5, decimal_places=1, default=6)
+    charger_max_a = models.DecimalField(max_digits=5, decimal_places=1, default=32)
+    phases        = models.PositiveSmallIntegerField(default=3)
+
+    def __str__(self):
+        return self.name
+
+
 # ──────────────────────────────────────────
 #  CHARGE POINT
 # ──────────────────────────────────────────
@@ -88,6 +108,11 @@ class ChargePoint(models.Model):
     location       = models.CharField(max_length=255, blank=True, default="", null=True)
     lat = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     lng = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    site      = models.ForeignKey(Site, on_delete=models.SET_NULL, related_name="chargers",
+                                  null=True, blank=True)
+    # liveness – written in batches by csms.ocpp_liveness
+    last_seen = models.DateTimeField(null=True, blank=True)
+    online    = models.BooleanField(default=False)
 
     def has_coords(self):
         return self.lat is not None and self.lng is not None
@@ -104,6 +129,8 @@ class Transaction(models.Model):
     cp         = models.ForeignKey(ChargePoint, on_delete=models.CASCADE,
                                    related_name="transaction")
     user_tag   = models.CharField(max_length=50, blank=True)
+    # NULL for sessions recorded before the connector was stored
+    connector_id = models.PositiveSmallIntegerField(null=True, blank=True)
     start_wh   = models.FloatField(null=True, blank=True)
     latest_wh  = models.FloatField(null=True, blank=True)
     start_time = models.DateTimeField()
@@ -185,3 +212,190 @@ class CPCommand(models.Model):
     class Meta:
         indexes = [models.Index(fields=["cp", "done_at", "created"])]
 
+
+
+# ──────────────────────────────────────────
+#  METER SAMPLE  (full MeterValues time series)
+# ──────────────────────────────────────────
+class MeterSample(models.Model):
+    """
+    One sampled value of a MeterValues frame (energy, power, current,
+    voltage, SoC, temperature …).  Inserted in batches by
+    csms.ocpp_buffers.sample_buffer, so the FKs carry no DB constraint:
+    a sample may be written before its StartTransaction row is.
+    """
+    cp           = models.ForeignKey(ChargePoint, on_delete=models.DO_NOTHING,
+                                     related_name="samples", db_constraint=False)
+    tx           = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING,
+                                     related_name="samples", db_constraint=False,
+                                     null=True, blank=True)
+    connector_id = models.PositiveSmallIntegerField(default=0)
+    measurand    = models.CharField(max_length=50)
+    phase        = models.CharField(max_length=10, blank=True)
+    unit         = models.CharField(max_length=16, blank=True)
+    timestamp    = models.DateTimeField()
+    value        = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tx", "measurand", "timestamp"]),
+            models.Index(fields=["cp", "timestamp"]),
+        ]
+
+    @classmethod
+    def series_for(cls, tx_id: int) -> dict:
+        """
+        All samples of one session as compact parallel arrays:
+
+            {"Power.Active.Import": {"unit": "W", "t": [epoch, …], "v": [float, …]},
+             "Current.Import/L1":   {…}, …}
+        """
+        out: dict[str, dict] = {}
+        rows = (
+            cls.objects
+            .filter(tx_id=tx_id)
+            .order_by("timestamp")
+            .values_list("measurand", "phase", "unit", "timestamp", "value")
+        )
+        for measurand, phase, unit, ts, value in rows.iterator(chunk_size=5000):
+            key = f"{measurand}/{phase}" if phase else measurand
+            s = out.get(key)
+            if s is None:
+                s = out[key] = {"unit": unit, "t": [], "v": []}
+            s["t"].append(int(ts.timestamp()))
+            s["v"].append(value)
+        return out
+
+
+# ──────────────────────────────────────────
+#  ID SEQUENCE  (block-reserving counter)
+# ──────────────────────────────────────────
+class IdSequence(models.Model):
+    """
+    One row per named counter (e.g. "transaction").  OCPP workers reserve
+    blocks of ids with a single UPDATE and hand them out from memory, see
+    csms.ocpp_ids.
+    """
+    name       = models.CharField(primary_key=True, max_length=40)
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} → {self.next_value}"
+
+
+# ──────────────────────────────────────────
+#  CONFIGURATION SNAPSHOT  (GetConfiguration, versioned)
+# ──────────────────────────────────────────
+class CPConfigSnapshot(models.Model):
+    """
+    What a charger reported for GetConfiguration (+ GetLocalListVersion).
+    Fetched by runocpp (csms.ocpp_config); a new version is written only
+    when the content changed, otherwise just checked_at moves.
+    """
+    cp                 = models.ForeignKey(ChargePoint, on_delete=models.CASCADE,
+                                           related_name="config_snapshots")
+    version            = models.PositiveIntegerField()
+    taken_at           = models.DateTimeField()
+    checked_at         = models.DateTimeField()
+    keys               = models.JSONField(default=list)    # [{"key", "value", "readonly"}]
+    unknown            = models.JSONField(default=list)
+    local_list_version = models.IntegerField(null=True, blank=True)
+    digest             = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cp", "version"], name="uniq_cp_config_version"),
+        ]
+
+    def __str__(self):
+        return f"{self.cp_id} config v{self.version}"
+
+    def as_dict(self) -> dict:
+        return {
+            "cp":                 self.cp_id,
+            "version":            self.version,
+            "taken_at":           self.taken_at.isoformat(),
+            "checked_at":         self.checked_at.isoformat(),
+            "configuration":      self.keys,
+            "unknown":            self.unknown,
+            "local_list_version": self.local_list_version,
+        }
+
+    @classmethod
+    def latest_qs(cls, cp_ids):
+        """The newest snapshot row of each charger."""
+        newest = (
+            cls.objects.filter(cp=models.OuterRef("cp"))
+            .order_by("-version").values("version")[:1]
+        )
+        return cls.objects.filter(cp_id__in=cp_ids, version=models.Subquery(newest))
+
+    @classmethod
+    def latest_for(cls, cp_ids) -> dict:
+        """{cp_id: newest snapshot} for many chargers in one query."""
+        return {s.cp_id: s for s in cls.latest_qs(cp_ids)}
+
+
+# ──────────────────────────────────────────
+#  CHARGING PROFILE  (Set/ClearChargingProfile, for composite schedules)
+# ──────────────────────────────────────────
+class ChargingProfile(models.Model):
+    """
+    One installed csChargingProfiles blob per charger, kept in snake_case.
+    Written by runocpp; csms.ocpp_schedule stacks them into composite
+    schedules.
+    """
+    cp           = models.ForeignKey(ChargePoint, on_delete=models.CASCADE,
+                                     related_name="charging_profiles")
+    connector_id = models.PositiveIntegerField(default=0)
+    profile_id   = models.IntegerField()
+    stack_level  = models.PositiveIntegerField(default=0)
+    purpose      = models.CharField(max_length=32)
+    payload      = models.JSONField()
+    updated      = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cp", "profile_id"], name="uniq_cp_profile_id"),
+        ]
+
+    def __str__(self):
+        return f"{self.cp_id} profile {self.profile_id} ({self.purpose}/{self.stack_level})"
+
+    def as_dict(self) -> dict:
+        return {"connector_id": self.connector_id, **self.payload}
+
+
+# ──────────────────────────────────────────
+#  ID TAG  (authorization + chargers' local lists)
+# ──────────────────────────────────────────
+class IdTag(models.Model):
+    """
+    An RFID / app token of a tenant.  runocpp answers Authorize from an
+    in-memory copy (csms.ocpp_auth) and pushes changes to the chargers'
+    local lists as SendLocalList deltas.
+
+    version is the tenant's list version at the tag's last change (from
+    IdSequence "idtags:<tenant>"); deleting only sets `deleted` so the
+    removal can still be sent as a delta.
+    """
+    STATUSES = [(s, s) for s in ("Accepted", "Blocked", "Expired", "Invalid")]
+
+    tenant        = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="id_tags")
+    id_tag        = models.CharField(max_length=20)           # OCPP IdToken
+    status        = models.CharField(max_length=10, choices=STATUSES, default="Accepted")
+    expiry_date   = models.DateTimeField(null=True, blank=True)
+    parent_id_tag = models.CharField(max_length=20, blank=True)
+    local         = models.BooleanField(default=True)         # part of local lists
+    version       = models.PositiveBigIntegerField(default=0)
+    deleted       = models.BooleanField(default=False)
+    updated       = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tenant", "id_tag"], name="uniq_tenant_id_tag"),
+        ]
+        indexes = [models.Index(fields=["tenant", "version"])]
+
+    def __str__(self):
+        return f"{self.id_tag} ({self.status})"
@@ -0,0 +1,275 @@
+# csms/ocpp_auth.py
+"""
+Id-tag authorization and local-list sync.
+
+Authorize:  TagCache holds every IdTag of a tenant in memory, loaded with
+            one query on first use.  A tag that isn't there gets
+            OCPP_AUTH_UNKNOWN_STATUS straight away – unknown tags never
+            reach the DB.  Changes come
+            in as deltas (rows with version > what we have) on
+            notify("idtag", tenant_id), or at the latest after
+            OCPP_AUTH_REFRESH_S in case a datagram was lost.
+Local list: LocalListSync brings a charger's SendLocalList list up to the
+            tenant's version: GetLocalListVersion, then a Differential
+            update with just the tags changed since, or a Full one when the
+            charger is empty, ahead of us or too far behind.
+Versions:   every IdTag write takes the next value of IdSequence
+            "idtags:<tenant>" inside its transaction (bump_version()); the
+            sequence row lock keeps commit order equal to version order,
+            so a delta never skips a change.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Max
+
+from csms.models import IdTag
+from csms.ocpp_db import db
+from csms.ocpp_hub import hub
+from csms.ocpp_ids import reserve_block
+
+log = logging.getLogger("ocpp")
+
+REFRESH_S = getattr(settings, "OCPP_AUTH_REFRESH_S", 60)
+MAX_DELTA = getattr(settings, "OCPP_LOCAL_LIST_MAX_DELTA", 500)
+# answer for tags nobody registered – "Accepted" keeps the behaviour from
+# before IdTag existed; "Invalid" (deny by default) is an explicit opt-in
+UNKNOWN_STATUS = getattr(settings, "OCPP_AUTH_UNKNOWN_STATUS", "Accepted")
+
+
+# ───────────────────────────── versions ────────────────────────────────
+def sequence_name(tenant_id: int) -> str:
+    return f"idtags:{tenant_id}"
+
+
+def bump_version(tenant_id: int) -> int:
+    """Sync, call inside the transaction that writes the IdTag."""
+    return reserve_block(sequence_name(tenant_id), 1)[0]
+
+
+def id_tag_info(status: str, expiry_date: datetime | None = None,
+                parent_id_tag: str = "") -> dict:
+    info = {"status": status}
+    if expiry_date is not None:
+        info["expiry_date"] = expiry_date.isoformat()
+    if parent_id_tag:
+        info["parent_id_tag"] = parent_id_tag
+    return info
+
+
+# ───────────────────────────── Authorize ───────────────────────────────
+class _TenantTags:
+    __slots__ = ("tags", "version", "checked")
+
+    def __init__(self):
+        self.tags: dict[str, tuple] = {}      # id_tag → (status, expiry, parent)
+        self.version = 0
+        self.checked = 0.0                    # monotonic of the last refresh
+
+
+def _load_changes(tenant_id: int, since: int) -> list[tuple]:
+    return list(
+        IdTag.objects.filter(tenant_id=tenant_id, version__gt=since)
+        .values_list("id_tag", "status", "expiry_date", "parent_id_tag", "deleted", "version")
+    )
+
+
+class TagCache:
+    def __init__(self, refresh_s: float = REFRESH_S):
+        self.refresh_s = refresh_s
+        self._tenants: dict[int, _TenantTags] = {}
+        self._refreshing: dict[int, asyncio.Task] = {}
+        self.hits = self.unknown = self.loads = 0
+
+    async def _refresh(self, tenant_id: int):
+        entry = self._tenants.get(tenant_id) or _TenantTags()
+        rows = await db.run(_load_changes, tenant_id, entry.version)
+        for id_tag, status, expiry, parent, deleted, version in rows:
+            if deleted:
+                entry.tags.pop(id_tag, None)
+            else:
+                entry.tags[id_tag] = (status, expiry, parent)
+            entry.version = max(entry.version, version)
+        entry.checked = time.monotonic()
+        self._tenants[tenant_id] = entry
+        self.loads += 1
+
+    async def refresh(self, tenant_id: int):
+        """Apply the changes since our version; concurrent callers share one query."""
+        task = self._refreshing.get(tenant_id)
+        if task is None:
+            task = self._refreshing[tenant_id] = asyncio.ensure_future(self._refresh(tenant_id))
+            task.add_done_callback(lambda _t: self._refreshing.pop(tenant_id, None))
+        await asyncio.shield(task)
+
+    def changed(self, tenant_id: int):
+        """notify("idtag", tenant): pull the delta in the background."""
+        if tenant_id in self._tenants:
+            asyncio.ensure_future(self.refresh(tenant_id))
+
+    async def authorize(self, tenant_id: int | None, id_tag: str) -> dict:
+        """idTagInfo for an Authorize / Start / Stop answer."""
+        if tenant_id is None:
+            return id_tag_info(UNKNOWN_STATUS)
+        entry = self._tenants.get(tenant_id)
+        if entry is None:
+            await self.refresh(tenant_id)             # first use: the one query
+            entry = self._tenants[tenant_id]
+        elif time.monotonic() - entry.checked > self.refresh_s:
+            self.changed(tenant_id)                   # stale: answer now, refresh behind
+
+        tag = entry.tags.get(id_tag)
+        if tag is None:
+            self.unknown += 1
+            return id_tag_info(UNKNOWN_STATUS)
+        self.hits += 1
+        status, expiry, parent = tag
+        if status == "Accepted" and expiry is not None and expiry <= datetime.now(timezone.utc):
+            status = "Expired"
+        return id_tag_info(status, expiry, parent)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._tenants),
+            "tags":    sum(len(e.tags) for e in self._tenants.values()),
+            "hits":    self.hits,
+            "unknown": self.unknown,
+            "loads":   self.loads,
+        }
+
+
+# ──────────────────────────── local lists ──────────────────────────────
+def list_update(tenant_id: int, charger_version: int) -> tuple[int, str | None, list]:
+    """
+    Sync: what brings a charger at `charger_version` up to date.
+    Returns (tenant version, "Differential" | "Full" | None, entries).
+    """
+    current = (IdTag.objects.filter(tenant_id=tenant_id)
+               .aggregate(v=Max("version"))["v"] or 0)
+    if current == 0 or charger_version == current:
+        return current, None, []
+
+    if 0 < charger_version < current:
+        changes = list(
+            IdTag.objects.filter(tenant_id=tenant_id, version__gt=charger_version)
+            [:MAX_DELTA + 1]
+        )
+        if len(changes) <= MAX_DELTA:
+            # no idTagInfo = remove: deleted, or taken off the local lists
+            return current, "Differential", [
+                {"id_tag": t.id_tag} if t.deleted or not t.local else
+                {"id_tag": t.id_tag,
+                 "id_tag_info": id_tag_info(t.status, t.expiry_date, t.parent_id_tag)}
+                for t in changes
+            ]
+
+    # empty, ahead of us (list reset on the charger) or too far behind
+    return current, "Full", [
+        {"id_tag": t.id_tag, "id_tag_info": id_tag_info(t.status, t.expiry_date, t.parent_id_tag)}
+        for t in IdTag.objects.filter(tenant_id=tenant_id, local=True, deleted=False)
+    ]
+
+
+class LocalListSync:
+    """Queue of chargers whose local list may be behind; N workers."""
+    def __init__(self, concurrency: int = 5):
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue | None = None
+        self._queued: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+        self.unsupported: set[str] = set()     # answered NotSupported once
+        self.deltas = self.fulls = self.current = self.failed = 0
+
+    def start(self):
+        if not self._workers:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker())
+                             for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def request(self, cp_id: str):
+        if self._queue is None or cp_id in self._queued or cp_id in self.unsupported:
+            return
+        self._queued.add(cp_id)
+        self._queue.put_nowait(cp_id)
+
+    def tenant_changed(self, tenant_id: int):
+        """Every local charger of that tenant."""
+        for cp_id in hub.ids():
+            cp = hub.local(cp_id)
+            if cp is not None and cp._tenant_id() == tenant_id:
+                self.request(cp_id)
+
+    async def _worker(self):
+        while True:
+            cp_id = await self._queue.get()
+            self._queued.discard(cp_id)
+            cp = hub.local(cp_id)
+            if cp is None:
+                continue
+            try:
+                await self.sync(cp)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.failed += 1
+                log.warning("[%s] local list sync failed: %r", cp_id, exc)
+
+    async def sync(self, cp):
+        from ocpp.v16 import call as c
+
+        tenant_id = cp._tenant_id()
+        if tenant_id is None:
+            return
+        have = (await cp.call(c.GetLocalListVersion())).list_version
+        cp.local_list_version = have
+        if have == -1:                           # LocalAuthListManagement off
+            self.unsupported.add(cp.id)
+            return
+
+        version, kind, entries = await db.run(list_update, tenant_id, have)
+        if kind is None:
+            self.current += 1
+            return
+        resp = await cp.call(c.SendLocalList(
+            list_version=version, update_type=kind, local_authorization_list=entries))
+        if resp.status == "VersionMismatch" and kind == "Differential":
+            version, kind, entries = await db.run(list_update, tenant_id, 0)
+            resp = await cp.call(c.SendLocalList(
+                list_version=version, update_type=kind, local_authorization_list=entries))
+        if resp.status == "NotSupported":
+            self.unsupported.add(cp.id)
+            return
+        if resp.status != "Accepted":
+            raise RuntimeError(f"SendLocalList {kind}: {resp.status}")
+
+        cp.local_list_version = version
+        if kind == "Full":
+            self.fulls += 1
+        else:
+            self.deltas += 1
+        log.info("[%s] local list → v%s (%s, %d entries)", cp.id, version, kind, len(entries))
+
+    def stats(self) -> dict:
+        return {
+            "queued":      self._queue.qsize() if self._queue else 0,
+            "deltas":      self.deltas,
+            "fulls":       self.fulls,
+            "current":     self.current,
+            "failed":      self.failed,
+            "unsupported": len(self.unsupported),
+        }
+
+
+tags = TagCache()
+local_lists = LocalListSync(concurrency=getattr(settings, "OCPP_LOCAL_LIST_CONCURRENCY", 5))
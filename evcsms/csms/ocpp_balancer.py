@@ -0,0 +1,336 @@
+# csms/ocpp_balancer.py
+"""
+Site load balancing: chargers sharing one grid connection (Site) split its
+max_current_a between them.
+
+    StatusNotification ─┐
+    MeterValues        ─┼─► balancer.status()/meter()   O(1), marks the site dirty
+    connect/disconnect ─┘
+                              every OCPP_BALANCER_INTERVAL_MS:
+                              re-allocate the dirty sites only
+                              push SetChargingProfile to the chargers whose
+                              limit moved by ≥ OCPP_BALANCER_STEP_A
+
+Allocation per site is max-min fair ("water filling"): every active
+charger gets at least min_current_a (if the site can't afford that for
+all of them, the most recently started ones are paused at 0 A), nobody
+gets more than it can use, and whatever a charger leaves unused goes to
+the others.  What a charger "can use" comes from MeterValues: one that
+draws clearly less than it was given (car-limited) is capped at its draw
+plus headroom, the rest may go up to charger_max_a.
+
+Allocations are pushed as a TxDefaultProfile on connector 0 with a fixed
+profile id and stack level, so each push replaces the previous one and
+user profiles with a higher stack level still win.
+
+All state is in memory and per process.  With runocpp --workers N a site's
+chargers may be spread over N processes that don't see each other, so
+each process only hands out max_current_a / N – never more than the grid
+connection allows, at the price of head-room when the spread is uneven.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+
+from csms.models import Site
+from csms.ocpp_db import db
+from csms.ocpp_hub import hub
+
+log = logging.getLogger("ocpp")
+
+INTERVAL_MS = getattr(settings, "OCPP_BALANCER_INTERVAL_MS", 1000)
+STEP_A = getattr(settings, "OCPP_BALANCER_STEP_A", 1.0)
+HEADROOM_A = getattr(settings, "OCPP_BALANCER_HEADROOM_A", 2.0)
+# chargingProfileId of the balancer's TxDefaultProfile – high enough to
+# stay clear of ids operators hand out
+DEFAULT_PROFILE_ID = 900_001
+PROFILE_ID = getattr(settings, "OCPP_BALANCER_PROFILE_ID", DEFAULT_PROFILE_ID)
+STACK_LEVEL = getattr(settings, "OCPP_BALANCER_STACK_LEVEL", 50)
+# failed pushes are retried after interval × 2^failures, capped here
+RETRY_MAX_S = getattr(settings, "OCPP_BALANCER_RETRY_MAX_S", 60)
+
+# statuses in which a connector wants (or may soon want) power
+ACTIVE = frozenset({"Preparing", "Charging", "SuspendedEVSE", "SuspendedEV"})
+VOLTS = 230.0
+
+
+class Charger:
+    __slots__ = ("cp_id", "site", "connectors", "since", "draw_a", "alloc_a", "sent_a",
+                 "failures", "retry_at")
+
+    def __init__(self, cp_id: str, site: "SiteState"):
+        self.cp_id = cp_id
+        self.site = site
+        self.connectors: set[int] = set()      # connectors in an ACTIVE status
+        self.since = 0.0                       # became active (pause order)
+        self.draw_a: float | None = None       # last measured current
+        self.alloc_a = 0.0                     # what the site gives it
+        self.sent_a: float | None = None       # what the charger was told
+        self.failures = 0                      # failed pushes in a row
+        self.retry_at = 0.0                    # monotonic, no push before
+
+    @property
+    def active(self) -> bool:
+        return bool(self.connectors)
+
+    def demand(self, max_a: float) -> float:
+        """What this charger can use, from its last reading."""
+        if self.draw_a is None or self.draw_a >= self.alloc_a - HEADROOM_A:
+            return max_a
+        return min(max_a, self.draw_a + HEADROOM_A)
+
+
+class SiteState:
+    __slots__ = ("id", "capacity_a", "min_a", "max_a", "phases", "chargers")
+
+    def __init__(self, site_id: int, capacity_a: float, min_a: float,
+                 max_a: float, phases: int):
+        self.id = site_id
+        self.capacity_a = capacity_a
+        self.min_a = min_a
+        self.max_a = max_a
+        self.phases = phases
+        self.chargers: dict[str, Charger] = {}
+
+    def allocate(self):
+        """Max-min fair split of capacity_a over the active chargers."""
+        active = [c for c in self.chargers.values() if c.active]
+        for c in self.chargers.values():
+            if not c.active:
+                c.alloc_a = 0.0
+
+        # can't give everyone the minimum → newest sessions wait at 0 A
+        fits = int(self.capacity_a // self.min_a) if self.min_a > 0 else len(active)
+        if len(active) > fits:
+            active.sort(key=lambda c: c.since)
+            for c in active[fits:]:
+                c.alloc_a = 0.0
+            active = active[:fits]
+
+        remaining = self.capacity_a
+        wants = sorted(((max(self.min_a, c.demand(self.max_a)), c) for c in active),
+                       key=lambda w: w[0])
+        for i, (want, c) in enumerate(wants):
+            share = remaining / (len(wants) - i)
+            c.alloc_a = int(min(want, share) * 10) / 10       # round down, 0.1 A
+            remaining -= c.alloc_a
+
+
+class Balancer:
+    def __init__(self, interval_ms: int = INTERVAL_MS, step_a: float = STEP_A):
+        self.interval = interval_ms / 1000
+        self.step_a = step_a
+        self.share = 1.0                         # 1 / runocpp workers
+        self.sites: dict[int, SiteState] = {}
+        self.chargers: dict[str, Charger] = {}
+        self._dirty: set[int] = set()
+        self._pushing: set[str] = set()
+        self._task: asyncio.Task | None = None
+        self.events = self.rebalances = self.pushes = self.push_failures = 0
+        self.last_pass_ms = 0.0
+
+    # ------------------------------------------------------------------ #
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ───────────────────────── membership ───────────────────────────── #
+    async def attach(self, cp_id: str, site_id: int | None):
+        """(Re)connect: put the charger under its site, or none."""
+        old = self.chargers.get(cp_id)
+        if old is not None and old.site.id == site_id:
+            return
+        self.detach(cp_id)
+        if site_id is None:
+            if old is not None:
+                self._release(old)                # taken off its site
+            return
+        site = self.sites.get(site_id)
+        if site is None:
+            site = await self._load_site(site_id)
+            if site is None:
+                return
+        self.chargers[cp_id] = site.chargers[cp_id] = Charger(cp_id, site)
+
+    def detach(self, cp_id: str):
+        ch = self.chargers.pop(cp_id, None)
+        if ch is None:
+            return
+        ch.site.chargers.pop(cp_id, None)
+        if ch.active:
+            self._dirty.add(ch.site.id)          # its current goes to the others
+
+    async def _load_site(self, site_id: int) -> SiteState | None:
+        row = await db.run(Site.objects.filter(pk=site_id).first)
+        if row is None:
+            return None
+        site = self.sites.get(site_id)
+        if site is None:
+            site = self.sites[site_id] = SiteState(site_id, 0, 0, 0, 3)
+        site.capacity_a = float(row.max_current_a) * self.share
+        site.min_a = float(row.min_current_a)
+        site.max_a = float(row.charger_max_a)
+        site.phases = row.phases
+        return site
+
+    async def reload_site(self, site_id: int):
+        """notify("site", id): limits were edited, or the site deleted."""
+        if site_id not in self.sites:
+            return
+        if await self._load_site(site_id) is None:
+            self.drop_site(site_id)
+            return
+        self._dirty.add(site_id)
+
+    def drop_site(self, site_id: int):
+        """The site is gone: its chargers are no longer balanced."""
+        site = self.sites.pop(site_id, None)
+        if site is None:
+            return
+        for cp_id, ch in site.chargers.items():
+            self.chargers.pop(cp_id, None)
+            self._release(ch)
+        site.chargers.clear()
+        self._dirty.discard(site_id)
+
+    def _release(self, ch: Charger):
+        """Take our profile off a charger that is no longer balanced."""
+        cp = hub.local(ch.cp_id)
+        if cp is not None and ch.sent_a is not None:
+            asyncio.create_task(cp.clear_limit(PROFILE_ID))
+
+    # ─────────────────────────── events ─────────────────────────────── #
+    def status(self, cp_id: str, connector_id: int, status: str):
+        ch = self.chargers.get(cp_id)
+        if ch is None:
+            return
+        self.events += 1
+        was = ch.active
+        if connector_id == 0:                     # whole charger
+            if status not in ACTIVE:
+                ch.connectors.clear()
+        elif status in ACTIVE:
+            ch.connectors.add(connector_id)
+        else:
+            ch.connectors.discard(connector_id)
+        if ch.active != was:
+            if ch.active:
+                ch.since = time.monotonic()
+            ch.draw_a = None
+            self._dirty.add(ch.site.id)
+
+    def meter(self, cp_id: str, current_a: float):
+        ch = self.chargers.get(cp_id)
+        if ch is None:
+            return
+        self.events += 1
+        before = ch.demand(ch.site.max_a)
+        ch.draw_a = current_a
+        # only a change of what the charger can use moves allocations
+        if ch.active and abs(ch.demand(ch.site.max_a) - before) >= self.step_a:
+            self._dirty.add(ch.site.id)
+
+    def current_from(self, cp_id: str, measurand: str, phase: str, unit: str,
+                     value: float) -> float | None:
+        """Current (A) from one sampled value, if it says anything about it."""
+        if measurand == "Current.Import":
+            return value
+        if measurand == "Power.Active.Import":
+            ch = self.chargers.get(cp_id)
+            phases = ch.site.phases if ch is not None else 3
+            watts = value * 1000 if unit == "kW" else value
+            return watts / (VOLTS * (1 if phase else phases))
+        return None
+
+    # ────────────────────────── rebalance ───────────────────────────── #
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.rebalance()
+            except Exception:
+                log.exception("balancer pass failed")
+
+    def rebalance(self) -> int:
+        """Re-allocate the dirty sites; returns the number of pushes started."""
+        if not self._dirty:
+            return 0
+        t0 = time.perf_counter()
+        dirty, self._dirty = self._dirty, set()
+        started = 0
+        now = time.monotonic()
+        for site_id in dirty:
+            site = self.sites.get(site_id)
+            if site is None:
+                continue
+            site.allocate()
+            self.rebalances += 1
+            for ch in site.chargers.values():
+                if not ch.active:
+                    continue                          # draws nothing, told on activation
+                if ch.sent_a is not None and abs(ch.alloc_a - ch.sent_a) < self.step_a \
+                        and (ch.alloc_a > 0 or ch.sent_a == 0):
+                    continue                          # nothing worth telling it
+                if ch.cp_id in self._pushing:
+                    self._dirty.add(site_id)          # retry once it answered
+                    continue
+                if now < ch.retry_at:
+                    continue                          # backing off, _push re-dirties
+                self._pushing.add(ch.cp_id)
+                asyncio.create_task(self._push(ch, ch.alloc_a))
+                started += 1
+        self.last_pass_ms = (time.perf_counter() - t0) * 1000
+        return started
+
+    async def _push(self, ch: Charger, limit_a: float):
+        try:
+            cp = hub.local(ch.cp_id)
+            ok = cp is not None and await cp.apply_limit(limit_a, PROFILE_ID, STACK_LEVEL)
+            if ok:
+                ch.sent_a = limit_a
+                ch.failures = 0
+                ch.retry_at = 0.0
+                self.pushes += 1
+            else:
+                self._retry_later(ch)
+        except Exception as exc:
+            log.warning("[%s] balancer push failed: %r", ch.cp_id, exc)
+            self._retry_later(ch)
+        finally:
+            self._pushing.discard(ch.cp_id)
+
+    def _retry_later(self, ch: Charger):
+        """Limit unknown – resend after a backoff, whatever else happens."""
+        ch.sent_a = None
+        ch.failures += 1
+        self.push_failures += 1
+        delay = min(self.interval * 2 ** ch.failures, RETRY_MAX_S)
+        ch.retry_at = time.monotonic() + delay
+        asyncio.get_running_loop().call_later(delay, self._dirty.add, ch.site.id)
+
+    def stats(self) -> dict:
+        return {
+            "sites":         len(self.sites),
+            "chargers":      len(self.chargers),
+            "events":        self.events,
+            "rebalances":    self.rebalances,
+            "pushes":        self.pushes,
+            "push_failures": self.push_failures,
+            "last_pass_ms":  round(self.last_pass_ms, 3),
+        }
+
+
+balancer = Balancer()
@@ -1,20 +1,133 @@
 # csms/ocpp_bridge.py
+import asyncio
+import json
+import os
+import socket
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from csms.models import ChargePoint, CPCommand
-from asgiref.sync import sync_to_async
+from csms.ocpp_db import db
+
+
+# ── wake-up channel between the REST side and the OCPP process(es) ─────────
+#
+# Every running OCPP process binds one unix datagram socket
+# <OCPP_NOTIFY_DIR>/<pid>.sock.  enqueue() writes the CPCommand row (the
+# durable backlog) and then drops a tiny datagram into every socket found
+# there; the process that holds the charger wakes its command pump, the
+# others simply ignore the message.
+#
+def notify_dir() -> Path:
+    return Path(getattr(
+        settings, "OCPP_NOTIFY_DIR",
+        Path(tempfile.gettempdir()) / "evcsms-ocpp",
+    ))
+
+
+def notify(kind: str, key: str) -> None:
+    """
+    Fire-and-forget: tell every OCPP process that <kind> changed for <key>.
+    kind = "cmd" → a CPCommand for charge-point <key> is waiting.
+    Lost datagrams are harmless, the OCPP side sweeps the backlog.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return
+    try:
+        paths = list(notify_dir().glob("*.sock"))
+    except OSError:
+        return
+    if not paths:
+        return
+
+    msg = json.dumps({"t": kind, "k": key}).encode()
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    s.setblocking(False)
+    try:
+        for path in paths:
+            try:
+                s.sendto(msg, str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # socket of a process that died without cleaning up
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            except OSError:
+                pass                          # receiver buffer full etc.
+    finally:
+        s.close()
+
+
+class _NotifyProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_message):
+        self._on_message = on_message
+
+    def datagram_received(self, data, addr):
+        try:
+            msg = json.loads(data)
+            kind, key = msg["t"], msg["k"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self._on_message(kind, key)
+
+
+class NotifyListener:
+    """
+    OCPP-process side of notify(): bind <pid>.sock and call
+    on_message(kind, key) on the event loop for every datagram.
+    """
+    def __init__(self, on_message):
+        self._on_message = on_message
+        self._transport = None
+        self.path = notify_dir() / f"{os.getpid()}.sock"
+
+    async def start(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(str(self.path))
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _NotifyProtocol(self._on_message), sock=sock,
+        )
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
 
 # ── plain sync helper ───────────────────────────────────────────
 def enqueue(cp_id: str, action: str, params: dict):
     """
-    Synchronous: insert one command row.
+    Synchronous: insert one command row and wake the OCPP side.
     Called from the REST view (sync code).
     """
     cp = ChargePoint.objects.get(pk=cp_id)
     CPCommand.objects.create(cp=cp, action=action, payload=params)
+    transaction.on_commit(lambda: notify("cmd", cp.id))
+
+# ── async helpers for the OCPP side ─────────────────────────────
+async def next_for(cp_id: str):
+    return await db.run(_next_for, cp_id)
 
-# ── async helper for the OCPP side ──────────────────────────────
-@sync_to_async
-def next_for(cp_id: str):
+
+def _next_for(cp_id: str):
     cmd = (
         CPCommand.objects
         .filter(cp_id=cp_id, done_at__isnull=True)
@@ -27,3 +140,27 @@ def next_for(cp_id: str):
     cmd.done_at = timezone.now()
     cmd.save(update_fields=["done_at"])
     return cmd.action, cmd.payload
+
+
+async def pending_for(cp_ids: list[str]) -> set[str]:
+    """
+    One query for the whole process: which of these CPs still have
+    undelivered commands?  Used as a slow safety-net sweep.
+    """
+    return await db.run(_pending_for, cp_ids)
+
+
+def _pending_for(cp_ids: list[str]) -> set[str]:
+    if not cp_ids:
+        return set()
+    return set(
+        CPCommand.objects
+        .filter(cp_id__in=cp_ids, done_at__isnull=True)
+        .values_list("cp_id", flat=True)
+        .distinct()
+    )
+
+
+async def pending_count() -> int:
+    """Undelivered commands, fleet-wide (metrics)."""
+    return await db.run(CPCommand.objects.filter(done_at__isnull=True).count)
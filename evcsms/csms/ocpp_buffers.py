@@ -0,0 +1,430 @@
+# csms/ocpp_buffers.py
+"""
+Write-behind buffers for the OCPP server.
+
+High-frequency charger frames are absorbed in memory and written in
+batches by one background task per buffer, instead of one DB round-trip
+per frame.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Coalesce
+
+from csms.models import ChargePoint, MeterSample, Transaction
+from csms.ocpp_db import db
+
+log = logging.getLogger("ocpp")
+
+# a batch that keeps failing is retried with backoff (interval × 2^n, at
+# most RETRY_MAX_S); after MAX_ATTEMPTS its rows are written one by one
+# and the rows that still fail are dropped – logged, never re-queued
+MAX_ATTEMPTS = getattr(settings, "OCPP_FLUSH_MAX_ATTEMPTS", 8)
+RETRY_MAX_S = getattr(settings, "OCPP_FLUSH_RETRY_MAX_S", 60)
+
+
+class WriteBehind:
+    """
+    Keyed, coalescing buffer: put() overwrites the pending row for a key,
+    a background task hands everything pending to _write() every
+    `interval_ms` or as soon as `max_rows` keys are waiting.
+
+    Subclasses implement _write(rows) (sync, runs in a worker thread)
+    and optionally _merge(old, new).  Buffers listed in `depends_on` are
+    flushed first, e.g. transaction inserts before meter updates.
+
+    A failed batch goes back into the buffer and the next flush waits
+    for the backoff; after MAX_ATTEMPTS failures in a row the rows are
+    tried one at a time so a single bad row can't poison the buffer.
+    """
+    def __init__(self, name: str, interval_ms: int = 500, max_rows: int = 500,
+                 depends_on: tuple["WriteBehind", ...] = ()):
+        self.name = name
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.depends_on = depends_on
+
+        self._pending: dict = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._failing = 0                 # failed flushes in a row
+        self._retry_at = 0.0              # monotonic, no flush before (backoff)
+
+        # counters – read them through stats()
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_batch = 0
+        self.max_batch = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    # ------------------------------------------------------------------ #
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the timer task and write out whatever is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force=True)
+
+    def __len__(self):
+        return len(self._pending)
+
+    # ------------------------------------------------------------------ #
+    def _put(self, key, row):
+        old = self._pending.get(key)
+        self._pending[key] = row if old is None else self._merge(old, row)
+        if len(self._pending) >= self.max_rows:
+            self._wake.set()
+
+    def discard(self, key):
+        self._pending.pop(key, None)
+
+    def kick(self):
+        """Flush on the next loop iteration instead of waiting for the timer."""
+        self._wake.set()
+
+    def _merge(self, old, new):
+        return new
+
+    def _write(self, rows: dict):
+        raise NotImplementedError
+
+    def _write_each(self, rows: dict) -> dict:
+        """Sync: _write() row by row; returns {key: (row, error)} of the failures."""
+        failed = {}
+        for key, row in rows.items():
+            try:
+                self._write({key: row})
+            except Exception as exc:
+                failed[key] = (row, exc)
+        return failed
+
+    # ------------------------------------------------------------------ #
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self, force: bool = False):
+        """force=True ignores the backoff (shutdown, drain)."""
+        for dep in self.depends_on:
+            await dep.flush(force)
+        async with self._lock:
+            if not self._pending:
+                return
+            if not force and time.monotonic() < self._retry_at:
+                return
+            batch, self._pending = self._pending, {}
+
+            t0 = time.perf_counter()
+            written = len(batch)
+            try:
+                # no timeout: a write abandoned mid-way would be retried twice
+                if self._failing >= MAX_ATTEMPTS:
+                    written -= await self._isolate(batch)
+                else:
+                    await db.run(self._write, batch, timeout=0)
+            except Exception:
+                self.failures += 1
+                self._failing += 1
+                self._retry_at = time.monotonic() + min(
+                    self.interval * 2 ** self._failing, RETRY_MAX_S)
+                log.exception("[%s] flush of %d rows failed (attempt %d)",
+                              self.name, len(batch), self._failing)
+                self._requeue(batch)
+                return
+            self._failing = 0
+            self._retry_at = 0.0
+
+            ms = (time.perf_counter() - t0) * 1000
+            self.flushes += 1
+            self.rows_written += written
+            self.last_batch = len(batch)
+            self.max_batch = max(self.max_batch, len(batch))
+            self.last_flush_ms = ms
+            self.max_flush_ms = max(self.max_flush_ms, ms)
+            self.total_flush_ms += ms
+
+    def _requeue(self, batch: dict):
+        """Put rows back without clobbering newer values."""
+        for key, row in batch.items():
+            if key in self._pending:
+                self._pending[key] = self._merge(row, self._pending[key])
+            else:
+                self._pending[key] = row
+
+    async def _isolate(self, batch: dict) -> int:
+        """The batch keeps failing: write what can be written, drop the rest."""
+        failed = await db.run(self._write_each, batch, timeout=0)
+        for key, (row, exc) in failed.items():
+            log.error("[%s] dropping row %r after %d failed flushes: %r",
+                      self.name, row, self._failing, exc)
+        self.dropped += len(failed)
+        return len(failed)
+
+    def stats(self) -> dict:
+        return {
+            "pending":        len(self._pending),
+            "flushes":        self.flushes,
+            "rows_written":   self.rows_written,
+            "failures":       self.failures,
+            "dropped":        self.dropped,
+            "last_batch":     self.last_batch,
+            "max_batch":      self.max_batch,
+            "avg_batch":      self.rows_written / self.flushes if self.flushes else 0,
+            "last_flush_ms":  round(self.last_flush_ms, 3),
+            "max_flush_ms":   round(self.max_flush_ms, 3),
+            "avg_flush_ms":   round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0,
+        }
+
+
+# ─────────────────────── Start/StopTransaction ─────────────────────────
+class TxBuffer(WriteBehind):
+    """
+    tx_id → (insert fields | None, (stop_time, meter_stop) | None).
+    Start and Stop are acknowledged from memory and written right after
+    (begin()/end() kick the flush task): inserts via bulk_create, stops
+    via bulk_update.  A Start and Stop caught in the same batch become
+    one finished row.
+    """
+    def begin(self, tx_id: int, **fields):
+        self._put(tx_id, (fields, None))
+        self.kick()
+
+    def end(self, tx_id: int, stop_time, meter_stop):
+        self._put(tx_id, (None, (stop_time, meter_stop)))
+        self.kick()
+
+    def _merge(self, old, new):
+        return old[0] or new[0], new[1] or old[1]
+
+    def _write(self, rows: dict):
+        creates, stops = [], []
+        for tx_id, (fields, stop) in rows.items():
+            if fields is not None:
+                tx = Transaction(tx_id=tx_id, **fields)
+                if stop is not None:
+                    tx.stop_time, tx.latest_wh = stop
+                creates.append(tx)
+            elif stop is not None:
+                stops.append(Transaction(tx_id=tx_id, stop_time=stop[0], latest_wh=stop[1]))
+
+        with transaction.atomic():
+            if creates:
+                # a retried batch may already be in – don't fail on it
+                Transaction.objects.bulk_create(creates, batch_size=500,
+                                                ignore_conflicts=True)
+            if stops:
+                Transaction.objects.bulk_update(stops, ["stop_time", "latest_wh"],
+                                                batch_size=500)
+
+
+tx_buffer = TxBuffer(
+    "transactions",
+    interval_ms=getattr(settings, "OCPP_TX_FLUSH_MS", 100),
+    max_rows=getattr(settings, "OCPP_TX_FLUSH_ROWS", 500),
+)
+
+
+# ──────────────────────────── MeterValues ──────────────────────────────
+class MeterBuffer(WriteBehind):
+    """
+    tx_id → (first_wh, latest_wh).  Only the newest register reading per
+    open transaction survives until the next flush; first_wh back-fills
+    start_wh for transactions that were started without a meter value.
+
+    Readings are ordered by the charger's timestamp, not by arrival: a
+    replayed offline backlog can't move latest_wh backwards, and after
+    close() (StopTransaction – meter_stop is final) late frames for that
+    transaction are ignored.  The UPDATE also skips stopped rows, which
+    covers a stop handled by another process.
+    """
+    MAX_TRACKED = 50_000                  # newest-timestamp memory, least recently updated evicted
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._newest: dict[int, float] = {}   # tx_id → newest ts seen (inf = closed)
+        self.stale = 0
+        self.after_stop = 0
+
+    def put(self, tx_id: int, energy_wh: float, ts: float | None = None) -> bool:
+        """False if an equal-or-newer reading (or the stop) was seen already."""
+        ts = time.time() if ts is None else ts
+        newest = self._newest.get(tx_id)
+        if newest is not None and ts < newest:
+            if newest == math.inf:
+                self.after_stop += 1
+            else:
+                self.stale += 1
+            return False
+        self._track(tx_id, ts)
+        self._put(tx_id, (energy_wh, energy_wh))
+        return True
+
+    def close(self, tx_id: int):
+        """StopTransaction: drop the pending reading, ignore later ones."""
+        self.discard(tx_id)
+        self._track(tx_id, math.inf)
+
+    def _track(self, tx_id: int, ts: float):
+        # re-insert so dict order is least recently updated first: an
+        # active session is never the one evicted
+        self._newest.pop(tx_id, None)
+        self._newest[tx_id] = ts
+        if len(self._newest) > self.MAX_TRACKED:
+            del self._newest[next(iter(self._newest))]
+
+    def _merge(self, old, new):
+        return old[0], new[1]
+
+    def _write(self, rows: dict):
+        items = list(rows.items())
+        with transaction.atomic():
+            for i in range(0, len(items), 500):
+                chunk = items[i:i + 500]
+                latest = Case(*[When(tx_id=t, then=Value(last)) for t, (_, last) in chunk],
+                              output_field=FloatField())
+                first = Case(*[When(tx_id=t, then=Value(f)) for t, (f, _) in chunk],
+                             output_field=FloatField())
+                Transaction.objects.filter(
+                    tx_id__in=[t for t, _ in chunk], stop_time__isnull=True,
+                ).update(latest_wh=latest, start_wh=Coalesce(F("start_wh"), first))
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "stale":      self.stale,
+            "after_stop": self.after_stop,
+        }
+
+
+meter_buffer = MeterBuffer(
+    "meter",
+    interval_ms=getattr(settings, "OCPP_METER_FLUSH_MS", 500),
+    max_rows=getattr(settings, "OCPP_METER_FLUSH_ROWS", 500),
+    depends_on=(tx_buffer,),          # rows must exist before we update them
+)
+
+
+# ─────────────────────────── meter time series ──────────────────────────
+class SampleBuffer(WriteBehind):
+    """
+    Append-only: every sampled value of every MeterValues frame becomes
+    one MeterSample row.  add() only appends a tuple; model instances are
+    built in the flush thread and inserted with bulk_create.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seq = itertools.count()
+
+    def add(self, cp_id, tx_id, connector_id, measurand, phase, unit, timestamp, value):
+        self._put(next(self._seq), (
+            cp_id, tx_id, connector_id, measurand, phase, unit, timestamp, value,
+        ))
+
+    def _write(self, rows: dict):
+        MeterSample.objects.bulk_create(
+            [
+                MeterSample(
+                    cp_id=cp_id, tx_id=tx_id, connector_id=connector_id,
+                    measurand=measurand, phase=phase, unit=unit,
+                    timestamp=timestamp, value=value,
+                )
+                for cp_id, tx_id, connector_id, measurand, phase, unit, timestamp, value
+                in rows.values()
+            ],
+            batch_size=1000,
+        )
+
+
+sample_buffer = SampleBuffer(
+    "samples",
+    interval_ms=getattr(settings, "OCPP_SAMPLE_FLUSH_MS", 1000),
+    max_rows=getattr(settings, "OCPP_SAMPLE_FLUSH_ROWS", 5000),
+)
+
+
+# ─────────────────────────── StatusNotification ─────────────────────────
+class StatusBuffer(WriteBehind):
+    """
+    Change-only, debounced status persistence.
+
+    • last-known status per (cp, connector) in memory – a repeat of the
+      same status (reconnects, periodic triggers) never reaches the DB;
+    • real changes wait at most `interval_ms`; a burst such as
+      Preparing→Charging inside that window becomes one UPDATE, and all
+      rows pending at flush time go out in one bulk_update.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last: dict[str, dict[int, str]] = {}    # cp_id → {connector: status}
+        self.received = 0
+        self.suppressed_unchanged = 0
+        self.suppressed_debounced = 0
+
+    def put(self, cp_id: str, connector_id: int, status: str, when) -> bool:
+        """Returns True if the status will be written."""
+        self.received += 1
+        known = self._last.setdefault(cp_id, {})
+        if known.get(connector_id) == status:
+            self.suppressed_unchanged += 1
+            return False
+        known[connector_id] = status
+        if cp_id in self._pending:
+            self.suppressed_debounced += 1
+        self._put(cp_id, (connector_id, status, when))
+        return True
+
+    def forget(self, cp_id: str):
+        """Row was written elsewhere or the CP went away – trust nothing."""
+        self._last.pop(cp_id, None)
+
+    def _write(self, rows: dict):
+        ChargePoint.objects.bulk_update(
+            [
+                ChargePoint(id=cp_id, connector_id=connector_id,
+                            status=status, updated=when)
+                for cp_id, (connector_id, status, when) in rows.items()
+            ],
+            ["connector_id", "status", "updated"],
+            batch_size=500,
+        )
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "received":             self.received,
+            "suppressed_unchanged": self.suppressed_unchanged,
+            "suppressed_debounced": self.suppressed_debounced,
+        }
+
+
+status_buffer = StatusBuffer(
+    "status",
+    interval_ms=getattr(settings, "OCPP_STATUS_DEBOUNCE_MS", 200),
+    max_rows=getattr(settings, "OCPP_STATUS_FLUSH_ROWS", 1000),
+)
@@ -0,0 +1,102 @@
+# csms/ocpp_cache.py
+"""
+In-process caches for the OCPP connection path.
+
+After a site power cut thousands of chargers reconnect at once; with
+these caches a reconnect of a known charger costs no query at all.
+Entries expire after OCPP_CACHE_TTL seconds and are dropped early when
+the REST side edits the row (ocpp_bridge.notify → invalidate()).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+from django.conf import settings
+
+
+MISSING = object()          # get() default that tells "not cached" from None
+
+
+class TTLCache:
+    """
+    Minimal dict-with-expiry.  Single event loop → no locking needed.
+    When full, the oldest inserted entry is evicted.
+    """
+    def __init__(self, ttl: float, maxsize: int = 100_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: dict[Any, tuple[Any, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires > time.monotonic():
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: float | None = None):
+        if key not in self._data and len(self._data) >= self.maxsize:
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+@dataclass(frozen=True, slots=True)
+class CPSnapshot:
+    """
+    What the OCPP side needs to know about a ChargePoint row.  Every live
+    connection keeps one (MyChargePoint.snapshot) so handlers don't
+    re-read the row; REST edits refresh it through ocpp_bridge.notify.
+    """
+    tenant_id:      int | None
+    vendor:         str
+    model:          str
+    fw_version:     str
+    price_per_kwh:  Decimal | None = None
+    price_per_hour: Decimal | None = None
+    site_id:        int | None = None
+
+    @classmethod
+    def from_model(cls, cp) -> "CPSnapshot":
+        return cls(cp.tenant_id, cp.vendor, cp.model, cp.fw_version,
+                   cp.price_per_kwh, cp.price_per_hour, cp.site_id)
+
+    def same_boot(self, tenant_id, vendor, model, fw_version) -> bool:
+        """Would a BootNotification with these values change anything?"""
+        return (self.tenant_id, self.vendor, self.model, self.fw_version) == \
+               (tenant_id, vendor, model, fw_version)
+
+
+TTL          = getattr(settings, "OCPP_CACHE_TTL", 300)
+NEGATIVE_TTL = 10            # unknown ws_keys: short, so new tenants work quickly
+
+tenants       = TTLCache(TTL)        # ws_key → Tenant | None
+charge_points = TTLCache(TTL)        # cp_id  → CPSnapshot
+
+
+def invalidate(kind: str, key: str) -> None:
+    """Called for every ocpp_bridge.notify() message."""
+    if kind == "cp":
+        charge_points.pop(key)
+    elif kind == "tenant":
+        tenants.pop(key)
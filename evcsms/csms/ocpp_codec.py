@@ -0,0 +1,100 @@
+# csms/ocpp_codec.py
+"""
+JSON codec for OCPP framing.
+
+orjson when it is installed (and OCPP_JSON_BACKEND allows it), the stdlib
+json module otherwise.  install() also routes python-ocpp's own
+ocpp.messages json calls (inbound unpack, outbound Call/CallResult
+to_json) through the selected backend.
+"""
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:                       # optional dependency
+    orjson = None
+
+
+def _default(o):
+    # same rule as python-ocpp's _DecimalEncoder
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# ───────────────────────────── backends ─────────────────────────────────
+def _std_loads(s):
+    return json.loads(s)
+
+
+def _std_dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=_default)
+
+
+def _orjson_loads(s):
+    return orjson.loads(s)
+
+
+def _orjson_dumps(obj) -> str:
+    return orjson.dumps(obj, default=_default).decode()
+
+
+BACKENDS = {"stdlib": (_std_loads, _std_dumps)}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_loads, _orjson_dumps)
+
+
+# the active backend – replaced by select()
+backend = "orjson" if orjson is not None else "stdlib"
+loads, dumps = BACKENDS[backend]
+
+
+def select(name: str = "auto") -> str:
+    """
+    "auto" | "orjson" | "stdlib".  Asking for orjson without it installed
+    quietly falls back to stdlib.  Returns the backend actually in use.
+    """
+    global backend, loads, dumps
+    if name not in BACKENDS:
+        name = "orjson" if orjson is not None else "stdlib"
+    backend = name
+    loads, dumps = BACKENDS[name]
+    return backend
+
+
+# ─────────────────────── python-ocpp integration ────────────────────────
+class _OcppJson:
+    """
+    Stand-in for the `json` module inside ocpp.messages.  Plain calls go
+    to the active backend; anything with extra keywords (parse_float=…
+    in payload validation) keeps using the stdlib.
+    """
+    JSONDecodeError = json.JSONDecodeError     # orjson's error subclasses it
+    JSONEncoder = json.JSONEncoder
+
+    @staticmethod
+    def loads(s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        # python-ocpp always asks for compact output + its Decimal encoder,
+        # which is exactly what our backends do
+        extra = {k: v for k, v in kwargs.items() if k not in ("separators", "cls")}
+        if extra:
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+
+def install(name: str = "auto") -> str:
+    """Select a backend and make python-ocpp use it.  Idempotent."""
+    import ocpp.messages
+
+    chosen = select(name)
+    ocpp.messages.json = _OcppJson
+    return chosen
@@ -0,0 +1,219 @@
+# csms/ocpp_config.py
+"""
+Charger configuration snapshots.
+
+OCPP side:  ConfigFetcher asks connected chargers for GetConfiguration and
+            GetLocalListVersion (after Boot when the last snapshot is older
+            than OCPP_CONFIG_MAX_AGE, or on demand via notify("config", id)),
+            with bounded concurrency and a start-rate limit so a boot storm
+            doesn't turn into a GetConfiguration storm.
+Storage:    CPConfigSnapshot, a new version only when the content changed.
+API side:   cached_snapshots() serves the newest snapshot per charger: one
+            narrow query for the newest (version, checked_at) of each, then
+            the payloads from Django's cache keyed by version – so a
+            per-process cache (no shared CACHES backend) can't serve an
+            old version either.  Never a websocket round-trip.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from csms.models import CPConfigSnapshot
+from csms.ocpp_db import db
+from csms.ocpp_hub import hub
+
+log = logging.getLogger("ocpp")
+
+CACHE_TTL = getattr(settings, "OCPP_CONFIG_CACHE_TTL", 300)
+MAX_AGE = getattr(settings, "OCPP_CONFIG_MAX_AGE", 24 * 3600)
+
+
+# ───────────────────────────── storage ─────────────────────────────────
+def cache_key(cp_id: str, version: int) -> str:
+    return f"cpconfig:{cp_id}:{version}"
+
+
+def _digest(keys: list, unknown: list, list_version) -> str:
+    blob = json.dumps([keys, unknown, list_version], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def store_snapshot(cp_id: str, keys: list, unknown: list,
+                   list_version: int | None) -> CPConfigSnapshot:
+    """Sync: persist one fetch; unchanged content only bumps checked_at."""
+    keys = sorted(keys, key=lambda k: k.get("key", ""))
+    digest = _digest(keys, unknown, list_version)
+    now = timezone.now()
+
+    for _ in range(3):
+        latest = (CPConfigSnapshot.objects.filter(cp_id=cp_id)
+                  .order_by("-version").first())
+        if latest is not None and latest.digest == digest:
+            latest.checked_at = now
+            latest.save(update_fields=["checked_at"])
+            snap = latest
+            break
+        try:
+            with transaction.atomic():
+                snap = CPConfigSnapshot.objects.create(
+                    cp_id=cp_id, version=(latest.version + 1) if latest else 1,
+                    taken_at=now, checked_at=now, keys=keys, unknown=unknown,
+                    local_list_version=list_version, digest=digest,
+                )
+            break
+        except IntegrityError:
+            continue                  # another worker wrote that version – re-read
+    else:
+        raise RuntimeError(f"could not store config snapshot for {cp_id}")
+
+    cache.set(cache_key(cp_id, snap.version), snap.as_dict(), CACHE_TTL)
+    return snap
+
+
+def cached_snapshots(cp_ids: list[str]) -> dict[str, dict | None]:
+    """Newest snapshot per charger as dicts (None = never fetched)."""
+    heads = {
+        cp_id: (version, checked_at)
+        for cp_id, version, checked_at in CPConfigSnapshot.latest_qs(cp_ids)
+        .values_list("cp_id", "version", "checked_at")
+    }
+    keys = {cache_key(cp_id, v): cp_id for cp_id, (v, _) in heads.items()}
+    hit = cache.get_many(list(keys))
+    out = {keys[k]: v for k, v in hit.items()}
+
+    missing = [i for i in heads if i not in out]
+    if missing:
+        fresh = {}
+        for cp_id, snap in CPConfigSnapshot.latest_for(missing).items():
+            out[cp_id] = fresh[cache_key(cp_id, snap.version)] = snap.as_dict()
+        cache.set_many(fresh, CACHE_TTL)
+
+    for cp_id, snap in out.items():
+        # an unchanged re-fetch only moves checked_at, the payload stays cached
+        if snap["version"] == heads[cp_id][0]:
+            out[cp_id] = {**snap, "checked_at": heads[cp_id][1].isoformat()}
+    return {i: out.get(i) for i in cp_ids}
+
+
+def _last_checked(cp_id: str):
+    return (CPConfigSnapshot.objects.filter(cp_id=cp_id)
+            .order_by("-version").values_list("checked_at", flat=True).first())
+
+
+# ───────────────────────────── fetching ────────────────────────────────
+class ConfigFetcher:
+    def __init__(self, concurrency: int = 10, rate: float = 20, max_age: float = MAX_AGE):
+        self.concurrency = concurrency
+        self.min_gap = 1 / rate if rate > 0 else 0
+        self.max_age = max_age
+        self._queue: asyncio.Queue | None = None
+        self._queued: dict[str, bool] = {}        # cp_id → force
+        self._checked: dict[str, float] = {}      # cp_id → monotonic last fetch
+        self._next_start = 0.0
+        self._workers: list[asyncio.Task] = []
+        self.fetched = self.skipped = self.failed = 0
+
+    def start(self):
+        if not self._workers:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker())
+                             for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def request(self, cp_id: str, force: bool = False):
+        """Queue a fetch; duplicates while queued collapse into one."""
+        if self._queue is None:
+            return
+        if cp_id in self._queued:
+            self._queued[cp_id] |= force
+            return
+        self._queued[cp_id] = force
+        self._queue.put_nowait(cp_id)
+
+    async def _throttle(self):
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.min_gap
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _is_fresh(self, cp_id: str) -> bool:
+        seen = self._checked.get(cp_id)
+        if seen is not None:
+            return time.monotonic() - seen < self.max_age
+        checked_at = await db.run(_last_checked, cp_id)
+        if checked_at is None:
+            return False
+        age = (timezone.now() - checked_at).total_seconds()
+        if age < self.max_age:
+            self._checked[cp_id] = time.monotonic() - age
+            return True
+        return False
+
+    async def _worker(self):
+        while True:
+            cp_id = await self._queue.get()
+            force = self._queued.pop(cp_id, False)
+            try:
+                if not force and await self._is_fresh(cp_id):
+                    self.skipped += 1
+                    continue
+                cp = hub.local(cp_id)
+                if cp is None:
+                    continue                          # went away meanwhile
+                await self._throttle()
+                await self.fetch(cp)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.failed += 1
+                log.warning("[%s] config fetch failed: %r", cp_id, exc)
+
+    async def fetch(self, cp) -> CPConfigSnapshot:
+        from ocpp.v16 import call as c
+
+        resp = await cp.call(c.GetConfiguration())
+        keys = [dict(k) for k in (resp.configuration_key or [])]
+        unknown = list(resp.unknown_key or [])
+        try:
+            list_version = (await cp.call(c.GetLocalListVersion())).list_version
+        except Exception:
+            list_version = None                       # optional feature profile
+
+        snap = await db.run(store_snapshot, cp.id, keys, unknown, list_version)
+        self._checked[cp.id] = time.monotonic()
+        self.fetched += 1
+
+        # keep the connection's view in line with the charger
+        cp.config = {k["key"]: k.get("value") for k in keys if "key" in k}
+        if list_version is not None:
+            cp.local_list_version = list_version
+        return snap
+
+    def stats(self) -> dict:
+        return {
+            "queued":  self._queue.qsize() if self._queue else 0,
+            "fetched": self.fetched,
+            "skipped": self.skipped,
+            "failed":  self.failed,
+        }
+
+
+fetcher = ConfigFetcher(
+    concurrency=getattr(settings, "OCPP_CONFIG_FETCH_CONCURRENCY", 10),
+    rate=getattr(settings, "OCPP_CONFIG_FETCH_RATE", 20),
+)
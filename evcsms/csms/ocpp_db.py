@@ -0,0 +1,134 @@
+# csms/ocpp_db.py
+"""
+Where the OCPP server runs its ORM calls.
+
+sync_to_async's default (thread_sensitive=True) funnels every query of
+every charger through one thread, so one slow query stalls them all.
+With OCPP_DB_THREADS > 0 calls run on a dedicated pool of that size
+instead, each with an optional timeout, and the pool reports how many
+calls are waiting for a thread.  OCPP_DB_THREADS = 0 keeps the single
+thread – the right choice for SQLite, which serialises writers anyway.
+
+    from csms.ocpp_db import db
+    tx = await db.run(Transaction.objects.filter(pk=1).first)
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from csms import ocpp_metrics
+from csms.ocpp_profile import profiler
+
+log = logging.getLogger("ocpp")
+
+
+def _default_threads() -> int:
+    engine = settings.DATABASES["default"]["ENGINE"]
+    return 0 if engine.endswith("sqlite3") else 16
+
+
+class DBExecutor:
+    def __init__(self, threads: int | None = None, timeout: float | None = None):
+        self.threads = _default_threads() if threads is None else threads
+        self.timeout = timeout
+        self._pool: ThreadPoolExecutor | None = None
+
+        self._lock = threading.Lock()
+        self.in_flight = 0            # submitted, not finished
+        self.running = 0              # currently on a thread
+        self.max_queued = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def queued(self) -> int:
+        return self.in_flight - self.running
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="ocpp-db")
+        return self._pool
+
+    def _in_thread(self, fn, args, kwargs):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        except DatabaseError:
+            # don't keep a broken connection on a long-lived pool thread
+            connections.close_all()
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def run(self, fn, *args, timeout: float | None = None, **kwargs):
+        """Run a sync ORM callable off the event loop."""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self.in_flight += 1
+            self.max_queued = max(self.max_queued, self.in_flight - self.running)
+
+        t0 = time.perf_counter()
+        try:
+            if self.threads > 0:
+                call = asyncio.get_running_loop().run_in_executor(
+                    self._executor(),
+                    functools.partial(self._in_thread, fn, args, kwargs),
+                )
+            else:
+                call = sync_to_async(self._in_thread)(fn, args, kwargs)
+            return await (asyncio.wait_for(call, timeout) if timeout else call)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log.warning("DB call %s timed out after %ss",
+                        getattr(fn, "__qualname__", fn), timeout)
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self.in_flight -= 1
+            self.calls += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            ocpp_metrics.db_latency.observe(ms / 1000)
+            profiler.add("orm", ms / 1000)      # no-op outside a profiled call
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "threads":    self.threads,
+            "in_flight":  self.in_flight,
+            "queued":     self.queued,
+            "max_queued": self.max_queued,
+            "calls":      self.calls,
+            "timeouts":   self.timeouts,
+            "errors":     self.errors,
+            "avg_ms":     round(self.total_ms / self.calls, 3) if self.calls else 0,
+            "max_ms":     round(self.max_ms, 3),
+        }
+
+
+db = DBExecutor(
+    threads=getattr(settings, "OCPP_DB_THREADS", None),
+    timeout=getattr(settings, "OCPP_DB_TIMEOUT", None),
+)
@@ -10,21 +10,44 @@ class OcppHub:
     """
     def __init__(self) -> None:
         self._lock = asyncio.Lock()
-        self._by_id: Dict[int, Any] = {}  # cp_id -> live ocpp ChargePoint instance
+        self._by_id: Dict[str, Any] = {}  # cp_id -> live ocpp ChargePoint instance
 
-    async def register(self, cp_id: int, cp_any: Any) -> None:
+    async def register(self, cp_id: str, cp_any: Any) -> None:
         async with self._lock:
             self._by_id[cp_id] = cp_any
 
-    async def unregister(self, cp_id: int) -> None:
+    async def unregister(self, cp_id: str, cp_any: Any = None) -> None:
+        """
+        With cp_any given, only drop the entry if it is still that very
+        connection – a fast reconnect may already have replaced it.
+        """
         async with self._lock:
-            self._by_id.pop(cp_id, None)
+            if cp_any is None or self._by_id.get(cp_id) is cp_any:
+                self._by_id.pop(cp_id, None)
 
-    async def get(self, cp_id: int) -> Optional[Any]:
+    async def get(self, cp_id: str) -> Optional[Any]:
         async with self._lock:
             return self._by_id.get(cp_id)
 
-    async def call(self, cp_id: int, action: str, payload: dict) -> Any:
+    def ids(self) -> list[str]:
+        return list(self._by_id)
+
+    def local(self, cp_id: str) -> Optional[Any]:
+        """Lock-free lookup for code already running on the event loop."""
+        return self._by_id.get(cp_id)
+
+    def wake(self, cp_id: str) -> bool:
+        """
+        Poke the command pump of a locally connected CP.
+        Returns False if the CP is not connected to this process.
+        """
+        cp = self.local(cp_id)
+        if cp is None:
+            return False
+        cp.wake_commands()
+        return True
+
+    async def call(self, cp_id: str, action: str, payload: dict) -> Any:
         """
         Calls e.g. await cp.call('Reset', {...}) on the live connection.
         Adapt this if your CP wrapper has a different API.
@@ -38,4 +61,3 @@ class OcppHub:
 
 # global singleton
 hub = OcppHub()
-
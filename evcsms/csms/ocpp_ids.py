@@ -0,0 +1,116 @@
+# csms/ocpp_ids.py
+"""
+Transaction-id allocation without a query per StartTransaction.
+
+Each OCPP process reserves a block of ids from the IdSequence row with a
+single UPDATE (the row lock makes blocks disjoint across workers) and
+hands them out from memory.  The next block is prefetched in the
+background when the current one runs low, so StartTransaction normally
+never waits for the DB.  Ids left unused in a block when the process
+stops are simply skipped.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from csms.models import IdSequence, Transaction
+from csms.ocpp_db import db
+
+log = logging.getLogger("ocpp")
+
+
+def _seed_transaction() -> int:
+    return (Transaction.objects.aggregate(m=Max("tx_id"))["m"] or 0) + 1
+
+
+SEEDS = {"transaction": _seed_transaction}
+
+
+def reserve_block(name: str, size: int) -> tuple[int, int]:
+    """
+    Sync: claim [start, end) from sequence <name>.  Write first, read
+    second – the UPDATE takes the row lock, so concurrent workers can
+    never read the same value.
+    """
+    for _ in range(3):
+        with transaction.atomic():
+            bumped = (
+                IdSequence.objects
+                .filter(name=name)
+                .update(next_value=F("next_value") + size)
+            )
+            if bumped:
+                end = IdSequence.objects.values_list("next_value", flat=True).get(name=name)
+                return end - size, end
+
+        # first use of this sequence → start after the highest existing id
+        try:
+            with transaction.atomic():
+                seed = SEEDS.get(name, lambda: 1)()
+                IdSequence.objects.create(name=name, next_value=seed + size)
+                return seed, seed + size
+        except IntegrityError:
+            continue                      # another worker created it – retry
+    raise RuntimeError(f"could not reserve ids from sequence {name!r}")
+
+
+class BlockAllocator:
+    def __init__(self, name: str, block_size: int = 100):
+        self.name = name
+        self.block_size = block_size
+        self._next = self._end = 0
+        self._spare: tuple[int, int] | None = None
+        self._prefetch: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.blocks_reserved = 0
+
+    async def _reserve(self) -> tuple[int, int]:
+        block = await db.run(reserve_block, self.name, self.block_size, timeout=0)
+        self.blocks_reserved += 1
+        return block
+
+    async def _prefetch_spare(self):
+        try:
+            self._spare = await self._reserve()
+        except Exception:
+            log.exception("prefetch of %s ids failed", self.name)
+        finally:
+            self._prefetch = None
+
+    async def warm(self):
+        """Reserve the first block up front (server start)."""
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    self._next, self._end = await self._reserve()
+
+    async def next(self) -> int:
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    if self._prefetch is not None:
+                        await asyncio.shield(self._prefetch)
+                    if self._spare is not None:
+                        (self._next, self._end), self._spare = self._spare, None
+                    else:
+                        self._next, self._end = await self._reserve()
+
+        value = self._next
+        self._next += 1
+
+        # running low → fetch the next block while we still have ids
+        if (self._end - self._next <= self.block_size // 4
+                and self._spare is None and self._prefetch is None):
+            self._prefetch = asyncio.create_task(self._prefetch_spare())
+        return value
+
+
+tx_ids = BlockAllocator(
+    "transaction",
+    block_size=getattr(settings, "OCPP_TX_ID_BLOCK", 100),
+)
@@ -0,0 +1,168 @@
+# csms/ocpp_liveness.py
+"""
+Who is online?  – tracked in memory, persisted in batches.
+
+touch() is called for every inbound frame and is just a dict write.
+Every `flush_s` seconds the changed chargers' last_seen/online go out
+in one bulk_update.  A single timer wheel ticking once per `tick_s`
+marks chargers offline after `timeout_s` of silence; there is no timer
+task per connection.
+
+Wheel entries are re-armed lazily: touch() never moves a charger between
+slots, the tick that reaches its slot checks the real last-seen time and
+either expires it or puts it back for the remaining time.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from csms.models import ChargePoint
+from csms.ocpp_db import db
+
+log = logging.getLogger("ocpp")
+
+
+class Liveness:
+    def __init__(self, timeout_s: float = 90, flush_s: float = 10, tick_s: float = 1):
+        self.timeout = timeout_s
+        self.flush_s = flush_s
+        self.tick_s = tick_s
+
+        self._last: dict[str, float] = {}          # cp_id → monotonic last frame
+        self._online: set[str] = set()
+        self._dirty: set[str] = set()              # needs a DB write
+
+        self._wheel: list[set[str]] = [set() for _ in range(math.ceil(timeout_s / tick_s) + 2)]
+        self._cursor = 0
+        self._tasks: list[asyncio.Task] = []
+
+        self.went_offline = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    # ------------------------------------------------------------------ #
+    def touch(self, cp_id: str):
+        self._last[cp_id] = time.monotonic()
+        self._dirty.add(cp_id)
+        if cp_id not in self._online:
+            self._online.add(cp_id)
+            self._arm(cp_id, self.timeout)
+
+    def disconnect(self, cp_id: str):
+        if cp_id in self._online:
+            self._online.discard(cp_id)
+            self._dirty.add(cp_id)
+
+    def handover(self, cp_id: str):
+        """
+        Connection closed by a graceful restart: the charger is reconnecting
+        to the new process, so forget it without writing online=False
+        (that late write could land after the new process marked it online).
+        """
+        self._online.discard(cp_id)
+        self._dirty.discard(cp_id)
+        self._last.pop(cp_id, None)
+
+    def is_online(self, cp_id: str) -> bool:
+        return cp_id in self._online
+
+    def _arm(self, cp_id: str, delay: float):
+        ticks = min(max(1, math.ceil(delay / self.tick_s)), len(self._wheel) - 1)
+        self._wheel[(self._cursor + ticks) % len(self._wheel)].add(cp_id)
+
+    def _tick(self):
+        self._cursor = (self._cursor + 1) % len(self._wheel)
+        due, self._wheel[self._cursor] = self._wheel[self._cursor], set()
+        now = time.monotonic()
+        for cp_id in due:
+            if cp_id not in self._online:
+                continue                          # disconnected meanwhile
+            remaining = self._last[cp_id] + self.timeout - now
+            if remaining > 0:
+                self._arm(cp_id, remaining)       # seen since it was armed
+            else:
+                self._online.discard(cp_id)
+                self._dirty.add(cp_id)
+                self.went_offline += 1
+                log.info("[%s] missed heartbeats – marked offline", cp_id)
+
+    # ------------------------------------------------------------------ #
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run_wheel()),
+                asyncio.create_task(self._run_flush()),
+            ]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+        await self.flush()
+
+    async def _run_wheel(self):
+        while True:
+            await asyncio.sleep(self.tick_s)
+            self._tick()
+
+    async def _run_flush(self):
+        while True:
+            await asyncio.sleep(self.flush_s)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("last-seen flush failed")
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+
+        mono_now = time.monotonic()
+        wall_now = datetime.now(timezone.utc)
+        rows = [
+            ChargePoint(
+                id=cp_id,
+                last_seen=wall_now - timedelta(seconds=mono_now - self._last[cp_id]),
+                online=cp_id in self._online,
+            )
+            for cp_id in dirty if cp_id in self._last
+        ]
+        try:
+            await db.run(
+                ChargePoint.objects.bulk_update,
+                rows, ["last_seen", "online"], batch_size=500,
+            )
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+        # forget chargers that are gone (unless they came back meanwhile)
+        for cp_id in dirty:
+            if cp_id not in self._online and cp_id not in self._dirty:
+                self._last.pop(cp_id, None)
+        self.flushes += 1
+        self.rows_written += len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "online":        len(self._online),
+            "pending":       len(self._dirty),
+            "went_offline":  self.went_offline,
+            "flushes":       self.flushes,
+            "rows_written":  self.rows_written,
+        }
+
+
+OFFLINE_AFTER = getattr(settings, "OCPP_OFFLINE_AFTER", 90)
+
+liveness = Liveness(
+    timeout_s=OFFLINE_AFTER,
+    flush_s=getattr(settings, "OCPP_LAST_SEEN_FLUSH", 10),
+)
@@ -0,0 +1,193 @@
+# csms/ocpp_log.py
+"""
+Structured, non-blocking logging for the OCPP server.
+
+setup() moves every handler of the root logger behind a queue: the event
+loop only appends the LogRecord, a listener thread formats and writes it.
+If the queue is full the record is dropped (and counted) rather than
+stalling the loop.  Inside an ASGI server (csms.consumers) only the
+"ocpp" logger is queued – the server's and Django's logging stay as
+configured.
+
+Handlers don't log themselves; MyChargePoint emits one record per inbound
+call via event() with cp_id / tenant / action / latency_ms plus whatever
+the handler attached with note().  Per-action sampling keeps chatty
+actions cheap:
+
+    OCPP_LOG_SAMPLING = {"MeterValues": 0.01, "Heartbeat": 0.01}
+
+Actions not listed are always logged; records with force=True (errors,
+status changes, …) bypass sampling.
+
+python-ocpp itself logs every frame it receives and sends, payload
+included, at INFO – that would defeat the sampling.  MyChargePoint hands
+it the "ocpp.frames" logger instead, which stays at OCPP_LOG_FRAMES
+(WARNING by default; "INFO" to trace the wire).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import random
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+log = logging.getLogger("ocpp")
+
+# python-ocpp's own per-frame logging (see module docstring); a level set
+# through Django's LOGGING wins
+frames = logging.getLogger("ocpp.frames")
+if frames.level == logging.NOTSET:
+    frames.setLevel(getattr(settings, "OCPP_LOG_FRAMES", "WARNING"))
+
+DEFAULT_SAMPLING = {
+    "MeterValues": 0.01,
+    "Heartbeat":   0.01,
+}
+SAMPLING: dict[str, float] = {
+    **DEFAULT_SAMPLING,
+    **getattr(settings, "OCPP_LOG_SAMPLING", {}),
+}
+
+sampled_out: Counter = Counter()          # action → records skipped
+
+
+def sampled(action: str) -> bool:
+    rate = SAMPLING.get(action, 1.0)
+    if rate >= 1.0 or random.random() < rate:
+        return True
+    sampled_out[action] += 1
+    return False
+
+
+def event(action: str, *, cp_id: str | None = None, tenant=None,
+          latency_ms: float | None = None, force: bool = False,
+          level: int = logging.INFO, **fields):
+    """
+    One structured record.  Cheap on the loop: no formatting here, the
+    fields dict travels with the record to the listener thread.
+    """
+    if not force and not sampled(action):
+        return
+    data = {"action": action, "cp_id": cp_id, "tenant": tenant}
+    if latency_ms is not None:
+        data["latency_ms"] = round(latency_ms, 3)
+    data.update(fields)
+    log.log(level, action, extra={"ocpp": data})
+
+
+# ───────────────────────────── formatters ──────────────────────────────
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line – for log shippers."""
+    def format(self, record):
+        out = {
+            "ts":     self.formatTime(record),
+            "level":  record.levelname,
+            "logger": record.name,
+            "msg":    record.getMessage(),
+        }
+        out.update(getattr(record, "ocpp", {}))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable: `INFO ocpp StartTransaction cp_id=CP1 tx_id=17 …`."""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "ocpp", None)
+        if fields:
+            line += " " + " ".join(
+                f"{k}={v}" for k, v in fields.items()
+                if k != "action" and v is not None
+            )
+        return line
+
+
+FORMATTERS = {"json": JsonFormatter, "text": TextFormatter}
+
+
+# ───────────────────────────── the queue ───────────────────────────────
+class _DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks and never formats on the caller's
+    thread (the stdlib one renders the message in prepare()).
+    """
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record                     # same process – no pickling needed
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: QueueListener | None = None
+_handler: _DroppingQueueHandler | None = None
+_saved: list[logging.Handler] = []
+_original: list[logging.Handler] = []
+_target: logging.Logger | None = None
+_propagate = True
+
+
+def setup(fmt: str | None = None, maxsize: int | None = None, logger: str = ""):
+    """
+    Route a logger through the queue – the root logger by default, or
+    only `logger` ("ocpp" when runocpp's code runs inside someone else's
+    process).  Idempotent; call once per (worker) process after logging
+    is configured.
+    """
+    global _listener, _handler, _saved, _original, _target, _propagate
+    if _listener is not None:
+        return
+    fmt = fmt or getattr(settings, "OCPP_LOG_FORMAT", "text")
+    maxsize = maxsize if maxsize is not None else getattr(settings, "OCPP_LOG_QUEUE_SIZE", 10000)
+
+    _target = logging.getLogger(logger)
+    _propagate = _target.propagate
+    _original = _target.handlers[:]
+    _saved = _original or [logging.StreamHandler()]
+    formatter = FORMATTERS.get(fmt, TextFormatter)()
+    for h in _saved:
+        h.setFormatter(formatter)
+
+    _handler = _DroppingQueueHandler(queue.Queue(maxsize))
+    _listener = QueueListener(_handler.queue, *_saved, respect_handler_level=True)
+    _listener.start()
+    _target.handlers = [_handler]
+    if logger:
+        _target.propagate = False         # not through the root handlers as well
+        if _target.level == logging.NOTSET:
+            _target.setLevel(logging.INFO)
+
+
+def shutdown():
+    """Drain the queue and give the logger its handlers back."""
+    global _listener, _handler, _target
+    if _listener is None:
+        return
+    _listener.stop()                      # processes what is still queued
+    _target.handlers = _original
+    _target.propagate = _propagate
+    _listener = _handler = _target = None
+
+
+def stats() -> dict:
+    return {
+        "queued":      _handler.queue.qsize() if _handler else 0,
+        "dropped":     _handler.dropped if _handler else 0,
+        "sampled_out": dict(sampled_out),
+    }
+
@@ -0,0 +1,159 @@
+# csms/ocpp_metrics.py
+"""
+Prometheus metrics for the OCPP server, without prometheus_client.
+
+Counters and histograms are plain ints/lists touched from the event loop
+(DB latency comes from pool threads – a lost increment under a race is
+acceptable for monitoring), so keeping them on costs a dict lookup and an
+add per observation.  Gauges that are cheap to compute on demand
+(connected chargers, buffer backlogs, …) are collected at scrape time.
+
+    GET http://<host>:<OCPP_METRICS_PORT>/metrics
+
+With --workers N every worker serves on OCPP_METRICS_PORT + its index.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+from collections import Counter as _Counter
+from typing import Awaitable, Callable, Iterable
+
+log = logging.getLogger("ocpp")
+
+# seconds – OCPP handlers are sub-millisecond when healthy, DB calls a few ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_esc(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labels
+        self._values: _Counter = _Counter()
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] += amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, v in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {v}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labels
+        self.buckets = buckets
+        # labels → [count per bucket …, +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        s[bisect.bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        for labels, s in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), s):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {s[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+# ───────────────────────────── the metrics ──────────────────────────────
+messages = Counter(
+    "ocpp_messages_total", "Inbound OCPP calls handled.", ("action",))
+handler_latency = Histogram(
+    "ocpp_handler_latency_seconds", "Inbound call handling time.", ("action",))
+handler_errors = Counter(
+    "ocpp_handler_errors_total", "Inbound calls that raised.", ("action",))
+commands = Counter(
+    "ocpp_commands_total", "Outbound commands sent to chargers.", ("action", "result"))
+db_latency = Histogram(
+    "ocpp_db_call_seconds", "ORM calls run through ocpp_db, queueing included.")
+ws_bytes = Counter(
+    "ocpp_ws_bytes_total",
+    "Websocket payload sent/received (characters; OCPP JSON is ASCII).",
+    ("direction",))
+backlog_frames = Counter(
+    "ocpp_backlog_frames_total",
+    "Frames stamped older than OCPP_BACKLOG_AFTER_S (offline backlog replay).",
+    ("action",))
+
+METRICS = [messages, handler_latency, handler_errors, commands, db_latency, ws_bytes,
+           backlog_frames]
+
+# scrape-time gauges: async fn → [(name, help, labelnames, [(labels, value)…])]
+Collector = Callable[[], Awaitable[list[tuple[str, str, tuple, list]]]]
+COLLECTORS: list[Collector] = []
+
+
+def collector(fn: Collector) -> Collector:
+    COLLECTORS.append(fn)
+    return fn
+
+
+async def render() -> str:
+    lines: list[str] = []
+    for m in METRICS:
+        lines.extend(m.render())
+    for fn in COLLECTORS:
+        try:
+            gauges = await fn()
+        except Exception:
+            log.exception("metrics collector %s failed", fn.__name__)
+            continue
+        for name, help, labelnames, samples in gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labelnames, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ───────────────────────────── HTTP endpoint ────────────────────────────
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass                                       # skip headers
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status, ctype = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            body = (await render()).encode()
+        else:
+            status, ctype, body = "404 Not Found", "text/plain", b"not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    return await asyncio.start_server(_handle_http, host, port)
@@ -0,0 +1,186 @@
+# csms/ocpp_profile.py
+"""
+Opt-in per-action profiling of inbound OCPP calls.
+
+Every call handled by MyChargePoint is split into
+
+    sanitize   ocpp_sanitize (incl. the JSON parse for patched frames)
+    parse      python-ocpp's unpack() – json.loads of the raw frame
+    validate   JSON-schema validation of request and response
+    orm        time awaited in ocpp_db.run() from inside the handler
+    send       websocket send of the CallResult
+    handler    everything else: the @on body and building the response
+
+and aggregated per action.  The current call is tracked in a ContextVar,
+so ORM time spent by background tasks (buffer flushes) is not charged to
+any handler.  Off by default (OCPP_PROFILE); when off the hooks cost one
+attribute check.
+
+Control a running server with `manage.py ocpp_profile on|off|reset|dump`
+or `kill -USR1 <pid>` (dump to the log).
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+log = logging.getLogger("ocpp")
+
+PHASES = ("sanitize", "parse", "validate", "orm", "send", "handler")
+
+_current: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "ocpp_profile_call", default=None,
+)
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.since = time.time()
+        # action → {"calls": n, "total": s, "max": s, <phase>: s …}
+        self.actions: dict[str, dict] = {}
+
+    # ------------------------------------------------------------------ #
+    #  hooks                                                             #
+    # ------------------------------------------------------------------ #
+    def begin(self, sanitize_s: float = 0.0):
+        """Start a call record; returns a token for finish() (None when off)."""
+        if not self.enabled:
+            return None
+        return _current.set({"sanitize": sanitize_s})
+
+    def add(self, phase: str, seconds: float):
+        rec = _current.get()
+        if rec is not None:
+            rec[phase] = rec.get(phase, 0.0) + seconds
+
+    def call(self, action: str, seconds: float):
+        """_handle_call finished after `seconds` (validate/orm/send inside)."""
+        rec = _current.get()
+        if rec is not None:
+            rec["action"] = action
+            rec["call"] = seconds
+
+    def finish(self, token):
+        if token is None:
+            return
+        rec = _current.get()
+        _current.reset(token)
+        if not rec or "action" not in rec:
+            return                                 # a CallResult, not a call
+
+        inner = rec.get("validate", 0.0) + rec.get("orm", 0.0) + rec.get("send", 0.0)
+        rec["handler"] = max(0.0, rec.pop("call") - inner)
+        total = sum(rec.get(p, 0.0) for p in PHASES)
+
+        agg = self.actions.get(rec["action"])
+        if agg is None:
+            agg = self.actions[rec["action"]] = dict.fromkeys(("calls", "total", "max", *PHASES), 0)
+        agg["calls"] += 1
+        agg["total"] += total
+        agg["max"] = max(agg["max"], total)
+        for p in PHASES:
+            agg[p] += rec.get(p, 0.0)
+
+    # ------------------------------------------------------------------ #
+    #  control                                                           #
+    # ------------------------------------------------------------------ #
+    def enable(self):
+        install()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.actions.clear()
+        self.since = time.time()
+
+    def report(self) -> dict:
+        loop_total = sum(a["total"] for a in self.actions.values()) or 1.0
+        rows = []
+        for action, a in sorted(self.actions.items(), key=lambda kv: -kv[1]["total"]):
+            n = a["calls"]
+            rows.append({
+                "action":     action,
+                "calls":      n,
+                "share":      round(a["total"] / loop_total, 4),
+                "avg_us":     round(a["total"] / n * 1e6, 1),
+                "max_us":     round(a["max"] * 1e6, 1),
+                **{f"{p}_us": round(a[p] / n * 1e6, 1) for p in PHASES},
+            })
+        return {
+            "pid":     os.getpid(),
+            "enabled": self.enabled,
+            "seconds": round(time.time() - self.since, 1),
+            "actions": rows,
+        }
+
+    def dump(self, directory: Path | None = None) -> dict:
+        """Log the report and, given a directory, write <pid>.profile.json."""
+        report = self.report()
+        log.info("handler profile (pid %s, %ss):\n%s",
+                 report["pid"], report["seconds"], format_table(report))
+        if directory is not None:
+            path = Path(directory) / f"{report['pid']}.profile.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(report))
+            tmp.replace(path)
+        return report
+
+
+def format_table(report: dict) -> str:
+    cols = ("calls", "share", "avg_us", "max_us", *(f"{p}_us" for p in PHASES))
+    lines = [f"{'action':<32}" + "".join(f"{c:>12}" for c in cols)]
+    for row in report["actions"]:
+        lines.append(f"{row['action']:<32}" + "".join(f"{row[c]:>12}" for c in cols))
+    return "\n".join(lines)
+
+
+# ─────────────────────── python-ocpp integration ────────────────────────
+_installed = False
+
+
+def install():
+    """
+    Time python-ocpp's unpack() and validate_payload() as used by
+    ChargePoint.  Idempotent; the wrappers are inert while disabled.
+    """
+    global _installed
+    if _installed:
+        return
+    from ocpp import charge_point
+
+    orig_unpack = charge_point.unpack
+    orig_validate = charge_point.validate_payload
+
+    def unpack(raw):
+        if not profiler.enabled:
+            return orig_unpack(raw)
+        t0 = time.perf_counter()
+        try:
+            return orig_unpack(raw)
+        finally:
+            profiler.add("parse", time.perf_counter() - t0)
+
+    async def validate_payload(message, ocpp_version):
+        if not profiler.enabled:
+            return await orig_validate(message, ocpp_version)
+        t0 = time.perf_counter()
+        try:
+            return await orig_validate(message, ocpp_version)
+        finally:
+            profiler.add("validate", time.perf_counter() - t0)
+
+    charge_point.unpack = unpack
+    charge_point.validate_payload = validate_payload
+    _installed = True
+
+
+profiler = Profiler(enabled=bool(getattr(settings, "OCPP_PROFILE", False)))
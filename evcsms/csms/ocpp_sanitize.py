@@ -0,0 +1,106 @@
+# csms/ocpp_sanitize.py
+"""
+Inbound frame sanitizer for quirky chargers.
+
+Most frames need no patching at all, so SanitizingWS first runs a few
+cheap substring checks on the raw text and hands such frames through
+untouched.  Only frames that do need fixing are decoded – once – and the
+decoded list is passed on as-is; MyChargePoint.route_message() accepts
+it and skips python-ocpp's own json.loads.
+"""
+import time
+
+from csms import ocpp_codec, ocpp_metrics
+from csms.ocpp_profile import profiler
+from ocpp.exceptions import PropertyConstraintViolationError, ProtocolError
+from ocpp.messages import Call, CallError, CallResult
+
+
+# raw-text markers of frames that need work
+_NEEDS_DECODE = ('"StopTransaction"', "TransactionBegin", "TransactionEnd")
+
+
+def sanitize(raw):
+    """
+    str → str   (frame untouched, python-ocpp parses it)
+    str → list  (frame decoded & patched here, don't parse again)
+    """
+    if not isinstance(raw, str):
+        return raw
+    for marker in _NEEDS_DECODE:
+        if marker in raw:
+            break
+    else:
+        return raw                                   # fast path
+
+    # context fixes: some firmwares drop the dot in ReadingContext values
+    raw = raw.replace("TransactionBegin", "Transaction.Begin") \
+             .replace("TransactionEnd",   "Transaction.End")
+    try:
+        msg = ocpp_codec.loads(raw)
+    except ValueError:
+        return raw                  # let python-ocpp report the bad frame
+
+    # OCPP call messages are arrays: [ messageTypeId, uniqueId, action, payload ]
+    if (
+        isinstance(msg, list) and
+        len(msg) == 4 and
+        msg[0] == 2 and  # Call message
+        msg[2] == "StopTransaction" and
+        isinstance(msg[3], dict)
+    ):
+        payload = msg[3]
+        outer_ts = payload.get("timestamp")
+        # for each entry, if no timestamp, inject the outer one
+        if outer_ts is not None:
+            for entry in payload.get("transactionData") or []:
+                if isinstance(entry, dict) and "timestamp" not in entry:
+                    entry["timestamp"] = outer_ts
+    return msg
+
+
+def unpack_decoded(msg):
+    """
+    ocpp.messages.unpack() minus the json.loads – same errors, same classes.
+    """
+    if not isinstance(msg, list):
+        raise ProtocolError(details={
+            "cause": "OCPP message hasn't the correct format. It "
+                     f"should be a list, but got '{type(msg)}' instead"
+        })
+    for cls in (Call, CallResult, CallError):
+        try:
+            if msg[0] == cls.message_type_id:
+                return cls(*msg[1:])
+        except IndexError:
+            raise ProtocolError(details={"cause": "Message does not contain MessageTypeId"})
+        except TypeError:
+            raise ProtocolError(details={"cause": "Message is missing elements."})
+    raise PropertyConstraintViolationError(
+        details={"cause": f"MessageTypeId '{msg[0]}' isn't valid"})
+
+
+class SanitizingWS:
+    def __init__(self, ws):
+        self._ws = ws
+        self.sanitize_s = 0.0             # last frame, read by the profiler
+
+    async def recv(self):
+        raw = await self._ws.recv()
+        ocpp_metrics.ws_bytes.inc("in", amount=len(raw))
+        t0 = time.perf_counter()
+        msg = sanitize(raw)
+        self.sanitize_s = time.perf_counter() - t0
+        return msg
+
+    async def send(self, msg):
+        ocpp_metrics.ws_bytes.inc("out", amount=len(msg))
+        t0 = time.perf_counter()
+        try:
+            return await self._ws.send(msg)
+        finally:
+            profiler.add("send", time.perf_counter() - t0)
+
+    def __getattr__(self, name):
+        return getattr(self._ws, name)
+
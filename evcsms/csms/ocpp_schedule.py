@@ -0,0 +1,355 @@
+# csms/ocpp_schedule.py
+"""
+OCPP 1.6 composite schedules.
+
+composite_schedule() stacks charging profiles the way a charger does:
+
+  * per purpose, the active profile with the highest stackLevel wins
+    (a connector-specific TxDefaultProfile beats one on connector 0),
+  * a TxProfile replaces the TxDefaultProfile while it is active,
+  * ChargePointMaxProfile caps the result,
+  * Absolute, Recurring (Daily/Weekly) and Relative profiles, validFrom /
+    validTo and schedule durations are honoured,
+  * limits are converted between A and W (230 V per phase) when the
+    requested unit differs,
+
+and returns the minimal list of periods (adjacent equal limits merged).
+
+Every profile is first expanded into flat (start, end, limit) segments
+inside the requested window; a single sweep with a heap keyed by stack
+level resolves each purpose, a second sweep merges the purposes – so the
+cost is O(n log n) in the number of segments, however long the window.
+
+Profiles are plain dicts in OCPP's camelCase or python-ocpp's snake_case
+(normalize() accepts both).  install()/clear() apply the OCPP 1.6 replace
+and clear rules to a charger's in-memory set; the ChargingProfile table
+mirrors it so the API can answer without a websocket round-trip.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from django.db.models import Q
+
+from csms.models import ChargingProfile, Transaction
+
+MAX_PROFILE = "ChargePointMaxProfile"
+TX_DEFAULT = "TxDefaultProfile"
+TX_PROFILE = "TxProfile"
+
+VOLTS = 230.0
+DEFAULT_PHASES = 3
+CYCLE = {"Daily": 86400, "Weekly": 7 * 86400}
+
+# what a connector may draw where no profile applies
+DEFAULT_LIMIT_A = getattr(settings, "OCPP_SCHEDULE_DEFAULT_LIMIT_A", 32.0)
+
+_camel = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+def normalize(data):
+    """Recursively snake_case the keys of an OCPP payload."""
+    if isinstance(data, dict):
+        return {_camel.sub("_", k).lower(): normalize(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [normalize(v) for v in data]
+    return data
+
+
+def _ts(value) -> float | None:
+    """ISO string / datetime → epoch seconds."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _convert(limit: float, unit: str, want: str, phases: int | None) -> float:
+    if unit == want:
+        return limit
+    factor = VOLTS * (phases or DEFAULT_PHASES)
+    return limit * factor if want == "W" else limit / factor
+
+
+def default_limit(unit: str) -> float:
+    return _convert(DEFAULT_LIMIT_A, "A", unit, None)
+
+
+# ───────────────────────── profile → segments ──────────────────────────
+def segments(profile: dict, t0: float, t1: float, unit: str,
+             tx_start: float | None = None) -> list[tuple]:
+    """
+    Flat (start, end, limit, phases) pieces of one (normalized) profile
+    inside [t0, t1), limits already in `unit`.
+    """
+    sched = profile["charging_schedule"]
+    lo = max(t0, _ts(profile.get("valid_from")) or -math.inf)
+    hi = min(t1, _ts(profile.get("valid_to")) or math.inf)
+    if lo >= hi:
+        return []
+
+    periods = sorted(sched.get("charging_schedule_period") or [],
+                     key=lambda p: p["start_period"])
+    if not periods:
+        return []
+    duration = sched.get("duration")
+    src_unit = sched.get("charging_rate_unit", "A")
+    kind = profile.get("charging_profile_kind", "Absolute")
+
+    if kind == "Recurring":
+        cycle = CYCLE.get(profile.get("recurrency_kind"), CYCLE["Daily"])
+        base = _ts(sched.get("start_schedule")) or t0
+        span = min(duration, cycle) if duration else cycle
+        first = base + math.floor((lo - base) / cycle) * cycle
+        starts = []
+        s = first
+        while s < hi:
+            starts.append(s)
+            s += cycle
+    else:
+        if kind == "Relative":
+            start = tx_start if tx_start is not None else t0
+        else:
+            start = _ts(sched.get("start_schedule")) or t0
+        starts = [start]
+        span = duration if duration else math.inf
+
+    out = []
+    n = len(periods)
+    for s in starts:
+        end_s = s + span
+        for i, p in enumerate(periods):
+            ps = s + p["start_period"]
+            pe = s + periods[i + 1]["start_period"] if i + 1 < n else end_s
+            ps, pe = max(ps, lo), min(pe, end_s, hi)
+            if ps < pe:
+                phases = p.get("number_phases")
+                out.append((ps, pe, _convert(float(p["limit"]), src_unit, unit, phases), phases))
+    return out
+
+
+# ─────────────────────────── sweeps ────────────────────────────────────
+def _merge(pieces: list[tuple]) -> list[tuple]:
+    """Join touching pieces with the same limit/phases."""
+    out: list[tuple] = []
+    for a, b, limit, phases in pieces:
+        if out and out[-1][1] == a and out[-1][2] == limit and out[-1][3] == phases:
+            out[-1] = (out[-1][0], b, limit, phases)
+        else:
+            out.append((a, b, limit, phases))
+    return out
+
+
+def stack(entries: list[tuple]) -> list[tuple]:
+    """
+    entries: (start, end, rank, limit, phases).  Returns the piecewise
+    winner – highest rank wins – as merged (start, end, limit, phases).
+    """
+    if not entries:
+        return []
+    entries = sorted(entries, key=lambda e: e[0])
+    bounds = sorted({x for e in entries for x in (e[0], e[1])})
+    heap: list = []
+    out = []
+    i, n = 0, len(entries)
+    for a, b in zip(bounds, bounds[1:]):
+        while i < n and entries[i][0] <= a:
+            start, end, rank, limit, phases = entries[i]
+            heapq.heappush(heap, (tuple(-r for r in rank), i, end, limit, phases))
+            i += 1
+        while heap and heap[0][2] <= a:            # expired (lazy delete)
+            heapq.heappop(heap)
+        if heap:
+            _, _, _, limit, phases = heap[0]
+            out.append((a, b, limit, phases))
+    return _merge(out)
+
+
+def _at(pieces: list[tuple], idx: int, a: float):
+    """Advance idx to the piece covering a; returns (idx, piece | None)."""
+    while idx < len(pieces) and pieces[idx][1] <= a:
+        idx += 1
+    if idx < len(pieces) and pieces[idx][0] <= a:
+        return idx, pieces[idx]
+    return idx, None
+
+
+def combine(max_p: list[tuple], tx_default: list[tuple], tx: list[tuple],
+            t0: float, t1: float, default_limit: float) -> list[tuple]:
+    """TxProfile over TxDefaultProfile, capped by ChargePointMaxProfile."""
+    bounds = sorted({t0, t1, *(x for p in (max_p, tx_default, tx)
+                               for piece in p for x in piece[:2])})
+    bounds = [x for x in bounds if t0 <= x <= t1]
+    out = []
+    im = idf = itx = 0
+    for a, b in zip(bounds, bounds[1:]):
+        im, m = _at(max_p, im, a)
+        idf, d = _at(tx_default, idf, a)
+        itx, t = _at(tx, itx, a)
+        chosen = t or d
+        if chosen is None and m is None:
+            limit, phases = default_limit, None
+        elif chosen is None:
+            limit, phases = m[2], m[3]
+        elif m is None or chosen[2] <= m[2]:
+            limit, phases = chosen[2], chosen[3]
+        else:
+            limit, phases = m[2], m[3]
+        out.append((a, b, limit, phases))
+    return _merge(out)
+
+
+# ─────────────────────────── public API ────────────────────────────────
+def composite_schedule(profiles: list[dict], connector_id: int, duration: int,
+                       unit: str = "A", start: datetime | None = None,
+                       tx_start: datetime | None = None,
+                       limit_default: float | None = None) -> dict:
+    """
+    Composite schedule for one connector over [start, start + duration).
+    `profiles` are stored profile dicts carrying "connector_id".
+    limit_default (in `unit`) applies where no profile does, default:
+    OCPP_SCHEDULE_DEFAULT_LIMIT_A converted to `unit`.
+    Returns a snake_case chargingSchedule dict.
+    """
+    start = start or datetime.now(timezone.utc)
+    t0 = start.timestamp()
+    t1 = t0 + duration
+    txs = tx_start.timestamp() if tx_start else None
+
+    by_purpose: dict[str, list] = {MAX_PROFILE: [], TX_DEFAULT: [], TX_PROFILE: []}
+    for raw in profiles:
+        # stored profiles are snake_case already – normalize() is the costly bit
+        p = raw if "charging_schedule" in raw else normalize(raw)
+        purpose = p.get("charging_profile_purpose")
+        conn = p.get("connector_id", 0)
+        if purpose == MAX_PROFILE:
+            if conn != 0:
+                continue
+        elif connector_id == 0 or conn not in (0, connector_id):
+            continue
+        if purpose not in by_purpose or (purpose == TX_PROFILE and conn != connector_id):
+            continue
+        # connector-specific beats connector 0, then stackLevel
+        rank = (1 if conn == connector_id and conn != 0 else 0, p.get("stack_level", 0))
+        for a, b, limit, phases in segments(p, t0, t1, unit, txs):
+            by_purpose[purpose].append((a, b, rank, limit, phases))
+
+    pieces = combine(
+        stack(by_purpose[MAX_PROFILE]),
+        stack(by_purpose[TX_DEFAULT]),
+        stack(by_purpose[TX_PROFILE]),
+        t0, t1, default_limit(unit) if limit_default is None else limit_default,
+    )
+
+    periods = []
+    for a, _b, limit, phases in pieces:
+        period = {"start_period": int(round(a - t0)), "limit": round(limit, 1)}
+        if phases is not None:
+            period["number_phases"] = phases
+        periods.append(period)
+
+    return {
+        "duration": duration,
+        "start_schedule": start.isoformat(),
+        "charging_rate_unit": unit,
+        "charging_schedule_period": periods,
+    }
+
+
+# ─────────────────────── profile set (OCPP rules) ───────────────────────
+def install(profiles: dict[int, dict], connector_id: int, profile: dict) -> list[int]:
+    """
+    Add `profile` to {profile_id: profile}.  A profile with the same id, or
+    with the same connector / purpose / stackLevel, is replaced.
+    Returns the ids that were dropped.
+    """
+    p = {**normalize(profile), "connector_id": connector_id}
+    pid = p["charging_profile_id"]
+    dropped = [
+        i for i, old in profiles.items()
+        if i != pid
+        and old.get("connector_id") == connector_id
+        and old.get("charging_profile_purpose") == p.get("charging_profile_purpose")
+        and old.get("stack_level") == p.get("stack_level")
+    ]
+    for i in dropped:
+        del profiles[i]
+    profiles[pid] = p
+    return dropped
+
+
+def clear(profiles: dict[int, dict], id: int | None = None,
+          connector_id: int | None = None, purpose: str | None = None,
+          stack_level: int | None = None) -> list[int]:
+    """ClearChargingProfile: by id, else every profile matching all given filters."""
+    if id is not None:
+        hit = [id] if id in profiles else []
+    else:
+        hit = [
+            i for i, p in profiles.items()
+            if (connector_id is None or p.get("connector_id") == connector_id)
+            and (purpose is None or p.get("charging_profile_purpose") == purpose)
+            and (stack_level is None or p.get("stack_level") == stack_level)
+        ]
+    for i in hit:
+        del profiles[i]
+    return hit
+
+
+# ───────────────────────────── storage ─────────────────────────────────
+def running_tx_start(cp_id: str, connector_id: int) -> datetime | None:
+    """
+    Sync: start of the open session Relative profiles count from – the one
+    on that connector (connector 0: the charger's newest).  The OCPP answer
+    and the API both use this, so they agree.
+    """
+    qs = Transaction.objects.filter(cp_id=cp_id, stop_time__isnull=True)
+    if connector_id:
+        qs = qs.filter(Q(connector_id=connector_id) | Q(connector_id__isnull=True))
+    return qs.order_by("-start_time").values_list("start_time", flat=True).first()
+
+
+def load_profiles(cp_id: str) -> dict[int, dict]:
+    """Sync: the stored set of one charger."""
+    return {
+        row.profile_id: row.as_dict()
+        for row in ChargingProfile.objects.filter(cp_id=cp_id)
+    }
+
+
+def save_profiles(cp_id: str, profiles: dict[int, dict], changed: list[int],
+                  dropped: list[int]):
+    """Sync: mirror one install()/clear() into the table."""
+    if dropped:
+        ChargingProfile.objects.filter(cp_id=cp_id, profile_id__in=dropped).delete()
+    for pid in changed:
+        p = profiles[pid]
+        ChargingProfile.objects.update_or_create(
+            cp_id=cp_id, profile_id=pid,
+            defaults={
+                "connector_id": p.get("connector_id", 0),
+                "stack_level":  p.get("stack_level", 0),
+                "purpose":      p.get("charging_profile_purpose", ""),
+                "payload":      {k: v for k, v in p.items() if k != "connector_id"},
+            },
+        )
+
+
+def to_camel(data):
+    """snake_case schedule → OCPP JSON keys (for the REST API)."""
+    if isinstance(data, dict):
+        return {re.sub(r"_([a-z])", lambda m: m.group(1).upper(), k): to_camel(v)
+                for k, v in data.items()}
+    if isinstance(data, list):
+        return [to_camel(v) for v in data]
+    return data
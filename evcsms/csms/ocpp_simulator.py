@@ -0,0 +1,335 @@
+# csms/ocpp_simulator.py
+"""
+Simulated OCPP 1.6-J charge points for load-testing runocpp.
+
+Every SimCharger is one websocket speaking raw OCPP-J frames (no
+python-ocpp on this side – thousands of them must stay cheap):
+
+    connect → BootNotification → StatusNotification(Available)
+    then, until the run ends:
+        Heartbeat every `heartbeat` s
+        sessions: Preparing → StartTransaction → Charging →
+                  MeterValues every `meter_interval` s → StopTransaction →
+                  Available
+    reconnect storms drop every socket at once and reconnect immediately.
+
+Fleet collects connect timings, per-action round-trip times and error
+counts; see Fleet.report().  Driven by `manage.py simulate_fleet`.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import websockets
+
+
+@dataclass
+class Scenario:
+    url: str = "ws://127.0.0.1:9000"
+    ws_key: str = ""
+    count: int = 1000
+    prefix: str = "SIM"
+    ramp: float = 200                 # new connections per second
+    duration: float = 60              # seconds after the ramp
+    heartbeat: float = 30
+    status_interval: float = 0        # extra random status flips, 0 = off
+    session_every: float = 120        # mean seconds between sessions / charger
+    session_length: float = 60
+    meter_interval: float = 10
+    storm_every: float = 0            # reconnect storm period, 0 = off
+    timeout: float = 30               # per call
+
+
+# CallResult payloads for commands the CSMS sends (after every Boot it
+# asks for GetConfiguration and GetLocalListVersion); anything else is
+# answered {"status": "Accepted"}.
+REPLIES = {
+    "GetConfiguration":    {"configurationKey": []},
+    "GetLocalListVersion": {"listVersion": 0},
+}
+ACCEPTED = {"status": "Accepted"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+class Stats:
+    def __init__(self):
+        self.connect_ok = 0
+        self.connect_failed = 0
+        self.connect_s: list[float] = []
+        self.connect_at: list[float] = []       # monotonic, for the rate
+        self.rtt: dict[str, list[float]] = {}
+        self.errors: Counter = Counter()
+        self.disconnects = 0
+        self.storms = 0
+        self.server_calls = 0
+
+    def connected(self, seconds: float):
+        self.connect_ok += 1
+        self.connect_s.append(seconds)
+        self.connect_at.append(time.monotonic())
+
+    def observe(self, action: str, seconds: float):
+        self.rtt.setdefault(action, []).append(seconds)
+
+
+class SimCharger:
+    def __init__(self, fleet: "Fleet", cp_id: str):
+        self.fleet = fleet
+        self.sc = fleet.scenario
+        self.id = cp_id
+        self.ws = None
+        self._ids = itertools.count(1)
+        self._waiting: dict[str, asyncio.Future] = {}
+        self.meter_wh = random.randint(0, 1_000_000)
+
+    # ------------------------------------------------------------------ #
+    async def call(self, action: str, payload: dict) -> dict:
+        uid = str(next(self._ids))
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting[uid] = fut
+        t0 = time.perf_counter()
+        try:
+            await self.ws.send(json.dumps([2, uid, action, payload]))
+            reply = await asyncio.wait_for(fut, self.sc.timeout)
+        except asyncio.TimeoutError:
+            self.fleet.stats.errors[f"{action}:timeout"] += 1
+            raise
+        finally:
+            self._waiting.pop(uid, None)
+        self.fleet.stats.observe(action, time.perf_counter() - t0)
+        if reply[0] == 4:
+            self.fleet.stats.errors[f"{action}:{reply[2]}"] += 1
+            return {}
+        return reply[2]
+
+    async def _reader(self):
+        try:
+            async for raw in self.ws:
+                msg = json.loads(raw)
+                if msg[0] == 2:                        # command from the CSMS
+                    self.fleet.stats.server_calls += 1
+                    reply = REPLIES.get(msg[2], ACCEPTED)
+                    await self.ws.send(json.dumps([3, msg[1], reply]))
+                else:
+                    fut = self._waiting.get(msg[1])
+                    if fut is not None and not fut.done():
+                        fut.set_result(msg)
+        finally:
+            # don't leave in-flight calls waiting for their timeout
+            for fut in self._waiting.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionResetError("socket closed"))
+
+    # ------------------------------------------------------------------ #
+    async def status(self, status: str, connector: int = 1):
+        await self.call("StatusNotification", {
+            "connectorId": connector, "errorCode": "NoError",
+            "status": status, "timestamp": _now(),
+        })
+
+    async def session(self):
+        await self.status("Preparing")
+        res = await self.call("StartTransaction", {
+            "connectorId": 1, "idTag": f"TAG-{self.id}",
+            "meterStart": self.meter_wh, "timestamp": _now(),
+        })
+        tx_id = res.get("transactionId")
+        if tx_id is None:                      # refused / CALLERROR (counted)
+            await self.status("Available")
+            return
+        await self.status("Charging")
+        end = time.monotonic() + self.sc.session_length
+        while time.monotonic() < end:
+            await asyncio.sleep(self.sc.meter_interval)
+            self.meter_wh += random.randint(100, 3000)
+            await self.call("MeterValues", {
+                "connectorId": 1, "transactionId": tx_id,
+                "meterValue": [{"timestamp": _now(), "sampledValue": [
+                    {"value": str(self.meter_wh), "measurand": "Energy.Active.Import.Register",
+                     "unit": "Wh"},
+                    {"value": f"{random.uniform(5, 32):.1f}", "measurand": "Current.Import",
+                     "unit": "A"},
+                ]}],
+            })
+        await self.call("StopTransaction", {
+            "transactionId": tx_id, "meterStop": self.meter_wh,
+            "timestamp": _now(), "reason": "Local",
+        })
+        await self.status("Available")
+
+    async def _heartbeats(self):
+        await asyncio.sleep(random.uniform(0, self.sc.heartbeat))
+        while True:
+            await self.call("Heartbeat", {})
+            await asyncio.sleep(self.sc.heartbeat)
+
+    async def _status_flips(self):
+        while True:
+            await asyncio.sleep(random.expovariate(1 / self.sc.status_interval))
+            await self.status(random.choice(["Available", "Unavailable"]), connector=2)
+
+    async def _sessions(self):
+        while True:
+            await asyncio.sleep(random.expovariate(1 / self.sc.session_every))
+            await self.session()
+
+    # ------------------------------------------------------------------ #
+    async def connect(self) -> bool:
+        url = f"{self.sc.url.rstrip('/')}/api/v16/{self.sc.ws_key}/{self.id}"
+        t0 = time.perf_counter()
+        try:
+            self.ws = await websockets.connect(
+                url, subprotocols=["ocpp1.6"], open_timeout=self.sc.timeout,
+                ping_interval=None,
+            )
+        except Exception as exc:
+            self.fleet.stats.connect_failed += 1
+            self.fleet.stats.errors[f"connect:{type(exc).__name__}"] += 1
+            return False
+        self.fleet.stats.connected(time.perf_counter() - t0)
+        return True
+
+    async def run_once(self):
+        """One connection lifetime; True if the server went away."""
+        if not await self.connect():
+            return False
+        reader = asyncio.create_task(self._reader())
+        tasks = [reader]
+        try:
+            await self.call("BootNotification", {
+                "chargePointVendor": "evcsms-sim", "chargePointModel": "load-test",
+                "firmwareVersion": "1.0",
+            })
+            await self.status("Available")
+            tasks.append(asyncio.create_task(self._heartbeats()))
+            if self.sc.session_every > 0:
+                tasks.append(asyncio.create_task(self._sessions()))
+            if self.sc.status_interval > 0:
+                tasks.append(asyncio.create_task(self._status_flips()))
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if not t.cancelled() and t.exception() is not None:
+                    raise t.exception()
+            return True
+        finally:
+            for t in tasks:
+                t.cancel()
+            await self.ws.close()
+
+    async def run(self):
+        while True:
+            try:
+                if await self.run_once():
+                    self.fleet.stats.disconnects += 1  # server closed cleanly
+            except asyncio.CancelledError:
+                raise
+            except websockets.ConnectionClosed:
+                self.fleet.stats.disconnects += 1
+            except asyncio.TimeoutError:
+                pass                                   # counted in call()
+            except Exception as exc:
+                self.fleet.stats.errors[type(exc).__name__] += 1
+            await asyncio.sleep(random.uniform(1, 5))  # back-off before retry
+
+
+class Fleet:
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.stats = Stats()
+        self.chargers = [
+            SimCharger(self, f"{scenario.prefix}-{i:05d}") for i in range(scenario.count)
+        ]
+        self._tasks: dict[SimCharger, asyncio.Task] = {}
+
+    async def _ramp(self):
+        gap = 1 / self.scenario.ramp if self.scenario.ramp > 0 else 0
+        for ch in self.chargers:
+            self._tasks[ch] = asyncio.create_task(ch.run())
+            if gap:
+                await asyncio.sleep(gap)
+
+    async def storm(self):
+        """Drop every socket at once – chargers reconnect without back-off."""
+        self.stats.storms += 1
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for ch in self.chargers:
+            self._tasks[ch] = asyncio.create_task(ch.run())
+
+    async def run(self, on_tick=None, tick: float = 5.0):
+        sc = self.scenario
+        started = time.monotonic()
+        await self._ramp()
+        ramp_done = time.monotonic()
+        next_storm = ramp_done + sc.storm_every if sc.storm_every > 0 else None
+        try:
+            while time.monotonic() - ramp_done < sc.duration:
+                await asyncio.sleep(tick)
+                if next_storm is not None and time.monotonic() >= next_storm:
+                    await self.storm()
+                    next_storm = time.monotonic() + sc.storm_every
+                if on_tick:
+                    on_tick(self, time.monotonic() - started)
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def report(self) -> dict:
+        s = self.stats
+        # initial ramp only – reconnects after storms would skew the rate
+        ramp = s.connect_at[:self.scenario.count]
+        span = ramp[-1] - ramp[0] if len(ramp) > 1 else 0
+        connects = sorted(s.connect_s)
+        rtt = {}
+        for action, values in sorted(s.rtt.items()):
+            values = sorted(values)
+            rtt[action] = {
+                "n":      len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        return {
+            "chargers":          self.scenario.count,
+            "connect_ok":        s.connect_ok,
+            "connect_failed":    s.connect_failed,
+            "connect_rate":      round(len(ramp) / span, 1) if span else None,
+            "connect_p50_ms":    round(percentile(connects, 0.50) * 1000, 2),
+            "connect_p99_ms":    round(percentile(connects, 0.99) * 1000, 2),
+            "disconnects":       s.disconnects,
+            "storms":            s.storms,
+            "server_calls":      s.server_calls,
+            "rtt":               rtt,
+            "errors":            dict(s.errors),
+        }
+
+
+def rss_kb(pid: int) -> int | None:
+    """Resident set size of a local process from /proc (Linux), in kB."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
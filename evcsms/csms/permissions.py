@@ -1,6 +1,8 @@
 # csms/permissions.py
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .helpers import _user_tenant
+
 class IsCustomer(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.is_customer
@@ -17,3 +19,10 @@ class IsRootAdmin(BasePermission):
 class IsRootAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == "root"
+
+class HasTenant(BasePermission):
+    """Views that write tenant-owned rows – 403 instead of a 500 without one."""
+    message = "This account has no tenant."
+
+    def has_permission(self, request, view):
+        return _user_tenant(request.user) is not None
@@ -1,6 +1,7 @@
-from django.urls import re_path
-from .consumers import OCPPConsumer
-
-websocket_urlpatterns = [
-    re_path(r"ws/(?P<cp_id>[^/]+)$", OCPPConsumer.as_asgi()),
-]
+from django.urls import re_path
+from .consumers import OCPPConsumer
+
+websocket_urlpatterns = [
+    # same URL as runocpp: /api/v16/<ws_key>/<cp_id>
+    re_path(r"^api/v16/(?P<ws_key>[^/]+)/(?P<cp_id>[^/]+)$", OCPPConsumer.as_asgi()),
+]
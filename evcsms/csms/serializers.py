@@ -1,10 +1,12 @@
 from rest_framework import serializers
-from .models import ChargePoint, Transaction, User, Tenant
+from .models import ChargePoint, Transaction, User, Tenant, Site, IdTag
+from .helpers import _user_tenant
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework.validators import UniqueValidator
 import uuid
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
@@ -86,8 +88,21 @@ class ChargePointSerializer(serializers.ModelSerializer):
             "location",
             "lat",
             "lng",
+            "online",
+            "last_seen",
+            "site",
         ]
-        read_only_fields = ["id", "updated"]
+        read_only_fields = ["id", "updated", "online", "last_seen"]
+
+    online = serializers.SerializerMethodField()
+
+    def get_online(self, obj):
+        # the flag is written by the OCPP server; a stale last_seen means
+        # that server died before it could mark the charger offline
+        if not obj.online or obj.last_seen is None:
+            return False
+        limit = getattr(settings, "OCPP_OFFLINE_AFTER", 90) + getattr(settings, "OCPP_LAST_SEEN_FLUSH", 10)
+        return (timezone.now() - obj.last_seen).total_seconds() < limit
 
     def validate_lat(self, v):
         if v is not None and not (-90 <= float(v) <= 90):
@@ -99,6 +114,50 @@ class ChargePointSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Longitude must be between -180 and 180.")
         return v
 
+    def validate_site(self, site):
+        tenant = _user_tenant(self.context["request"].user)
+        if site is not None and (tenant is None or site.tenant_id != tenant.pk):
+            raise serializers.ValidationError("Site belongs to another tenant.")
+        return site
+
+
+class SiteSerializer(serializers.ModelSerializer):
+    chargers = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model  = Site
+        fields = ["id", "name", "max_current_a", "min_current_a",
+                  "charger_max_a", "phases", "chargers"]
+        read_only_fields = ["id", "chargers"]
+
+    def validate(self, data):
+        get = lambda k: data.get(k, getattr(self.instance, k, None))
+        if get("min_current_a") is not None and get("charger_max_a") is not None \
+                and get("min_current_a") > get("charger_max_a"):
+            raise serializers.ValidationError("min_current_a exceeds charger_max_a.")
+        if get("phases") not in (None, 1, 3):
+            raise serializers.ValidationError("phases must be 1 or 3.")
+        return data
+
+
+
+class IdTagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model  = IdTag
+        fields = ["id", "id_tag", "status", "expiry_date", "parent_id_tag",
+                  "local", "version", "updated"]
+        read_only_fields = ["id", "version", "updated"]
+
+    def validate_id_tag(self, v):
+        tenant = _user_tenant(self.context["request"].user)
+        if tenant is None:
+            raise serializers.ValidationError("This account has no tenant.")
+        clash = IdTag.objects.filter(tenant=tenant, id_tag=v, deleted=False)
+        if self.instance is not None:
+            clash = clash.exclude(pk=self.instance.pk)
+        if clash.exists():
+            raise serializers.ValidationError("This id tag already exists.")
+        return v
 
 
 class TransactionSerializer(serializers.ModelSerializer):
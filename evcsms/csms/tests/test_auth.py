@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from csms import ocpp_auth
+from csms.models import IdTag, Tenant
+from csms.ocpp_auth import TagCache, list_update
+
+
+class AuthTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create(username="owner")
+        cls.tenant = Tenant.objects.create(owner=owner, ws_key="k")
+
+    def tag(self, id_tag, version, **fields):
+        return IdTag.objects.create(tenant=self.tenant, id_tag=id_tag, version=version, **fields)
+
+
+class AuthorizeTests(AuthTestCase):
+    def setUp(self):
+        past = datetime.now(timezone.utc) - timedelta(days=1)
+        self.tag("OK", 1)
+        self.tag("BLOCKED", 2, status="Blocked")
+        self.tag("OLD", 3, expiry_date=past)
+        self.tag("CHILD", 4, parent_id_tag="OK")
+        self.cache = TagCache(refresh_s=3600)
+
+    async def test_known_tags(self):
+        self.assertEqual(await self.cache.authorize(self.tenant.pk, "OK"), {"status": "Accepted"})
+        self.assertEqual((await self.cache.authorize(self.tenant.pk, "BLOCKED"))["status"],
+                         "Blocked")
+        self.assertEqual((await self.cache.authorize(self.tenant.pk, "OLD"))["status"],
+                         "Expired")
+        self.assertEqual((await self.cache.authorize(self.tenant.pk, "CHILD"))["parent_id_tag"],
+                         "OK")
+        self.assertEqual(self.cache.loads, 1)          # one query for all of them
+
+    async def test_unknown_tags_get_the_configured_status(self):
+        with mock.patch.object(ocpp_auth, "UNKNOWN_STATUS", "Invalid"):
+            self.assertEqual(await self.cache.authorize(self.tenant.pk, "NOPE"),
+                             {"status": "Invalid"})
+            self.assertEqual(await self.cache.authorize(None, "OK"), {"status": "Invalid"})
+        with mock.patch.object(ocpp_auth, "UNKNOWN_STATUS", "Accepted"):
+            self.assertEqual(await self.cache.authorize(self.tenant.pk, "NOPE"),
+                             {"status": "Accepted"})
+        self.assertEqual(self.cache.unknown, 2)          # the tenant-less one skips the cache
+
+    async def test_refresh_applies_only_the_delta(self):
+        await self.cache.authorize(self.tenant.pk, "OK")
+        await IdTag.objects.filter(id_tag="OK").aupdate(status="Blocked", version=5)
+        await IdTag.objects.filter(id_tag="BLOCKED").aupdate(deleted=True, version=6)
+        await IdTag.objects.acreate(tenant=self.tenant, id_tag="NEW", version=7)
+        await self.cache.refresh(self.tenant.pk)
+
+        entry = self.cache._tenants[self.tenant.pk]
+        self.assertEqual(entry.version, 7)
+        self.assertNotIn("BLOCKED", entry.tags)
+        self.assertEqual((await self.cache.authorize(self.tenant.pk, "OK"))["status"], "Blocked")
+        self.assertEqual((await self.cache.authorize(self.tenant.pk, "NEW"))["status"],
+                         "Accepted")
+
+
+class ListUpdateTests(AuthTestCase):
+    def setUp(self):
+        self.tag("A", 1)
+        self.tag("B", 2)
+        self.tag("GONE", 3, deleted=True)
+        self.tag("REMOTE", 4, local=False)
+
+    def test_nothing_to_send_when_current(self):
+        self.assertEqual(list_update(self.tenant.pk, 4), (4, None, []))
+
+    def test_empty_charger_gets_full_list_of_local_tags(self):
+        version, kind, entries = list_update(self.tenant.pk, 0)
+        self.assertEqual((version, kind), (4, "Full"))
+        self.assertEqual(sorted(e["id_tag"] for e in entries), ["A", "B"])
+
+    def test_behind_charger_gets_differential(self):
+        version, kind, entries = list_update(self.tenant.pk, 1)
+        self.assertEqual((version, kind), (4, "Differential"))
+        by_tag = {e["id_tag"]: e for e in entries}
+        self.assertEqual(set(by_tag), {"B", "GONE", "REMOTE"})
+        self.assertEqual(by_tag["B"]["id_tag_info"], {"status": "Accepted"})
+        # deleted and non-local tags go out as removals (no idTagInfo)
+        self.assertNotIn("id_tag_info", by_tag["GONE"])
+        self.assertNotIn("id_tag_info", by_tag["REMOTE"])
+
+    def test_charger_ahead_of_us_is_reset(self):
+        self.assertEqual(list_update(self.tenant.pk, 9)[1], "Full")
+
+    def test_too_far_behind_gets_full(self):
+        with mock.patch.object(ocpp_auth, "MAX_DELTA", 2):
+            self.assertEqual(list_update(self.tenant.pk, 1)[1], "Full")
+
+    def test_tenant_without_tags(self):
+        IdTag.objects.all().delete()
+        self.assertEqual(list_update(self.tenant.pk, 0), (0, None, []))
+
+
+class IdTagApiTests(AuthTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant.owner.role = "root"
+        self.client.force_authenticate(self.tenant.owner)
+
+    def test_recreated_tag_starts_from_the_defaults(self):
+        res = self.client.post("/api/id-tags/", {
+            "id_tag": "X", "status": "Blocked", "parent_id_tag": "P", "local": False,
+            "expiry_date": "2026-01-01T00:00:00Z",
+        }, format="json")
+        self.assertEqual(res.status_code, 201)
+        pk = res.data["id"]
+        self.assertEqual(self.client.delete(f"/api/id-tags/{pk}/").status_code, 204)
+
+        res = self.client.post("/api/id-tags/", {"id_tag": "X"}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["id"], pk)                  # the tombstone, revived
+        self.assertEqual(
+            (res.data["status"], res.data["expiry_date"], res.data["parent_id_tag"],
+             res.data["local"]),
+            ("Accepted", None, "", True),
+        )
+        tag = IdTag.objects.get(pk=pk)
+        self.assertFalse(tag.deleted)
+        self.assertGreater(tag.version, 0)
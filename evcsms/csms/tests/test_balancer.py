@@ -0,0 +1,99 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from csms.ocpp_balancer import Balancer, Charger, SiteState
+
+
+def site_with(n, capacity_a=32, min_a=6, max_a=16):
+    site = SiteState(1, capacity_a, min_a, max_a, 3)
+    for i in range(n):
+        ch = site.chargers[f"CP{i}"] = Charger(f"CP{i}", site)
+        ch.connectors.add(1)
+        ch.since = float(i)                  # CP0 started first
+    return site
+
+
+def allocations(site):
+    return {cp_id: ch.alloc_a for cp_id, ch in site.chargers.items()}
+
+
+class AllocateTests(SimpleTestCase):
+    def test_equal_split_never_exceeds_capacity(self):
+        site = site_with(3)
+        site.allocate()
+        alloc = allocations(site).values()
+        self.assertLessEqual(sum(alloc), 32)
+        self.assertLessEqual(max(alloc) - min(alloc), 0.2)
+        self.assertGreaterEqual(min(alloc), 10.6)
+
+    def test_nobody_gets_more_than_charger_max(self):
+        site = site_with(2, capacity_a=100)
+        site.allocate()
+        self.assertEqual(allocations(site), {"CP0": 16, "CP1": 16})
+
+    def test_car_limited_charger_leaves_the_rest_to_others(self):
+        site = site_with(3)
+        site.allocate()
+        site.chargers["CP0"].draw_a = 4.0     # car takes far less than given
+        site.allocate()
+        alloc = allocations(site)
+        self.assertEqual(alloc["CP0"], 6.0)   # draw + headroom
+        self.assertEqual(alloc["CP1"], 13.0)
+        self.assertEqual(alloc["CP2"], 13.0)
+
+    def test_min_current_floor_pauses_newest_sessions(self):
+        site = site_with(4, capacity_a=20)     # room for 3 × 6 A
+        site.allocate()
+        alloc = allocations(site)
+        self.assertEqual(alloc["CP3"], 0.0)    # started last
+        for cp_id in ("CP0", "CP1", "CP2"):
+            self.assertGreaterEqual(alloc[cp_id], 6.0)
+        self.assertLessEqual(sum(alloc.values()), 20)
+
+    def test_inactive_chargers_get_nothing(self):
+        site = site_with(2)
+        site.chargers["CP1"].connectors.clear()
+        site.allocate()
+        self.assertEqual(allocations(site), {"CP0": 16, "CP1": 0.0})
+
+
+class BalancerTests(SimpleTestCase):
+    def balancer_with_site(self):
+        b = Balancer(interval_ms=10)
+        site = b.sites[1] = site_with(0)
+        for cp_id in ("A", "B"):
+            b.chargers[cp_id] = site.chargers[cp_id] = Charger(cp_id, site)
+        return b, site
+
+    def test_status_marks_site_dirty_only_on_activity_change(self):
+        b, _ = self.balancer_with_site()
+        b.status("A", 1, "Charging")
+        self.assertEqual(b._dirty, {1})
+        b._dirty.clear()
+        b.status("A", 1, "SuspendedEV")          # still active
+        self.assertEqual(b._dirty, set())
+        b.status("A", 1, "Available")
+        self.assertEqual(b._dirty, {1})
+
+    async def test_failed_push_is_retried_after_backoff(self):
+        b, site = self.balancer_with_site()
+        ch = site.chargers["A"]
+        cp = mock.Mock(apply_limit=mock.AsyncMock(return_value=False))
+        with mock.patch("csms.ocpp_balancer.hub.local", return_value=cp):
+            await b._push(ch, 10.0)
+            self.assertIsNone(ch.sent_a)
+            self.assertEqual(b.push_failures, 1)
+            self.assertNotIn(1, b._dirty)
+            await asyncio.sleep(b.interval * 2 + 0.05)
+            self.assertIn(1, b._dirty)            # re-dirtied by the backoff timer
+
+            cp.apply_limit.return_value = True
+            await b._push(ch, 10.0)
+            self.assertEqual((ch.sent_a, ch.failures), (10.0, 0))
+
+    def test_drop_site_forgets_its_chargers(self):
+        b, _ = self.balancer_with_site()
+        b.drop_site(1)
+        self.assertEqual((b.sites, b.chargers), ({}, {}))
@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from csms import ocpp_buffers
+from csms.management.commands import runocpp
+from csms.models import ChargePoint, Tenant, Transaction
+from csms.ocpp_buffers import MeterBuffer, WriteBehind
+
+
+class MeterOrderingTests(SimpleTestCase):
+    def setUp(self):
+        self.buf = MeterBuffer("meter")
+
+    def test_older_reading_does_not_move_latest_back(self):
+        self.assertTrue(self.buf.put(1, 500.0, ts=20))
+        self.assertFalse(self.buf.put(1, 400.0, ts=10))     # replayed backlog
+        self.assertEqual(self.buf._pending[1], (500.0, 500.0))
+        self.assertEqual(self.buf.stale, 1)
+
+    def test_first_reading_is_kept_for_start_wh(self):
+        self.buf.put(1, 100.0, ts=10)
+        self.buf.put(1, 300.0, ts=20)
+        self.assertEqual(self.buf._pending[1], (100.0, 300.0))
+
+    def test_close_drops_pending_and_ignores_late_frames(self):
+        self.buf.put(1, 100.0, ts=10)
+        self.buf.close(1)
+        self.assertNotIn(1, self.buf._pending)
+        self.assertFalse(self.buf.put(1, 200.0, ts=30))
+        self.assertEqual(self.buf.after_stop, 1)
+
+    def test_eviction_spares_recently_updated_sessions(self):
+        self.buf.MAX_TRACKED = 2
+        self.buf.put(1, 100.0, ts=10)                 # long-running session
+        self.buf.put(2, 100.0, ts=10)
+        self.buf.put(1, 200.0, ts=20)                 # …still reporting
+        self.buf.put(3, 100.0, ts=10)
+        self.assertEqual(set(self.buf._newest), {1, 3})
+        self.assertFalse(self.buf.put(1, 150.0, ts=15))
+
+
+class FlakyBuffer(WriteBehind):
+    """Fails every batch that contains a "bad" row."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written = {}
+        self.calls = 0
+
+    def _write(self, rows):
+        self.calls += 1
+        if any(row == "bad" for row in rows.values()):
+            raise ValueError("bad row")
+        self.written.update(rows)
+
+
+@mock.patch.object(ocpp_buffers, "MAX_ATTEMPTS", 3)
+class FlushFailureTests(SimpleTestCase):
+    async def test_failed_batch_is_requeued_without_clobbering_newer_rows(self):
+        buf = FlakyBuffer("flaky", interval_ms=1)
+        buf._put("a", "bad")
+        with self.assertLogs("ocpp", "ERROR"):
+            await buf.flush(force=True)
+        self.assertEqual(buf.failures, 1)
+        buf._put("a", "good")                         # arrived while failing
+        buf._requeue({"a": "bad"})
+        self.assertEqual(buf._pending["a"], "good")
+
+    async def test_backoff_skips_unforced_flushes(self):
+        buf = FlakyBuffer("flaky", interval_ms=1000)
+        buf._put("a", "bad")
+        with self.assertLogs("ocpp", "ERROR"):
+            await buf.flush()
+        await buf.flush()                             # inside the backoff
+        self.assertEqual(buf.calls, 1)
+        self.assertEqual(len(buf), 1)
+
+    async def test_poisoned_batch_is_isolated_after_max_attempts(self):
+        buf = FlakyBuffer("flaky", interval_ms=1)
+        buf._put("a", "good")
+        buf._put("b", "bad")
+        buf._put("c", "good")
+        with self.assertLogs("ocpp", "ERROR"):
+            for _ in range(3):
+                await buf.flush(force=True)
+            self.assertEqual(buf.written, {})
+            await buf.flush(force=True)               # one row at a time now
+        self.assertEqual(buf.written, {"a": "good", "c": "good"})
+        self.assertEqual((len(buf), buf.dropped, buf.rows_written), (0, 1, 2))
+
+        buf._put("d", "good")                         # healthy again
+        await buf.flush()
+        self.assertEqual(buf.written["d"], "good")
+        self.assertEqual(buf.calls, 3 + 3 + 1)
+
+
+class MeterWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create(username="owner")
+        tenant = Tenant.objects.create(owner=owner, ws_key="k")
+        cp = ChargePoint.objects.create(id="CP1", tenant=tenant)
+        now = datetime.now(timezone.utc)
+        Transaction.objects.create(tx_id=1, cp=cp, start_time=now)
+        Transaction.objects.create(tx_id=2, cp=cp, start_time=now, start_wh=50,
+                                   latest_wh=90, stop_time=now)
+
+    def test_update_skips_stopped_rows_and_backfills_start(self):
+        buf = MeterBuffer("meter")
+        buf._write({1: (100.0, 250.0), 2: (60.0, 999.0)})
+        one, two = Transaction.objects.order_by("tx_id")
+        self.assertEqual((one.start_wh, one.latest_wh), (100.0, 250.0))
+        self.assertEqual((two.start_wh, two.latest_wh), (50.0, 90.0))
+
+
+@mock.patch.object(runocpp, "tx_buffer")
+@mock.patch.object(runocpp, "meter_buffer")
+@mock.patch.object(runocpp, "sample_buffer")
+class StopTransactionDataTests(SimpleTestCase):
+    async def test_stop_keeps_the_readings_it_carries(self, samples, meters, txs):
+        cp = runocpp.MyChargePoint("CP1", None)
+        data = [
+            {"timestamp": f"2026-01-01T10:0{m}:00+00:00", "sampledValue": [
+                {"value": str(1000 + 50 * m), "measurand": "Energy.Active.Import.Register"},
+                {"value": "16.0", "measurand": "Current.Import", "unit": "A"}]}
+            for m in range(3)
+        ]
+        res = await cp.on_stop_transaction(meter_stop=1200, transaction_id=7,
+                                           timestamp="2026-01-01T10:05:00Z",
+                                           transaction_data=data)
+
+        self.assertEqual(res.id_tag_info, {"status": "Accepted"})
+        self.assertEqual(samples.add.call_count, 6)
+        first = samples.add.call_args_list[0].args
+        self.assertEqual(first[:4], ("CP1", 7, 0, "Energy.Active.Import.Register"))
+        self.assertEqual(first[-1], 1000.0)
+        meters.close.assert_called_once_with(7)
+        txs.end.assert_called_once_with(
+            7, datetime(2026, 1, 1, 10, 5, tzinfo=timezone.utc), 1200)
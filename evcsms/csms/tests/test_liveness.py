@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from csms.ocpp_liveness import Liveness
+
+
+class TimerWheelTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("csms.ocpp_liveness.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.live = Liveness(timeout_s=3, tick_s=1)
+
+    def advance(self, seconds):
+        for _ in range(seconds):
+            self.now += 1
+            self.live._tick()
+
+    def test_silent_charger_goes_offline_after_timeout(self):
+        self.live.touch("CP1")
+        self.advance(2)
+        self.assertTrue(self.live.is_online("CP1"))
+        self.advance(1)
+        self.assertFalse(self.live.is_online("CP1"))
+        self.assertEqual(self.live.went_offline, 1)
+
+    def test_touch_rearms_lazily(self):
+        self.live.touch("CP1")
+        self.advance(2)
+        self.live.touch("CP1")                 # seen at t+2 → due at t+5
+        self.advance(1)
+        self.assertTrue(self.live.is_online("CP1"))
+        self.advance(1)
+        self.assertTrue(self.live.is_online("CP1"))
+        self.advance(1)
+        self.assertFalse(self.live.is_online("CP1"))
+
+    def test_disconnect_is_not_counted_as_missed_heartbeats(self):
+        self.live.touch("CP1")
+        self.live.disconnect("CP1")
+        self.advance(5)
+        self.assertEqual(self.live.went_offline, 0)
+        self.assertIn("CP1", self.live._dirty)  # online=False still gets written
+
+    def test_handover_writes_nothing(self):
+        self.live.touch("CP1")
+        self.live.handover("CP1")
+        self.assertFalse(self.live.is_online("CP1"))
+        self.assertEqual(self.live._dirty, set())
+
+    def test_many_chargers_share_one_wheel(self):
+        for i in range(100):
+            self.live.touch(f"CP{i}")
+        self.advance(1)
+        for i in range(50):
+            self.live.touch(f"CP{i}")
+        self.advance(2)
+        self.assertEqual(self.live.stats()["online"], 50)
+        self.advance(1)
+        self.assertEqual(self.live.stats()["online"], 0)
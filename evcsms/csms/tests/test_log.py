@@ -0,0 +1,51 @@
+import itertools
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from csms import ocpp_log
+from csms.management.commands import runocpp
+from csms.management.commands.runocpp import MyChargePoint
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, text):
+        self.sent.append(text)
+
+
+def _meter_values(n):
+    return json.dumps([2, f"mv-{n}", "MeterValues", {
+        "connectorId": 1,
+        "meterValue": [{
+            "timestamp": "2026-01-01T00:00:00Z",
+            "sampledValue": [{"value": "230", "measurand": "Voltage"}],
+        }],
+    }])
+
+
+class SamplingTests(SimpleTestCase):
+    FRAMES = 1000
+
+    @mock.patch.object(runocpp, "sample_buffer")
+    @mock.patch("csms.ocpp_log.random.random",
+                side_effect=itertools.cycle(k / 100 for k in range(100)))
+    async def test_meter_values_are_logged_at_the_sampling_rate(self, _random, _samples):
+        socket = _Socket()
+        cp = MyChargePoint("CP1", socket)
+        with mock.patch.dict(ocpp_log.SAMPLING, {"MeterValues": 0.01}), \
+                self.assertLogs("ocpp", level="INFO") as logs:
+            for n in range(self.FRAMES):
+                await cp.route_message(_meter_values(n))
+
+        self.assertEqual(len(socket.sent), self.FRAMES)          # all answered
+        # python-ocpp's "receive message" / "send" lines stay below WARNING
+        self.assertEqual({r.name for r in logs.records}, {"ocpp"})
+        self.assertEqual(len(logs.records), self.FRAMES // 100)
+        self.assertEqual(logs.records[0].ocpp["action"], "MeterValues")
+
+    def test_frame_logger_defaults_to_warning(self):
+        self.assertEqual(ocpp_log.frames.level, ocpp_log.logging.WARNING)
@@ -0,0 +1,75 @@
+import json
+
+from django.test import SimpleTestCase
+from ocpp.exceptions import PropertyConstraintViolationError, ProtocolError
+from ocpp.messages import Call, CallError, CallResult, unpack
+
+from csms.ocpp_sanitize import sanitize, unpack_decoded
+
+
+class SanitizeTests(SimpleTestCase):
+    def test_untouched_frames_stay_strings(self):
+        raw = '[2,"1","Heartbeat",{}]'
+        self.assertIs(sanitize(raw), raw)
+
+    def test_stop_transaction_entries_inherit_the_outer_timestamp(self):
+        raw = json.dumps([2, "7", "StopTransaction", {
+            "transactionId": 1, "meterStop": 10, "timestamp": "2026-01-01T10:00:00Z",
+            "transactionData": [
+                {"sampledValue": [{"value": "1"}]},
+                {"timestamp": "2026-01-01T09:00:00Z", "sampledValue": [{"value": "0"}]},
+            ],
+        }])
+        msg = sanitize(raw)
+        self.assertIsInstance(msg, list)
+        data = msg[3]["transactionData"]
+        self.assertEqual(data[0]["timestamp"], "2026-01-01T10:00:00Z")
+        self.assertEqual(data[1]["timestamp"], "2026-01-01T09:00:00Z")
+
+    def test_reading_context_without_dot_is_fixed(self):
+        raw = json.dumps([2, "8", "MeterValues", {"connectorId": 1, "meterValue": [
+            {"timestamp": "2026-01-01T10:00:00Z",
+             "sampledValue": [{"value": "1", "context": "TransactionBegin"}]},
+        ]}])
+        msg = sanitize(raw)
+        context = msg[3]["meterValue"][0]["sampledValue"][0]["context"]
+        self.assertEqual(context, "Transaction.Begin")
+
+    def test_broken_json_is_left_for_python_ocpp(self):
+        raw = '[2,"9","StopTransaction",{'
+        self.assertEqual(sanitize(raw), raw)
+
+    def test_non_strings_pass_through(self):
+        frame = [2, "1", "Heartbeat", {}]
+        self.assertIs(sanitize(frame), frame)
+
+
+class UnpackDecodedTests(SimpleTestCase):
+    def test_message_types(self):
+        self.assertIsInstance(unpack_decoded([2, "1", "Heartbeat", {}]), Call)
+        self.assertIsInstance(unpack_decoded([3, "1", {}]), CallResult)
+        self.assertIsInstance(unpack_decoded([4, "1", "InternalError", "", {}]), CallError)
+
+    def test_not_a_list(self):
+        with self.assertRaises(ProtocolError):
+            unpack_decoded({"a": 1})
+
+    def test_unknown_message_type(self):
+        with self.assertRaises(PropertyConstraintViolationError):
+            unpack_decoded([9, "1", {}])
+
+    def test_missing_elements(self):
+        with self.assertRaises(ProtocolError):
+            unpack_decoded([2, "1"])
+
+    def test_errors_match_python_ocpp(self):
+        # the charger must get the same CALLERROR whichever path decoded it
+        for msg in ({"a": 1}, [], [2, "1"], [9, "1", {}]):
+            with self.subTest(msg=msg):
+                with self.assertRaises(Exception) as ours:
+                    unpack_decoded(msg)
+                with self.assertRaises(Exception) as theirs:
+                    unpack(json.dumps(msg))
+                self.assertIs(type(ours.exception), type(theirs.exception))
+                self.assertEqual(ours.exception.description, theirs.exception.description)
+                self.assertEqual(ours.exception.details, theirs.exception.details)
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import SimpleTestCase
+
+from csms import ocpp_schedule
+
+T0 = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+
+
+def profile(pid, purpose, periods, connector_id=0, stack_level=0, kind="Absolute",
+            start=None, duration=None, unit="A", **extra):
+    """A stored (snake_case) profile; periods = [(start_period, limit), …]."""
+    sched = {
+        "charging_rate_unit": unit,
+        "charging_schedule_period": [{"start_period": s, "limit": l} for s, l in periods],
+    }
+    if start is not None:
+        sched["start_schedule"] = start.isoformat()
+    if duration is not None:
+        sched["duration"] = duration
+    return {
+        "connector_id": connector_id,
+        "charging_profile_id": pid,
+        "stack_level": stack_level,
+        "charging_profile_purpose": purpose,
+        "charging_profile_kind": kind,
+        "charging_schedule": sched,
+        **extra,
+    }
+
+
+def periods(schedule):
+    return [(p["start_period"], p["limit"]) for p in schedule["charging_schedule_period"]]
+
+
+class StackingTests(SimpleTestCase):
+    def compose(self, profiles, connector_id=1, duration=4 * 3600, **kw):
+        return ocpp_schedule.composite_schedule(profiles, connector_id, duration,
+                                                start=T0, **kw)
+
+    def test_no_profiles_gives_default_limit(self):
+        self.assertEqual(periods(self.compose([], limit_default=32)), [(0, 32)])
+
+    def test_higher_stack_level_wins_while_active(self):
+        base = profile(1, "TxDefaultProfile", [(0, 16)], start=T0)
+        boost = profile(2, "TxDefaultProfile", [(0, 10)], stack_level=1,
+                        start=T0 + timedelta(hours=1), duration=3600)
+        self.assertEqual(periods(self.compose([base, boost])),
+                         [(0, 16), (3600, 10), (7200, 16)])
+
+    def test_connector_specific_beats_connector_zero(self):
+        station = profile(1, "TxDefaultProfile", [(0, 16)], stack_level=5, start=T0)
+        own = profile(2, "TxDefaultProfile", [(0, 8)], connector_id=1, start=T0)
+        self.assertEqual(periods(self.compose([station, own])), [(0, 8)])
+        # another connector only sees the station-wide one
+        self.assertEqual(periods(self.compose([station, own], connector_id=2)), [(0, 16)])
+
+    def test_tx_profile_replaces_tx_default(self):
+        default = profile(1, "TxDefaultProfile", [(0, 16)], start=T0)
+        tx = profile(2, "TxProfile", [(0, 25)], connector_id=1,
+                     start=T0 + timedelta(hours=1), duration=3600)
+        self.assertEqual(periods(self.compose([default, tx])),
+                         [(0, 16), (3600, 25), (7200, 16)])
+
+    def test_max_profile_caps_everything(self):
+        cap = profile(1, "ChargePointMaxProfile", [(0, 12)], start=T0)
+        default = profile(2, "TxDefaultProfile", [(0, 16), (3600, 6)], start=T0)
+        self.assertEqual(periods(self.compose([cap, default])), [(0, 12), (3600, 6)])
+
+    def test_camel_case_profiles_are_accepted(self):
+        camel = {
+            "connectorId": 0, "chargingProfileId": 1, "stackLevel": 0,
+            "chargingProfilePurpose": "TxDefaultProfile", "chargingProfileKind": "Absolute",
+            "chargingSchedule": {
+                "startSchedule": T0.isoformat(), "chargingRateUnit": "A",
+                "chargingSchedulePeriod": [{"startPeriod": 0, "limit": 20}],
+            },
+        }
+        self.assertEqual(periods(self.compose([camel])), [(0, 20)])
+
+    def test_unit_conversion_to_watts(self):
+        default = profile(1, "TxDefaultProfile", [(0, 16)], start=T0)
+        schedule = self.compose([default], unit="W")
+        self.assertEqual(schedule["charging_rate_unit"], "W")
+        self.assertEqual(periods(schedule), [(0, 16 * 230 * 3)])
+
+
+class AnchoringTests(SimpleTestCase):
+    def relative(self):
+        return profile(1, "TxProfile", [(0, 8), (1800, 20)], connector_id=1,
+                       kind="Relative", duration=3600)
+
+    def test_relative_counts_from_transaction_start(self):
+        schedule = ocpp_schedule.composite_schedule(
+            [self.relative()], 1, 7200, start=T0,
+            tx_start=T0 - timedelta(minutes=10), limit_default=32)
+        # session started 10 min ago: 20 min of 8 A left, then 20 A until 50 min
+        self.assertEqual(periods(schedule), [(0, 8), (1200, 20), (3000, 32)])
+
+    def test_relative_without_transaction_starts_now(self):
+        schedule = ocpp_schedule.composite_schedule(
+            [self.relative()], 1, 7200, start=T0, limit_default=32)
+        self.assertEqual(periods(schedule), [(0, 8), (1800, 20), (3600, 32)])
+
+    def test_daily_recurring_repeats_from_its_start_schedule(self):
+        # every day 13:00–15:00 at 6 A, first defined two days back
+        night = profile(1, "TxDefaultProfile", [(0, 6)], kind="Recurring",
+                        recurrency_kind="Daily", duration=7200,
+                        start=T0 - timedelta(days=2) + timedelta(hours=1))
+        schedule = ocpp_schedule.composite_schedule(
+            [night], 1, 2 * 86400, start=T0, limit_default=32)
+        self.assertEqual(periods(schedule), [
+            (0, 32), (3600, 6), (3 * 3600, 32),
+            (86400 + 3600, 6), (86400 + 3 * 3600, 32),
+        ])
+
+    def test_valid_to_ends_a_profile(self):
+        default = profile(1, "TxDefaultProfile", [(0, 10)], start=T0,
+                          valid_to=(T0 + timedelta(hours=1)).isoformat())
+        schedule = ocpp_schedule.composite_schedule(
+            [default], 1, 7200, start=T0, limit_default=32)
+        self.assertEqual(periods(schedule), [(0, 10), (3600, 32)])
+
+
+class ProfileSetTests(SimpleTestCase):
+    def test_install_replaces_same_purpose_and_stack_level(self):
+        profiles = {}
+        ocpp_schedule.install(profiles, 1, profile(1, "TxDefaultProfile", [(0, 16)]))
+        dropped = ocpp_schedule.install(profiles, 1, profile(2, "TxDefaultProfile", [(0, 10)]))
+        self.assertEqual(dropped, [1])
+        self.assertEqual(list(profiles), [2])
+
+    def test_clear_by_filters(self):
+        profiles = {}
+        ocpp_schedule.install(profiles, 1, profile(1, "TxDefaultProfile", [(0, 16)]))
+        ocpp_schedule.install(profiles, 0, profile(2, "ChargePointMaxProfile", [(0, 32)]))
+        self.assertEqual(ocpp_schedule.clear(profiles, purpose="TxDefaultProfile"), [1])
+        self.assertEqual(ocpp_schedule.clear(profiles, id=99), [])
+        self.assertEqual(list(profiles), [2])
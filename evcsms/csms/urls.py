@@ -23,9 +23,33 @@ urlpatterns = [
 ]
 
 urlpatterns += [
+    path("charge-points/config/",                  # GET cached configs / POST refresh
+         views.ChargePointConfigList.as_view()),
+
     path("charge-points/<pk>/",                    # GET single CP
          views.ChargePointDetail.as_view()),
 
     path("charge-points/<pk>/command/",            # POST command
          views.ChargePointCommand.as_view()),
+
+    path("charge-points/<pk>/config/",             # GET snapshot / POST refresh
+         views.ChargePointConfig.as_view()),
+
+    path("charge-points/<pk>/composite-schedule/", # GET stacked charging profiles
+         views.ChargePointCompositeSchedule.as_view()),
+
+    path("sites/",                                 # GET list / POST create
+         views.SiteList.as_view()),
+
+    path("sites/<int:pk>/",                        # GET / PATCH limits / DELETE
+         views.SiteDetail.as_view()),
+
+    path("id-tags/",                               # GET list / POST create
+         views.IdTagList.as_view()),
+
+    path("id-tags/<int:pk>/",                      # GET / PATCH / DELETE
+         views.IdTagDetail.as_view()),
+
+    path("sessions/<int:pk>/samples/",             # GET meter time series
+         views.SessionSamples.as_view()),
 ]
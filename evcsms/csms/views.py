@@ -16,11 +16,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.views import TokenObtainPairView
-from csms.ocpp_bridge import enqueue
+from csms.ocpp_bridge import enqueue, notify
 from asgiref.sync import async_to_sync
-from .models      import ChargePoint, Transaction, Tenant
+from .models      import ChargePoint, Transaction, Tenant, MeterSample, CPConfigSnapshot, Site, IdTag
+from django.db import transaction as db_transaction
+from csms.ocpp_auth import bump_version
+from csms.ocpp_config import cached_snapshots
+from csms import ocpp_schedule
 from .serializers import (
     ChargePointSerializer,
+    SiteSerializer,
+    IdTagSerializer,
     TransactionSerializer,
     SignUpSerializer,
     MeSerializer,
@@ -29,7 +35,7 @@ from .serializers import (
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
 )
-from .permissions import IsRootAdmin, IsCpAdmin   # keep for later fine-graining
+from .permissions import IsRootAdmin, IsCpAdmin, HasTenant   # keep for later fine-graining
 from .helpers     import _tenant_qs
 
 from django.contrib.auth.models import User
@@ -335,6 +341,19 @@ class RecentSessions(generics.ListAPIView):
         )
 
 
+class SessionSamples(APIView):
+    """
+    GET /api/sessions/<pk>/samples/
+    → every sampled measurand of one session as compact arrays
+      {"tx": 12, "series": {"Power.Active.Import": {"unit": "W", "t": [...], "v": [...]}}}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        tx = get_object_or_404(_tenant_qs(Transaction, request.user), pk=pk)
+        return Response({"tx": tx.tx_id, "series": MeterSample.series_for(tx.tx_id)})
+
+
 # ────────────────────────────────────────────────────────────────
 #  Auth / profile
 # ────────────────────────────────────────────────────────────────
@@ -399,6 +418,11 @@ class ChargePointDetail(generics.RetrieveUpdateAPIView):
         # only CPs that belong to the current tenant
         return _tenant_qs(ChargePoint, self.request.user)
 
+    def perform_update(self, serializer):
+        cp = serializer.save()
+        # drop the OCPP server's cached copy of this row
+        notify("cp", cp.id)
+
 
 class ChargePointCommand(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -419,6 +443,206 @@ class ChargePointCommand(APIView):
         return Response({"detail": "queued"}, status=status.HTTP_202_ACCEPTED)
 
 
+class ChargePointConfigList(APIView):
+    """
+    GET  /api/charge-points/config/?ids=CP1,CP2   (default: every CP of the tenant)
+         → {"results": [{"cp", "version", "taken_at", "configuration", …}, …]}
+         served from the snapshot cache – no charger is contacted.
+    POST /api/charge-points/config/  {"ids": [...]}  (default: all)
+         → ask the OCPP server to re-fetch those snapshots.
+    """
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin)]
+
+    def _cp_ids(self, request, ids):
+        qs = _tenant_qs(ChargePoint, request.user)
+        if ids:
+            qs = qs.filter(id__in=ids)
+        return list(qs.values_list("id", flat=True))
+
+    def get(self, request):
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+        cp_ids = self._cp_ids(request, ids)
+        snaps = cached_snapshots(cp_ids)
+        return Response({"results": [
+            snaps[i] or {"cp": i, "version": None} for i in cp_ids
+        ]})
+
+    def post(self, request):
+        cp_ids = self._cp_ids(request, request.data.get("ids") or [])
+        for cp_id in cp_ids:
+            notify("config", cp_id)
+        return Response({"detail": "refresh requested", "count": len(cp_ids)},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class ChargePointConfig(APIView):
+    """
+    GET  /api/charge-points/<id>/config/              → newest snapshot (cached)
+    GET  /api/charge-points/<id>/config/?version=3    → that version
+    POST /api/charge-points/<id>/config/              → re-fetch from the charger
+    """
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin)]
+
+    def get(self, request, pk):
+        cp = get_object_or_404(_tenant_qs(ChargePoint, request.user), pk=pk)
+        version = request.query_params.get("version")
+        if version:
+            if not version.isdigit():
+                return Response({"detail": "version must be an integer"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            snap = get_object_or_404(CPConfigSnapshot, cp=cp, version=int(version))
+            return Response(snap.as_dict())
+        snap = cached_snapshots([cp.id])[cp.id]
+        if snap is None:
+            return Response({"detail": "no configuration fetched yet"},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(snap)
+
+    def post(self, request, pk):
+        cp = get_object_or_404(_tenant_qs(ChargePoint, request.user), pk=pk)
+        notify("config", cp.id)
+        return Response({"detail": "refresh requested"}, status=status.HTTP_202_ACCEPTED)
+
+
+class ChargePointCompositeSchedule(APIView):
+    """
+    GET /api/charge-points/<id>/composite-schedule/
+        ?connector=1&duration=86400&unit=A|W&start=<ISO>
+    → the OCPP GetCompositeSchedule chargingSchedule, computed from the
+      stored charging profiles (no charger round-trip).  Relative profiles
+      count from the start of the session running on that connector.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        cp = get_object_or_404(_tenant_qs(ChargePoint, request.user), pk=pk)
+        q = request.query_params
+        try:
+            connector = int(q.get("connector", 1))
+            duration = int(q.get("duration", 86400))
+            start = datetime.fromisoformat(q["start"]) if q.get("start") else now()
+        except ValueError:
+            return Response({"detail": "connector/duration must be integers, start ISO 8601"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        unit = q.get("unit", "A")
+        if unit not in ("A", "W") or not 0 < duration <= 31 * 86400:
+            return Response({"detail": "unit must be A or W, duration 1 s … 31 days"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start.tzinfo is None:
+            start = make_aware(start)
+
+        profiles = [p.as_dict() for p in cp.charging_profiles.all()]
+        running = ocpp_schedule.running_tx_start(cp.id, connector)
+        schedule = ocpp_schedule.composite_schedule(
+            profiles, connector, duration, unit=unit, start=start, tx_start=running,
+        )
+        return Response({
+            "cp":               cp.id,
+            "connectorId":      connector,
+            "profiles":         len(profiles),
+            "chargingSchedule": ocpp_schedule.to_camel(schedule),
+        })
+
+
+class SiteList(generics.ListCreateAPIView):
+    """
+    GET  /api/sites/   → sites of the tenant (chargers listed by id)
+    POST /api/sites/   → new site; attach chargers with PATCH charge-points/<id>/ {"site": …}
+    """
+    serializer_class   = SiteSerializer
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin) & HasTenant]
+
+    def get_queryset(self):
+        return _tenant_qs(Site, self.request.user).prefetch_related("chargers")
+
+    def perform_create(self, serializer):
+        serializer.save(tenant=self.request.user.tenant)
+
+
+class SiteDetail(generics.RetrieveUpdateDestroyAPIView):
+    """GET / PATCH / DELETE /api/sites/<id>/ – limit changes reach runocpp at once."""
+    serializer_class   = SiteSerializer
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin)]
+
+    def get_queryset(self):
+        return _tenant_qs(Site, self.request.user)
+
+    def perform_update(self, serializer):
+        site = serializer.save()
+        notify("site", str(site.pk))
+
+    def perform_destroy(self, instance):
+        site_id = instance.pk
+        cp_ids = list(instance.chargers.values_list("id", flat=True))
+        instance.delete()
+        notify("site", str(site_id))            # runocpp drops its allocation state
+        for cp_id in cp_ids:                    # site_id is NULL now
+            notify("cp", cp_id)
+
+
+class _IdTagWrites:
+    """
+    Every IdTag write takes the tenant's next list version in the same
+    transaction (see ocpp_auth) and tells runocpp once it is committed.
+    """
+    def _save(self, serializer, **fields):
+        tenant = self.request.user.tenant
+        with db_transaction.atomic():
+            fields["version"] = bump_version(tenant.pk)
+            tag = serializer.save(**fields)
+            db_transaction.on_commit(lambda: notify("idtag", str(tenant.pk)))
+        return tag
+
+
+class IdTagList(_IdTagWrites, generics.ListCreateAPIView):
+    """
+    GET  /api/id-tags/   → the tenant's tags
+    POST /api/id-tags/   {"id_tag", "status", "expiry_date", "parent_id_tag", "local"}
+    """
+    serializer_class   = IdTagSerializer
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin) & HasTenant]
+
+    def get_queryset(self):
+        return _tenant_qs(IdTag, self.request.user).filter(deleted=False).order_by("id_tag")
+
+    # what a re-created tag starts from when the POST leaves them out
+    RESET_FIELDS = ("status", "expiry_date", "parent_id_tag", "local")
+
+    def perform_create(self, serializer):
+        # a tag deleted earlier comes back as the same row (its tombstone),
+        # but as a new tag – not with the status / expiry it was deleted with
+        tombstone = (
+            _tenant_qs(IdTag, self.request.user)
+            .filter(id_tag=serializer.validated_data["id_tag"], deleted=True).first()
+        )
+        if tombstone is not None:
+            for name in self.RESET_FIELDS:
+                setattr(tombstone, name, IdTag._meta.get_field(name).get_default())
+        serializer.instance = tombstone
+        self._save(serializer, tenant=self.request.user.tenant, deleted=False)
+
+
+class IdTagDetail(_IdTagWrites, generics.RetrieveUpdateDestroyAPIView):
+    """GET / PATCH / DELETE /api/id-tags/<id>/ – chargers get the change as a delta."""
+    serializer_class   = IdTagSerializer
+    permission_classes = [permissions.IsAuthenticated & (IsRootAdmin | IsCpAdmin) & HasTenant]
+
+    def get_queryset(self):
+        return _tenant_qs(IdTag, self.request.user).filter(deleted=False)
+
+    def perform_update(self, serializer):
+        self._save(serializer)
+
+    def perform_destroy(self, instance):
+        # kept as a tombstone so the removal can go out as a delta
+        tenant_id = instance.tenant_id
+        with db_transaction.atomic():
+            instance.deleted = True
+            instance.version = bump_version(tenant_id)
+            instance.save(update_fields=["deleted", "version", "updated"])
+            db_transaction.on_commit(lambda: notify("idtag", str(tenant_id)))
+
+
 class CpCommandView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
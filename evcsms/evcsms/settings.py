@@ -139,3 +139,129 @@ EMAIL_USE_SSL      = True
 # so you can leave EMAIL_USE_TLS = False (or omit it entirely)
 DEFAULT_FROM_EMAIL = "H-Craft <test@habm-lab.com>"
 
+
+# ────────────────
+#  OCPP server (runocpp)
+# ────────────────
+# Directory where every runocpp process binds its wake-up socket;
+# the REST side drops a datagram there when a CPCommand is queued.
+OCPP_NOTIFY_DIR = os.getenv("OCPP_NOTIFY_DIR", "/tmp/evcsms-ocpp")
+
+# MeterValues write-behind: flush every N ms or as soon as M transactions
+# have a pending reading (StopTransaction and shutdown flush immediately).
+OCPP_METER_FLUSH_MS   = 500
+OCPP_METER_FLUSH_ROWS = 500
+
+# Full meter time series (MeterSample): bulk_create every N ms or M samples.
+OCPP_SAMPLE_FLUSH_MS   = 1000
+OCPP_SAMPLE_FLUSH_ROWS = 5000
+
+# A buffer flush that fails is retried with backoff (flush interval × 2^n,
+# at most RETRY_MAX_S); after MAX_ATTEMPTS the rows are written one by one
+# and those that still fail are logged and dropped.
+OCPP_FLUSH_MAX_ATTEMPTS = 8
+OCPP_FLUSH_RETRY_MAX_S  = 60
+
+# Connection-path caches (ws_key → tenant, cp_id → vendor/model/fw), seconds.
+OCPP_CACHE_TTL = 300
+
+# Django's cache (config snapshots): shared between runocpp and the API
+# when REDIS_URL is set, otherwise per process (still correct, see
+# csms.ocpp_config – only the cache hits are lost).
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND":  "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+
+# JSON backend for OCPP framing: "auto" (orjson if installed), "orjson", "stdlib".
+OCPP_JSON_BACKEND = os.getenv("OCPP_JSON_BACKEND", "auto")
+
+# Start/StopTransaction rows: written in one batch every N ms or M rows
+# (each Start/Stop also kicks an early flush).
+OCPP_TX_FLUSH_MS   = 100
+OCPP_TX_FLUSH_ROWS = 500
+
+# Transaction ids are reserved from IdSequence in blocks of this size.
+OCPP_TX_ID_BLOCK = 100
+
+# StatusNotification: unchanged statuses are dropped, changes are written
+# in one batch at most this many ms later (bursts collapse into one write).
+OCPP_STATUS_DEBOUNCE_MS = 200
+
+# Liveness: a charger silent for OCPP_OFFLINE_AFTER seconds is marked
+# offline; last_seen/online are written in one batch every N seconds.
+OCPP_OFFLINE_AFTER   = 90          # 3 × the 30 s heartbeat interval
+OCPP_LAST_SEEN_FLUSH = 10
+
+# Logging: handlers emit one structured record per call through a queue
+# (written by a background thread).  Sampling rate per action, 1.0 if
+# unlisted; state changes (Boot, Start/Stop, status changes, errors) are
+# always logged.  Format "text" or "json".
+OCPP_LOG_SAMPLING = {"MeterValues": 0.01, "Heartbeat": 0.01}
+OCPP_LOG_FORMAT = os.getenv("OCPP_LOG_FORMAT", "text")
+# python-ocpp's "receive message …" / "send …" line per frame (logger
+# "ocpp.frames"): "INFO" to trace every frame, WARNING keeps only errors.
+OCPP_LOG_FRAMES = os.getenv("OCPP_LOG_FRAMES", "WARNING")
+OCPP_LOG_QUEUE_SIZE = 10000
+
+# Prometheus text endpoint GET /metrics – off unless OCPP_METRICS_PORT is
+# set (pick a free port; 9100 is node_exporter's).  With --workers N
+# worker i listens on OCPP_METRICS_PORT + i.
+OCPP_METRICS_HOST = os.getenv("OCPP_METRICS_HOST", "127.0.0.1")
+OCPP_METRICS_PORT = int(os.getenv("OCPP_METRICS_PORT") or 0) or None
+
+# Per-action handler profiling (sanitize/parse/validate/orm/send/handler).
+# Can also be switched at runtime: manage.py ocpp_profile on|off|reset|dump.
+OCPP_PROFILE = os.getenv("OCPP_PROFILE", "") == "1"
+
+# Rolling restart: start the new runocpp with --reuse-port (or --workers),
+# then SIGTERM the old one – it stops accepting, flushes its buffers and
+# closes its websockets spread over this many seconds.
+OCPP_DRAIN_SECONDS = 30
+
+# Configuration snapshots (GetConfiguration): re-fetched after Boot when
+# older than OCPP_CONFIG_MAX_AGE seconds; at most N fetches in flight and
+# R started per second; the API serves them from the cache for TTL seconds.
+OCPP_CONFIG_MAX_AGE           = 24 * 3600
+OCPP_CONFIG_FETCH_CONCURRENCY = 10
+OCPP_CONFIG_FETCH_RATE        = 20
+OCPP_CONFIG_CACHE_TTL         = 300
+
+# Composite schedules: the limit (A) assumed where no charging profile applies.
+OCPP_SCHEDULE_DEFAULT_LIMIT_A = 32.0
+
+# MeterValues / Start / StopTransaction stamped more than this many seconds
+# ago are a reconnecting charger's offline backlog: stored in the normal
+# batches, but kept out of load balancing and counted separately.
+OCPP_BACKLOG_AFTER_S = 120
+
+# Id-tag authorization (csms.ocpp_auth): tags are answered from memory and
+# re-synced from the DB on change (notify) or every REFRESH_S at the latest.
+# Unknown tags get UNKNOWN_STATUS: "Accepted" (default) keeps chargers
+# working for tenants that haven't registered their tags yet; set
+# "Invalid" to deny by default once they have.  A charger's local list is
+# patched with SendLocalList Differential while it is at most MAX_DELTA
+# changes behind, otherwise replaced in Full.
+OCPP_AUTH_REFRESH_S         = 60
+OCPP_AUTH_UNKNOWN_STATUS    = os.getenv("OCPP_AUTH_UNKNOWN_STATUS", "Accepted")
+OCPP_LOCAL_LIST_MAX_DELTA   = 500
+OCPP_LOCAL_LIST_CONCURRENCY = 5
+
+# Site load balancing (csms.ocpp_balancer): dirty sites are re-allocated
+# every INTERVAL_MS; a charger is only sent a new limit when it moved by
+# STEP_A or more.  The limit goes out as a TxDefaultProfile with this
+# profile id / stack level – keep both clear of your own profiles.
+OCPP_BALANCER_INTERVAL_MS   = 1000
+OCPP_BALANCER_STEP_A        = 1.0
+OCPP_BALANCER_HEADROOM_A    = 2.0
+OCPP_BALANCER_PROFILE_ID    = 900_001
+OCPP_BALANCER_STACK_LEVEL   = 50
+
+# ORM calls of the OCPP server: 0 = Django's single sync thread (SQLite),
+# N = dedicated pool of N threads.  None picks 0 for SQLite, 16 otherwise.
+OCPP_DB_THREADS = None
+# Per-call timeout in seconds for handler queries (None = wait forever).
+OCPP_DB_TIMEOUT = 5